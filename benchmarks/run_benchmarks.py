@@ -0,0 +1,245 @@
+"""
+Hot-path benchmarks at several data sizes (USE_LLM=false, no network).
+
+  PYTHONPATH=src python benchmarks/run_benchmarks.py                      # run + compare with baseline.json
+  PYTHONPATH=src python benchmarks/run_benchmarks.py --update-baseline    # record a new baseline
+  PYTHONPATH=src python benchmarks/run_benchmarks.py --quick --filter store
+
+Results are written as JSON (--out). A benchmark regresses when its median is more than
+--tolerance times the baseline median; any regression makes the exit code non-zero.
+Baselines are machine-specific: refresh them on the machine that runs the comparison.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+os.environ["USE_LLM"] = "false"
+os.environ.setdefault("OWPA_TRACE", "off")
+
+from owpa.data import synthetic  # noqa: E402
+from owpa.data.loader import get_supplier, load_deal_state, load_suppliers_fixture  # noqa: E402
+from owpa.data.storage import JsonlDealStateStore  # noqa: E402
+
+HERE = Path(__file__).resolve().parent
+ROOT = HERE.parent
+DEFAULT_BASELINE = HERE / "baseline.json"
+
+# name -> (sizes, quick sizes, setup(size, workdir) -> zero-arg callable under test)
+Setup = Callable[[int, Path], Callable[[], object]]
+BENCHMARKS: Dict[str, Tuple[List[int], List[int], Setup]] = {}
+
+
+def bench(name: str, sizes: Sequence[int], quick: Sequence[int]):
+    def deco(fn: Setup) -> Setup:
+        BENCHMARKS[name] = (list(sizes), list(quick), fn)
+        return fn
+
+    return deco
+
+
+def _store_with(size: int, workdir: Path) -> JsonlDealStateStore:
+    # size = number of snapshots; 5 rounds per deal
+    path = workdir / f"store_{size}.jsonl"
+    if not path.exists():
+        synthetic.write_state_store(path, max(1, size // 5), rounds=5, n_suppliers=50)
+    return JsonlDealStateStore(path)
+
+
+def _suppliers_fixture(size: int, workdir: Path) -> Path:
+    path = workdir / f"suppliers_{size}.json"
+    if not path.exists():
+        synthetic.write_suppliers_fixture(path, size, episodes=20)
+    return path
+
+
+@bench("store.append", sizes=[1_000, 10_000, 50_000], quick=[1_000])
+def _b_store_append(size: int, workdir: Path):
+    store = _store_with(size, workdir)
+    deal = load_deal_state(ROOT / "data" / "fixtures" / "sample_deal_state.json")
+    scratch = JsonlDealStateStore(workdir / f"append_{size}.jsonl")
+    scratch.path.write_bytes(store.path.read_bytes())
+    return lambda: scratch.append(deal)
+
+
+@bench("store.load_latest", sizes=[1_000, 10_000, 50_000], quick=[1_000])
+def _b_store_load_latest(size: int, workdir: Path):
+    store = _store_with(size, workdir)
+    deal_id = f"DEAL-SYN-{(size // 5) // 2:07d}"
+    return lambda: store.load_latest(deal_id)
+
+
+@bench("loader.load_suppliers_fixture", sizes=[10, 100, 1_000], quick=[10])
+def _b_load_suppliers(size: int, workdir: Path):
+    path = _suppliers_fixture(size, workdir)
+    return lambda: load_suppliers_fixture(path)
+
+
+@bench("loader.get_supplier", sizes=[10, 100, 1_000], quick=[10])
+def _b_get_supplier(size: int, workdir: Path):
+    suppliers = load_suppliers_fixture(_suppliers_fixture(size, workdir))
+    name = synthetic.supplier_name(size - 1)
+    return lambda: get_supplier(suppliers, supplier_name=name)
+
+
+@bench("extract._rule_extract", sizes=[1, 10, 100], quick=[1])
+def _b_rule_extract(size: int, workdir: Path):
+    from owpa.agent.nodes.extract import _rule_extract
+
+    # size = email length multiplier
+    text = (ROOT / "data" / "emails" / "01_price_increase.txt").read_text(encoding="utf-8") * size
+    return lambda: _rule_extract(text)
+
+
+@bench("node.predict_trade", sizes=[10, 100, 1_000], quick=[10])
+def _b_predict_trade(size: int, workdir: Path):
+    from owpa.agent.nodes.predict_trade import predict_trade_node
+    from owpa.schemas.deal_state import IntentType, Percentage, SupplierAsk
+
+    # size = episodes on the supplier
+    supplier = synthetic.make_supplier(0, episodes=size)
+    deal = load_deal_state(ROOT / "data" / "fixtures" / "sample_deal_state.json")
+    deal.supplier_ask = SupplierAsk(intent=IntentType.PRICE_INCREASE_REQUEST, headline_price_change_pct=Percentage(value=9.0))
+    state = {"deal_state": deal, "supplier_memory": supplier}
+    return lambda: predict_trade_node(state)
+
+
+@bench("graph.invoke", sizes=[10, 100, 1_000], quick=[10])
+def _b_graph_invoke(size: int, workdir: Path):
+    from owpa.agent.graph import build_graph
+
+    # size = suppliers in the fixture loaded by load_memory
+    os.environ["SUPPLIERS_FIXTURE_PATH"] = str(_suppliers_fixture(size, workdir))
+    os.environ["PLAYBOOK_PATH"] = str(ROOT / "data" / "fixtures" / "playbook_wtg_ltsa.json")
+    os.environ["STATE_STORE_PATH"] = str(workdir / f"graph_store_{size}.jsonl")
+    os.environ["AGGREGATES_DB_PATH"] = str(workdir / f"graph_aggregates_{size}.sqlite")
+    graph = build_graph()
+    email = (ROOT / "data" / "emails" / "01_price_increase.txt").read_text(encoding="utf-8")
+    base = load_deal_state(ROOT / "data" / "fixtures" / "sample_deal_state.json")
+    base.supplier_name = synthetic.supplier_name(size // 2)
+
+    def run():
+        graph.invoke(
+            {"email_text": email, "supplier_email_subject": "bench", "deal_state": base.model_copy(deep=True)}
+        )
+
+    return run
+
+
+def measure(fn: Callable[[], object], *, min_time: float, repeats: int) -> Dict[str, float]:
+    """
+    Calibrates an inner loop so each sample takes >= min_time / repeats, then reports per-call times.
+    """
+    fn()  # warm-up
+    loops = 1
+    target = max(min_time / repeats, 1e-3)
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - t0
+        if elapsed >= target or loops >= 1_000_000:
+            break
+        loops *= 2 if elapsed == 0 else max(2, min(10, int(target / elapsed) + 1))
+
+    samples = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        samples.append((time.perf_counter() - t0) / loops * 1000.0)
+
+    return {
+        "median_ms": round(statistics.median(samples), 6),
+        "min_ms": round(min(samples), 6),
+        "max_ms": round(max(samples), 6),
+        "loops": loops,
+        "repeats": repeats,
+    }
+
+
+def run(*, quick: bool, name_filter: Optional[str], min_time: float, repeats: int) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    with tempfile.TemporaryDirectory(prefix="owpa-bench-") as tmp:
+        workdir = Path(tmp)
+        for name, (sizes, quick_sizes, setup) in BENCHMARKS.items():
+            if name_filter and name_filter not in name:
+                continue
+            for size in quick_sizes if quick else sizes:
+                key = f"{name}[n={size}]"
+                results[key] = measure(setup(size, workdir), min_time=min_time, repeats=repeats)
+                print(f"{key:<44} median {results[key]['median_ms']:>12.4f} ms", flush=True)
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    regressions = []
+    for key, r in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        ratio = r["median_ms"] / max(base["median_ms"], 1e-9)
+        r["baseline_median_ms"] = base["median_ms"]
+        r["ratio"] = round(ratio, 3)
+        if ratio > tolerance:
+            regressions.append(f"{key}: {r['median_ms']:.4f}ms vs baseline {base['median_ms']:.4f}ms (x{ratio:.2f})")
+    return regressions
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="Smallest size per benchmark only")
+    parser.add_argument("--filter", default=None, help="Only run benchmarks whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.5, help="Seconds spent per measured size")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--tolerance", type=float, default=1.5, help="Allowed median slowdown ratio vs baseline")
+    parser.add_argument("--out", default="outputs/bench_results.json")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    results = run(quick=args.quick, name_filter=args.filter, min_time=args.min_time, repeats=args.repeats)
+
+    baseline_path = Path(args.baseline)
+    regressions: List[str] = []
+    if args.update_baseline:
+        existing = json.loads(baseline_path.read_text(encoding="utf-8")).get("results", {}) if baseline_path.exists() else {}
+        existing.update(results)
+        baseline_path.write_text(
+            json.dumps({"meta": _meta(), "results": dict(sorted(existing.items()))}, indent=2) + "\n", encoding="utf-8"
+        )
+        print(f"Baseline updated: {baseline_path}")
+    elif baseline_path.exists():
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8")).get("results", {})
+        regressions = compare(results, baseline, args.tolerance)
+
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps({"meta": _meta(), "results": results, "regressions": regressions}, indent=2), encoding="utf-8")
+
+    if regressions:
+        print("REGRESSIONS:")
+        for r in regressions:
+            print(f"  - {r}")
+        return 1
+    return 0
+
+
+def _meta() -> Dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+    }
+
+
+if __name__ == "__main__":
+    sys.exit(main())
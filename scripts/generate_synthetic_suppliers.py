@@ -1 +1,54 @@
+"""
+Seeded, streaming generator for load / scaling data.
 
+Writes into --out-dir:
+  suppliers.json      N suppliers x M episodes (SupplierMemory schema, same shape as data/fixtures/suppliers.json)
+  state_store.jsonl   K deals x R rounds (JsonlDealStateStore format)
+  emails/<intent>/    synthetic supplier emails + emails/golden.json labels for the golden runner
+
+Memory stays flat: every supplier / snapshot / email is written as soon as it is generated.
+
+Example:
+  PYTHONPATH=src python scripts/generate_synthetic_suppliers.py --suppliers 1000 --episodes 50 \\
+      --deals 100000 --rounds 10 --emails-per-intent 200 --out-dir outputs/synthetic
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+
+from owpa.data.synthetic import generate_all
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out-dir", default="outputs/synthetic")
+    parser.add_argument("--suppliers", type=int, default=100, help="N suppliers")
+    parser.add_argument("--episodes", type=int, default=20, help="M episodes per supplier")
+    parser.add_argument("--deals", type=int, default=1000, help="K deals")
+    parser.add_argument("--rounds", type=int, default=5, help="R rounds per deal")
+    parser.add_argument("--emails-per-intent", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+
+    def progress(kind: str, n: int) -> None:
+        print(f"{kind:<10} {n:>10,}  ({time.perf_counter() - t0:.1f}s)")
+
+    generate_all(
+        args.out_dir,
+        suppliers=args.suppliers,
+        episodes=args.episodes,
+        deals=args.deals,
+        rounds=args.rounds,
+        emails_per_intent=args.emails_per_intent,
+        seed=args.seed,
+        progress=progress,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
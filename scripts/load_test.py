@@ -0,0 +1,136 @@
+"""
+Closed-loop load test against the local HTTP API (python -m owpa.service.api).
+
+Each of --concurrency clients keeps one keep-alive connection open and sends requests back to
+back for --duration seconds. Reports sustained requests/sec, latency percentiles and status codes.
+
+Scenarios:
+  score   POST /v1/trades/score   (cheap, mostly measures the server loop + worker pool)
+  deal    GET  /v1/deals/<id>     (state store reads; coalesced when ids repeat)
+  round   POST /v1/rounds         (full graph; start the server with USE_LLM=false for a stable number)
+
+Example:
+  PYTHONPATH=src python scripts/load_test.py --scenario round --concurrency 16 --duration 20 --deals 8
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from owpa.evaluation.metrics import latency_summary
+
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+async def _request(reader, writer, method: str, path: str, payload: Optional[Dict[str, Any]]) -> Tuple[int, bytes]:
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    head = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+    writer.write(head.encode("latin-1") + body)
+    await writer.drain()
+
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("server closed the connection")
+    status = int(status_line.split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value.strip())
+    return status, await reader.readexactly(length) if length else b""
+
+
+def _scenario(name: str, i: int, deals: int, supplier: str, email_text: str) -> Tuple[str, str, Optional[Dict[str, Any]]]:
+    deal_id = f"LOAD-{i % deals:04d}"
+    if name == "score":
+        return "POST", "/v1/trades/score", {"supplier_name": supplier, "intent": "price_increase_request"}
+    if name == "deal":
+        return "GET", f"/v1/deals/{deal_id}", None
+    return "POST", "/v1/rounds", {
+        "deal_id": deal_id,
+        "supplier_name": supplier,
+        "subject": f"load test {i}",
+        "email_text": email_text,
+    }
+
+
+async def _client(cid: int, args, stop_at: float, latencies: List[float], statuses: Counter, email_text: str) -> None:
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    i = cid
+    try:
+        while time.perf_counter() < stop_at:
+            method, path, payload = _scenario(args.scenario, i, args.deals, args.supplier, email_text)
+            t0 = time.perf_counter()
+            try:
+                status, _ = await _request(reader, writer, method, path, payload)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                statuses["conn_error"] += 1
+                writer.close()
+                reader, writer = await asyncio.open_connection(args.host, args.port)
+                continue
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+            statuses[str(status)] += 1
+            i += args.concurrency
+    finally:
+        writer.close()
+
+
+async def run(args) -> Dict[str, Any]:
+    email_text = Path(args.email).read_text(encoding="utf-8")
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    started = time.perf_counter()
+    stop_at = started + args.duration
+    await asyncio.gather(*(_client(c, args, stop_at, latencies, statuses, email_text) for c in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    ok = statuses.get("200", 0)
+    return {
+        "scenario": args.scenario,
+        "concurrency": args.concurrency,
+        "duration_s": round(elapsed, 2),
+        "requests": sum(statuses.values()),
+        "ok_per_s": round(ok / elapsed, 1),
+        "requests_per_s": round(sum(statuses.values()) / elapsed, 1),
+        "statuses": dict(statuses),
+        "latency_ms": latency_summary(latencies),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--scenario", choices=["score", "deal", "round"], default="score")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds")
+    parser.add_argument("--deals", type=int, default=8, help="Distinct deal ids to spread requests over")
+    parser.add_argument("--supplier", default="Battila Turbines")
+    parser.add_argument("--email", default=str(ROOT / "data" / "emails" / "01_price_increase.txt"))
+    parser.add_argument("--json", dest="json_out", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    if args.json_out:
+        print(json.dumps(report, indent=2))
+    else:
+        s = report["latency_ms"]
+        print(f"{report['scenario']}: {report['requests']} requests in {report['duration_s']}s, concurrency {report['concurrency']}")
+        print(f"  sustained: {report['ok_per_s']} ok/s ({report['requests_per_s']} req/s incl. errors)")
+        print(f"  latency ms: p50 {s['p50']:.1f}  p95 {s['p95']:.1f}  p99 {s['p99']:.1f}  max {s['max']:.1f}")
+        print(f"  statuses: {report['statuses']}")
+    return 0 if report["statuses"].get("200") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+"""
+Crash-safe batch runner for negotiation rounds.
+
+Manifest: JSONL, one round per line, processed in file order per deal:
+  {"deal_id": "...", "email": "path/to/email.txt" | "email_text": "...", "subject": "...", "supplier_name": "..."}
+
+Every node output is checkpointed (CHECKPOINT_DB_PATH, default ./outputs/checkpoints.sqlite) and
+each manifest line is tracked in a ledger table in the same database. Re-running the same
+command after a crash or a failed LLM call skips finished lines and resumes unfinished rounds
+from their last completed node, so at most the node that was running is repeated.
+
+  PYTHONPATH=src python -m owpa.agent.batch rounds.jsonl --workers 4 --retries 2
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, ContextManager, Dict, List, Optional, Sequence
+
+from owpa.agent.checkpoint import NodeCheckpointer, thread_id
+from owpa.agent.ratelimit import llm_scope
+from owpa.config import load_config
+from owpa.data.storage import JsonlDealStateStore, sqlite_connect
+from owpa.schemas.deal_state import DealState
+
+
+DEFAULT_CHECKPOINT_DB = Path("./outputs/checkpoints.sqlite")
+
+_LEDGER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS batch_items (
+    batch_id    TEXT NOT NULL,
+    item        INTEGER NOT NULL,
+    deal_id     TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    start_round INTEGER,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    error       TEXT,
+    updated_at  REAL NOT NULL,
+    PRIMARY KEY (batch_id, item)
+);
+"""
+
+
+@dataclass
+class BatchItem:
+    index: int
+    deal_id: str
+    email_text: str
+    subject: str = ""
+    supplier_name: Optional[str] = None
+
+
+@dataclass
+class ItemResult:
+    index: int
+    deal_id: str
+    status: str  # done | failed | skipped
+    attempts: int = 0
+    resumed_nodes: List[str] = field(default_factory=list)
+    round_number: Optional[int] = None
+    error: Optional[str] = None
+
+
+def load_manifest(path: str | Path) -> List[BatchItem]:
+    p = Path(path)
+    items = []
+    with p.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            raw = json.loads(line)
+            text = raw.get("email_text")
+            if text is None:
+                text = (p.parent / raw["email"]).read_text(encoding="utf-8")
+            items.append(
+                BatchItem(
+                    index=len(items),
+                    deal_id=raw["deal_id"],
+                    email_text=text,
+                    subject=raw.get("subject") or "",
+                    supplier_name=raw.get("supplier_name"),
+                )
+            )
+    return items
+
+
+class _Ledger:
+    """
+    Per-line progress of one batch, keyed by a digest of the manifest contents.
+    """
+
+    def __init__(self, path: Path, batch_id: str):
+        self.path = path
+        self.batch_id = batch_id
+        with self._connect() as conn:
+            conn.executescript(_LEDGER_SCHEMA)
+
+    def _connect(self) -> ContextManager[sqlite3.Connection]:
+        return sqlite_connect(self.path)
+
+    def get(self, item: int) -> Optional[tuple[str, Optional[int]]]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT status, start_round FROM batch_items WHERE batch_id = ? AND item = ?", (self.batch_id, item)
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def set(self, item: BatchItem, status: str, *, start_round: Optional[int] = None, attempts: int = 0, error: Optional[str] = None) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO batch_items (batch_id, item, deal_id, status, start_round, attempts, error, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.batch_id, item.index, item.deal_id, status, start_round, attempts, error, time.time()),
+            )
+
+
+def _load_deal(store: JsonlDealStateStore, item: BatchItem) -> DealState:
+    deal = store.load_latest(item.deal_id)
+    if deal is not None:
+        return deal
+    if not item.supplier_name:
+        raise KeyError(f"Unknown deal {item.deal_id!r} and no supplier_name to start it")
+    return DealState(deal_id=item.deal_id, supplier_name=item.supplier_name)
+
+
+def _run_item(graph, checkpointer: NodeCheckpointer, store: JsonlDealStateStore, ledger: _Ledger, item: BatchItem, retries: int) -> ItemResult:
+    result = ItemResult(index=item.index, deal_id=item.deal_id, status="failed")
+    previous = ledger.get(item.index)
+    if previous is not None and previous[0] == "done":
+        result.status = "done"
+        return result
+
+    deal = _load_deal(store, item)
+    if previous is not None and previous[0] == "running" and previous[1] is not None and deal.round_number > previous[1]:
+        # Crashed after persist_state committed but before the ledger caught up.
+        ledger.set(item, "done", start_round=previous[1])
+        result.status, result.round_number = "done", deal.round_number
+        return result
+
+    ledger.set(item, "running", start_round=deal.round_number)
+    for attempt in range(1, retries + 2):
+        result.attempts = attempt
+        inputs = {"email_text": item.email_text, "supplier_email_subject": item.subject, "deal_state": deal}
+        resumed = checkpointer.completed_nodes(thread_id(inputs))
+        result.resumed_nodes = result.resumed_nodes or resumed
+        try:
+            with llm_scope("batch", item.deal_id):
+                out = graph.invoke(inputs)
+        except Exception as e:
+            result.error = f"{type(e).__name__}: {e}"
+            deal = _load_deal(store, item)  # nodes mutate the deal in place; retry from the stored snapshot
+            continue
+        result.status, result.error = "done", None
+        result.round_number = out["deal_state"].round_number
+        break
+
+    ledger.set(item, result.status, start_round=None if result.status == "done" else deal.round_number, attempts=result.attempts, error=result.error)
+    return result
+
+
+def run_batch(items: Sequence[BatchItem], *, batch_id: str, workers: int = 4, retries: int = 1, checkpoint_db: Optional[Path] = None, graph=None) -> List[ItemResult]:
+    """
+    Runs the manifest with one thread per deal (rounds of a deal stay in manifest order).
+    A deal stops at its first line that still fails after `retries`; its later lines are skipped.
+    """
+    from owpa.agent.graph import build_graph
+
+    cfg = load_config()
+    db_path = Path(checkpoint_db or cfg.checkpoint_db_path or DEFAULT_CHECKPOINT_DB).expanduser().resolve()
+    checkpointer = NodeCheckpointer(db_path, ttl_hours=cfg.checkpoint_ttl_hours)
+    ledger = _Ledger(db_path, batch_id)
+    store = JsonlDealStateStore(cfg.state_store_path)
+    graph = graph or build_graph(checkpointer=checkpointer)
+
+    by_deal: Dict[str, List[BatchItem]] = {}
+    for item in items:
+        by_deal.setdefault(item.deal_id, []).append(item)
+
+    def run_deal(deal_items: List[BatchItem]) -> List[ItemResult]:
+        out: List[ItemResult] = []
+        for item in deal_items:
+            if out and out[-1].status != "done":
+                out.append(ItemResult(index=item.index, deal_id=item.deal_id, status="skipped", error=f"line {out[-1].index} failed"))
+                continue
+            try:
+                out.append(_run_item(graph, checkpointer, store, ledger, item, retries))
+            except Exception as e:
+                out.append(ItemResult(index=item.index, deal_id=item.deal_id, status="failed", error=f"{type(e).__name__}: {e}"))
+        return out
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = [r for group in pool.map(run_deal, by_deal.values()) for r in group]
+    return sorted(results, key=lambda r: r.index)
+
+
+def manifest_batch_id(path: str | Path) -> str:
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()[:16]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("manifest", help="JSONL manifest of rounds")
+    parser.add_argument("--workers", type=int, default=4, help="Deals processed in parallel")
+    parser.add_argument("--retries", type=int, default=1, help="Resume attempts per failed round")
+    parser.add_argument("--checkpoint-db", default=None, help="Default: CHECKPOINT_DB_PATH or ./outputs/checkpoints.sqlite")
+    parser.add_argument("--batch-id", default=None, help="Ledger key (default: digest of the manifest)")
+    args = parser.parse_args(argv)
+
+    items = load_manifest(args.manifest)
+    results = run_batch(
+        items,
+        batch_id=args.batch_id or manifest_batch_id(args.manifest),
+        workers=args.workers,
+        retries=args.retries,
+        checkpoint_db=Path(args.checkpoint_db) if args.checkpoint_db else None,
+    )
+
+    counts: Dict[str, int] = {}
+    for r in results:
+        counts[r.status] = counts.get(r.status, 0) + 1
+        if r.status != "done" or r.resumed_nodes:
+            detail: Dict[str, Any] = {"status": r.status, "attempts": r.attempts}
+            if r.resumed_nodes:
+                detail["resumed"] = r.resumed_nodes
+            if r.error:
+                detail["error"] = r.error
+            print(f"line {r.index} {r.deal_id}: {json.dumps(detail)}")
+    print(f"{len(results)} rounds: " + ", ".join(f"{k}={v}" for k, v in sorted(counts.items())))
+    return 0 if counts.get("done", 0) == len(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
+
+class CassetteMiss(KeyError):
+    """Raised in replay mode when no recorded response exists for a prompt."""
+
+
+def cassette_mode() -> str:
+    """
+    off    -> call the live model (default)
+    replay -> serve recorded responses only; a miss raises CassetteMiss
+    record -> call the live model and store every response
+    """
+    v = os.getenv("OWPA_LLM_CASSETTE_MODE", "off").strip().lower()
+    return v if v in {"off", "replay", "record"} else "off"
+
+
+def cassette_dir() -> Path:
+    return Path(os.getenv("OWPA_LLM_CASSETTE_DIR", "./data/cassettes"))
+
+
+def cassette_key(system: str, user: str) -> str:
+    # Keyed on the prompt only (not the model) so cassettes survive model switches.
+    h = hashlib.sha256()
+    h.update(system.encode("utf-8"))
+    h.update(b"\x00")
+    h.update(user.encode("utf-8"))
+    return h.hexdigest()[:32]
+
+
+class CassetteStore:
+    """
+    Directory of recorded LLM responses, one JSON file per prompt:
+      {"key": "...", "model": "...", "system": "...", "user": "...", "response": "<raw text>"}
+    The raw model text is stored (not the parsed JSON) so parsing changes are exercised on replay.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path).expanduser().resolve()
+
+    def _file(self, key: str) -> Path:
+        return self.path / f"{key}.json"
+
+    def get(self, system: str, user: str) -> Optional[str]:
+        p = self._file(cassette_key(system, user))
+        if not p.exists():
+            return None
+        with p.open("r", encoding="utf-8") as f:
+            return json.load(f).get("response")
+
+    def put(self, system: str, user: str, response: str, *, model: str = "") -> Path:
+        key = cassette_key(system, user)
+        self.path.mkdir(parents=True, exist_ok=True)
+        p = self._file(key)
+        record = {"key": key, "model": model, "system": system, "user": user, "response": response}
+        with p.open("w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False, indent=2)
+        return p
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import functools
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Callable, ContextManager, Dict, List, Optional
+
+from owpa.agent.state import AgentState, dump_agent_state, load_agent_state
+from owpa.agent.tracing import annotate
+from owpa.data.storage import ensure_parent_dir, sqlite_connect
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS node_checkpoints (
+    thread_id   TEXT NOT NULL,
+    node        TEXT NOT NULL,
+    deal_id     TEXT NOT NULL,
+    output      TEXT NOT NULL,
+    created_at  REAL NOT NULL,
+    PRIMARY KEY (thread_id, node)
+);
+CREATE INDEX IF NOT EXISTS node_checkpoints_created ON node_checkpoints (created_at);
+"""
+
+# The node whose success commits the round; its thread is dropped afterwards.
+FINAL_NODE = "persist_state"
+# Threads that never reached FINAL_NODE are pruned once untouched for this long.
+DEFAULT_TTL_HOURS = 168.0
+
+
+def thread_id(state: AgentState) -> str:
+    """
+    "<deal_id>:<round_number>:<digest of email + subject + deal_state>" of a round's input.
+    Nodes change the deal, so only the first node computes it; checkpointed_node carries it
+    to the others in state["checkpoint_thread"]. A re-run with another supplier, open issues
+    or position is a new thread and replays nothing.
+    """
+    deal = state["deal_state"]
+    h = hashlib.sha256()
+    h.update((state.get("email_text") or "").strip().encode("utf-8"))
+    h.update(b"\x00")
+    h.update((state.get("supplier_email_subject") or "").strip().encode("utf-8"))
+    h.update(b"\x00")
+    h.update(deal.model_dump_json(exclude={"last_updated_at"}).encode("utf-8"))  # an audit stamp, not input
+    return f"{deal.deal_id}:{deal.round_number}:{h.hexdigest()[:16]}"
+
+
+class NodeCheckpointer:
+    """
+    SQLite store of per-node outputs for rounds that have not committed yet.
+    A rerun of the same round (same deal, round number and email) replays the recorded
+    outputs and only executes the nodes that never finished.
+    """
+
+    def __init__(self, path: str | Path, *, ttl_hours: float = DEFAULT_TTL_HOURS):
+        self.path = Path(path).expanduser().resolve()
+        ensure_parent_dir(self.path)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+        if ttl_hours > 0:
+            self.prune(ttl_hours * 3600.0)
+
+    def _connect(self) -> ContextManager[sqlite3.Connection]:
+        return sqlite_connect(self.path)
+
+    def get(self, thread: str, node: str) -> Optional[AgentState]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT output FROM node_checkpoints WHERE thread_id = ? AND node = ?", (thread, node)
+            ).fetchone()
+        return load_agent_state(json.loads(row[0])) if row else None
+
+    def put(self, thread: str, node: str, output: AgentState) -> None:
+        deal_id = thread.split(":", 1)[0]
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO node_checkpoints (thread_id, node, deal_id, output, created_at) VALUES (?, ?, ?, ?, ?)",
+                (thread, node, deal_id, json.dumps(dump_agent_state(output), ensure_ascii=False), time.time()),
+            )
+
+    def completed_nodes(self, thread: str) -> List[str]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT node FROM node_checkpoints WHERE thread_id = ? ORDER BY created_at", (thread,)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def delete_thread(self, thread: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM node_checkpoints WHERE thread_id = ?", (thread,))
+
+    def prune(self, max_age_s: float) -> int:
+        """
+        Drops abandoned threads: rounds whose last checkpoint is older than `max_age_s`.
+        Returns the number of threads removed.
+        """
+        cutoff = time.time() - max_age_s
+        with self._connect() as conn:
+            stale = [r[0] for r in conn.execute(
+                "SELECT thread_id FROM node_checkpoints GROUP BY thread_id HAVING MAX(created_at) < ?", (cutoff,)
+            )]
+            conn.executemany("DELETE FROM node_checkpoints WHERE thread_id = ?", [(t,) for t in stale])
+        return len(stale)
+
+    def pending_threads(self) -> Dict[str, List[str]]:
+        """
+        thread_id -> completed nodes, for rounds that started but never committed.
+        """
+        out: Dict[str, List[str]] = {}
+        with self._connect() as conn:
+            for thread, node in conn.execute("SELECT thread_id, node FROM node_checkpoints ORDER BY created_at"):
+                out.setdefault(thread, []).append(node)
+        return out
+
+
+def checkpointed_node(name: str, fn: Callable, checkpointer: Optional[NodeCheckpointer]) -> Callable:
+    """
+    Wraps a graph node so its output is recorded, and replayed instead of re-executed when
+    the same round runs again after a failure. Without a checkpointer the node is returned as is.
+    """
+    if checkpointer is None:
+        return fn
+
+    @functools.wraps(fn)
+    def wrapper(state):
+        thread = state.get("checkpoint_thread") or thread_id(state)
+        cached = checkpointer.get(thread, name)
+        if cached is not None:
+            annotate(resumed=True)
+            out = cached
+        else:
+            out = fn(state)
+            if "checkpoint_thread" not in state:
+                out = {**out, "checkpoint_thread": thread}
+            checkpointer.put(thread, name, out)
+        if name == FINAL_NODE:
+            checkpointer.delete_thread(thread)
+        return out
+
+    return wrapper
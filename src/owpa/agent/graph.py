@@ -1,8 +1,15 @@
 from __future__ import annotations
 
+import functools
+import time
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
 from langgraph.graph import END, StateGraph
 
+from owpa.agent.checkpoint import NodeCheckpointer, checkpointed_node
+from owpa.agent.incremental import NodeMemo, memoized_node
 from owpa.agent.state import AgentState
+from owpa.agent.tracing import traced_node
 from owpa.agent.nodes.ingest import ingest_node
 from owpa.agent.nodes.classify import classify_node
 from owpa.agent.nodes.extract import extract_node
@@ -13,17 +20,79 @@ from owpa.agent.nodes.draft_email import draft_email_node
 from owpa.agent.nodes.persist_state import persist_state_node
 
 
-def build_graph():
+# Registration order is pipeline order.
+NODES = [
+    ("ingest", ingest_node),
+    ("classify", classify_node),
+    ("extract", extract_node),
+    ("load_memory", load_memory_node),
+    ("predict_trade", predict_trade_node),
+    ("coach", coach_node),
+    ("draft_email", draft_email_node),
+    ("persist_state", persist_state_node),
+]
+
+
+# coach and draft_email both start when predict_trade finishes (the draft may stream from an LLM
+# while coach notes are built). Parallel nodes may only write their own output key.
+BRANCH_OUTPUTS = {"coach": "coach_notes", "draft_email": "email_draft"}
+
+
+def _branch(name: str, fn: Callable) -> Callable:
+    key = BRANCH_OUTPUTS.get(name)
+    if key is None:
+        return fn
+
+    @functools.wraps(fn)
+    def wrapper(state):
+        return {key: fn(state)[key]}
+
+    return wrapper
+
+
+# Custom stream event carrying a node's own run time (see _timed / stream_round).
+NODE_MS_EVENT = "node_ms"
+
+
+def _timed(name: str, fn: Callable) -> Callable:
+    # Wall time of this node alone; parallel branches overlap, so gaps between updates say nothing.
+    @functools.wraps(fn)
+    def wrapper(state):
+        t0 = time.perf_counter()
+        out = fn(state)
+        ms = round((time.perf_counter() - t0) * 1000.0, 3)
+        try:
+            from langgraph.config import get_stream_writer
+
+            get_stream_writer()({NODE_MS_EVENT: {name: ms}})
+        except RuntimeError:
+            pass  # called outside a graph run
+        return out
+
+    return wrapper
+
+
+def build_graph(checkpointer: Optional[NodeCheckpointer] = None, memo: Optional[NodeMemo] = None):
+    """
+    Compiles the round pipeline. Node outputs are checkpointed when a checkpointer is passed
+    or CHECKPOINT_DB_PATH is set, so a failed round resumes from the last finished node.
+    Nodes whose inputs did not change since an earlier run of this graph are replayed from
+    `memo` (one is created when NODE_MEMO_SIZE > 0), see owpa.agent.incremental.
+    """
+    from owpa.config import load_config
+
+    cfg = load_config()
+    if checkpointer is None:
+        db_path = cfg.checkpoint_db_path
+        checkpointer = NodeCheckpointer(db_path, ttl_hours=cfg.checkpoint_ttl_hours) if db_path else None
+    if memo is None and cfg.node_memo_size > 0:
+        memo = NodeMemo(cfg.node_memo_size)
+
     g = StateGraph(AgentState)
 
-    g.add_node("ingest", ingest_node)
-    g.add_node("classify", classify_node)
-    g.add_node("extract", extract_node)
-    g.add_node("load_memory", load_memory_node)
-    g.add_node("predict_trade", predict_trade_node)
-    g.add_node("coach", coach_node)
-    g.add_node("draft_email", draft_email_node)
-    g.add_node("persist_state", persist_state_node)
+    for name, fn in NODES:
+        node = _branch(name, memoized_node(name, fn, memo))
+        g.add_node(name, _timed(name, traced_node(name, checkpointed_node(name, node, checkpointer))))
 
     g.set_entry_point("ingest")
     g.add_edge("ingest", "classify")
@@ -31,8 +100,39 @@ def build_graph():
     g.add_edge("extract", "load_memory")
     g.add_edge("load_memory", "predict_trade")
     g.add_edge("predict_trade", "coach")
-    g.add_edge("coach", "draft_email")
-    g.add_edge("draft_email", "persist_state")
+    g.add_edge("predict_trade", "draft_email")
+    g.add_edge(["coach", "draft_email"], "persist_state")
     g.add_edge("persist_state", END)
 
-    return g.compile()
+    graph = g.compile()
+    graph.node_memo = memo
+    return graph
+
+
+def stream_round(
+    graph, inputs: Dict[str, Any], *, on_custom: Optional[Callable[[Any], None]] = None
+) -> Iterator[Tuple[str, Dict[str, Any], float]]:
+    """
+    Runs one round as a stream of per-node updates.
+    Yields (node name, state merged so far, ms the node itself ran) as soon as each node
+    finishes, so callers can render partial results before the whole pipeline completes.
+    Graphs not built by build_graph report ms since the previous update instead.
+    Custom events written by nodes (e.g. draft tokens) go to `on_custom` when given.
+    """
+    state: Dict[str, Any] = dict(inputs)
+    node_ms: Dict[str, float] = {}
+    last = time.perf_counter()
+    for mode, chunk in graph.stream(inputs, stream_mode=["updates", "custom"]):
+        if mode == "custom":
+            if isinstance(chunk, dict) and NODE_MS_EVENT in chunk:
+                node_ms.update(chunk[NODE_MS_EVENT])
+            elif on_custom is not None:
+                on_custom(chunk)
+            continue
+        now = time.perf_counter()
+        since_last_ms = round((now - last) * 1000.0, 3)
+        last = now
+        for node, update in chunk.items():
+            if isinstance(update, dict):
+                state.update(update)
+            yield node, state, node_ms.pop(node, since_last_ms)
@@ -0,0 +1,204 @@
+"""
+Incremental re-runs: node outputs memoized by a fingerprint of the state they read.
+
+Every node module declares READS and WRITES, as state paths:
+  "trade_options"                        top-level AgentState key
+  "deal_state.supplier_ask"              DealState field
+  "deal_state.metadata.trade_option_refs" DealState metadata key
+When a node runs again on a state whose READS (and USE_LLM) fingerprint the same, the
+values it wrote last time are put back instead of executing it. After a tweak to the deal
+(open issues, the supplier, ...) only the nodes downstream of the change recompute, and the LLM
+calls on an unchanged email are skipped.
+
+Nodes in ALWAYS_RUN read the clock, files or stores outside the state, or have side effects;
+they are never replayed, and neither are RULES_READ_CLOCK nodes when USE_LLM is off. The memo
+lives with one compiled graph and is keyed by the app config at the time it was created, so
+settings changed afterwards need a new graph. Off unless NODE_MEMO_SIZE > 0.
+"""
+from __future__ import annotations
+
+import copy
+import functools
+import hashlib
+import json
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import asdict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from owpa.agent.nodes import classify, coach, draft_email, extract, ingest, load_memory, persist_state, predict_trade
+from owpa.agent.tracing import annotate
+from owpa.agent.utils import use_llm
+
+# Pipeline order; (READS, WRITES) per node.
+DEPENDENCIES: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {
+    "ingest": (ingest.READS, ingest.WRITES),
+    "classify": (classify.READS, classify.WRITES),
+    "extract": (extract.READS, extract.WRITES),
+    "load_memory": (load_memory.READS, load_memory.WRITES),
+    "predict_trade": (predict_trade.READS, predict_trade.WRITES),
+    "coach": (coach.READS, coach.WRITES),
+    "draft_email": (draft_email.READS, draft_email.WRITES),
+    "persist_state": (persist_state.READS, persist_state.WRITES),
+}
+
+ALWAYS_RUN = frozenset({"ingest", "load_memory", "persist_state"})
+# Rule-based fallbacks that resolve relative dates against today ("by Friday" -> next Friday).
+RULES_READ_CLOCK = frozenset({"extract"})
+
+
+class _Missing:
+    # Recorded for metadata keys a node removed; survives the memo's deep copies.
+    def __deepcopy__(self, memo: dict) -> "_Missing":
+        return self
+
+    def __repr__(self) -> str:
+        return "<missing>"
+
+
+_MISSING = _Missing()
+
+
+def _get(state: Any, path: str) -> Any:
+    obj = state
+    for part in path.split("."):
+        obj = obj.get(part, _MISSING) if isinstance(obj, dict) else getattr(obj, part, _MISSING)
+        if obj is _MISSING or obj is None:
+            return obj
+    return obj
+
+
+def _set(state: Any, path: str, value: Any) -> None:
+    *parents, leaf = path.split(".")
+    obj = state
+    for part in parents:
+        obj = obj[part] if isinstance(obj, dict) else getattr(obj, part)
+    if isinstance(obj, dict):
+        if value is _MISSING:
+            obj.pop(leaf, None)
+        else:
+            obj[leaf] = value
+    else:
+        setattr(obj, leaf, value)
+
+
+def _jsonable(value: Any) -> Any:
+    if value is _MISSING:
+        return {"<missing>": True}
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    return value
+
+
+def _overlaps(a: str, b: str) -> bool:
+    return a == b or a.startswith(b + ".") or b.startswith(a + ".")
+
+
+def _digest(value: Any) -> str:
+    raw = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def config_digest() -> str:
+    from owpa.config import load_config
+
+    return _digest(asdict(load_config()))
+
+
+def fingerprint(state: Any, reads: Iterable[str], env: str = "") -> str:
+    """
+    Digest of the values at `reads`, `env` (the memo's config digest) and USE_LLM.
+    """
+    payload = {path: _jsonable(_get(state, path)) for path in reads}
+    return _digest([payload, env, use_llm()])
+
+
+def affected_nodes(changed: Iterable[str]) -> List[str]:
+    """
+    Nodes that recompute, in pipeline order, when the state paths in `changed` differ from the
+    last run: readers of a changed path, then readers of what those write, and so on.
+    ALWAYS_RUN nodes are included only when they depend on the change.
+    """
+    dirty = list(changed)
+    out = []
+    for name, (reads, writes) in DEPENDENCIES.items():
+        if any(_overlaps(r, c) for r in reads for c in dirty):
+            out.append(name)
+            dirty.extend(writes)
+    return out
+
+
+class NodeMemo:
+    """
+    Bounded LRU of (node, fingerprint) -> the values the node changed at its WRITES paths.
+    `env` (default: digest of the current app config) is part of every fingerprint.
+    """
+
+    def __init__(self, max_entries: int = 256, env: Optional[str] = None):
+        self.max_entries = max_entries
+        self.env = config_digest() if env is None else env
+        self._entries: OrderedDict[Tuple[str, str], Dict[str, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits: Counter[str] = Counter()
+        self.misses: Counter[str] = Counter()
+
+    def get(self, node: str, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            delta = self._entries.get((node, key))
+            if delta is None:
+                self.misses[node] += 1
+                return None
+            self._entries.move_to_end((node, key))
+            self.hits[node] += 1
+            return copy.deepcopy(delta)
+
+    def put(self, node: str, key: str, delta: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[(node, key)] = copy.deepcopy(delta)
+            self._entries.move_to_end((node, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {n: {"hits": self.hits[n], "misses": self.misses[n]} for n in sorted(set(self.hits) | set(self.misses))}
+
+
+def memoized_node(name: str, fn: Callable, memo: Optional[NodeMemo]) -> Callable:
+    """
+    Wraps a graph node so it is replayed from `memo` when its inputs are unchanged.
+    Without a memo, or for ALWAYS_RUN nodes, the node is returned as is.
+    """
+    if memo is None or name in ALWAYS_RUN or name not in DEPENDENCIES:
+        return fn
+    reads, writes = DEPENDENCIES[name]
+
+    @functools.wraps(fn)
+    def wrapper(state):
+        if name in RULES_READ_CLOCK and not use_llm():
+            return fn(state)
+        key = fingerprint(state, reads, memo.env)
+        delta = memo.get(name, key)
+        if delta is not None:
+            annotate(memo="hit")
+            for path, value in delta.items():
+                _set(state, path, value)
+            return state
+
+        before = {path: _jsonable(_get(state, path)) for path in writes}
+        out = fn(state)
+        # Only what the node changed: a replay must leave everything else as the new input has it.
+        memo.put(name, key, {p: _get(out, p) for p in writes if _jsonable(_get(out, p)) != before[p]})
+        return out
+
+    return wrapper
@@ -1,9 +1,14 @@
 from __future__ import annotations
 
-import re
+from typing import Any, Optional
+
+from pydantic import BaseModel, field_validator
 
 from owpa.agent.state import AgentState
+from owpa.agent.structured import StructuredOutput
+from owpa.agent.tracing import annotate
 from owpa.agent.utils import llm_json, use_llm
+from owpa.data.near_dup import changed_sentences, get_index, variant_key
 from owpa.schemas.deal_state import IntentType, SupplierAsk
 
 
@@ -20,6 +25,21 @@ _SCHEMA = """
 """.strip()
 
 
+class ClassifyReply(BaseModel):
+    intent: IntentType = IntentType.OTHER
+    reason: Optional[str] = None
+
+    @field_validator("intent", mode="before")
+    @classmethod
+    def _normalize_intent(cls, v: Any) -> Any:
+        # "Price increase request" -> "price_increase_request"
+        return "_".join(v.strip().lower().replace("-", " ").split()) if isinstance(v, str) else v
+
+
+_OUTPUT = StructuredOutput(ClassifyReply, _SCHEMA, required=("intent",))
+_VARIANT = variant_key(_SYSTEM, _SCHEMA)
+
+
 def _rule_classify(text: str) -> dict:
     t = text.lower()
     if any(k in t for k in ["increase", "uplift", "adjustment", "%", "escalation", "inflation"]):
@@ -33,17 +53,38 @@ def _rule_classify(text: str) -> dict:
     return {"intent": "other", "reason": None}
 
 
+# Dependencies for incremental re-runs (owpa.agent.incremental).
+READS = ("email_text", "deal_state.supplier_ask")
+WRITES = ("deal_state.supplier_ask",)
+
+
 def classify_node(state: AgentState) -> AgentState:
     email_text = state.get("email_text", "")
 
-    if use_llm():
+    index = get_index() if use_llm() else None
+    match = index.lookup("classify", _VARIANT, email_text) if index is not None else None
+    if match is not None and not match.exact:
+        # An added or dropped sentence can change the intent (a new deadline, a redline): classify again.
+        changed = changed_sentences(match.text, email_text) + changed_sentences(email_text, match.text)
+        if changed:
+            annotate(near_dup_changed_sentences=len(changed))
+            match = None
+    if match is not None:
+        # Same form letter as an analyzed email: its intent does not depend on names or numbers.
+        data = match.data
+        annotate(reused="near_duplicate", near_dup_distance=match.distance, near_dup_similarity=match.similarity)
+    elif use_llm():
         data = llm_json(
             _SYSTEM,
             f"Email:\n{email_text}\n\nClassify the intent.",
-            schema_hint=_SCHEMA,
+            output=_OUTPUT,
+            node="classify",
         )
+        if index is not None:
+            index.add("classify", _VARIANT, email_text, data)
     else:
         data = _rule_classify(email_text)
+        annotate(fallback="rules")
 
     intent_str = (data.get("intent") or "other").strip()
     reason = data.get("reason")
@@ -1,7 +1,20 @@
 from __future__ import annotations
 
-from owpa.agent.state import AgentState
-from owpa.schemas.outputs import CoachNotes, TradeOption
+from owpa.agent.policy import compile_policy
+from owpa.agent.state import AgentState, get_trade_options
+from owpa.schemas.outputs import CoachNotes
+
+
+READS = (
+    "supplier_memory",
+    "playbook",
+    "trade_options",
+    "deal_state.supplier_name",
+    "deal_state.supplier_ask",
+    "deal_state.open_issues",
+    "deal_state.metadata.trade_options",
+)
+WRITES = ("coach_notes",)
 
 
 def coach_node(state: AgentState) -> AgentState:
@@ -10,14 +23,7 @@ def coach_node(state: AgentState) -> AgentState:
     playbook = state["playbook"]
     ask = deal.supplier_ask
 
-    trade_options = []
-    raw = deal.metadata.get("trade_options", [])
-    if isinstance(raw, list):
-        for item in raw:
-            try:
-                trade_options.append(TradeOption.model_validate(item))
-            except Exception:
-                pass
+    trade_options = get_trade_options(state)
 
     summary = []
     extracted = []
@@ -42,14 +48,8 @@ def coach_node(state: AgentState) -> AgentState:
         if ask.raw_snippets:
             extracted.append("Evidence snippets: " + " | ".join(ask.raw_snippets[:2]))
 
-    # Policy flags (simple MVP gates)
-    thresholds = playbook.get("policy_thresholds", {})
-    approval_uplift = thresholds.get("price_uplift_pct_requires_internal_approval", 5.0)
-
-    if ask and ask.headline_price_change_pct and ask.headline_price_change_pct.value > float(approval_uplift):
-        risks.append(
-            f"Approval flag: uplift > {approval_uplift}% threshold → internal approval likely required before committing."
-        )
+    # Policy flags: every playbook threshold, compiled once per playbook
+    risks.extend(compile_policy(playbook).flags(deal))
 
     # Supplier behavior reminders (stateful value)
     if supplier.typical_tactics:
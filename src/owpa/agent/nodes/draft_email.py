@@ -1,27 +1,34 @@
 from __future__ import annotations
 
-from owpa.agent.state import AgentState
+import re
+import time
+from typing import Callable, Optional
+
+from owpa.agent.state import AgentState, get_trade_options
+from owpa.agent.tracing import annotate
+from owpa.agent.utils import llm_stream, use_llm
+from owpa.config import load_config
 from owpa.glossary import DEFAULT_GLOSSARY
+from owpa.schemas.deal_state import DealState
 from owpa.schemas.outputs import EmailDraft, TradeOption
+from owpa.schemas.supplier_memory import SupplierMemory
 
 
-def draft_email_node(state: AgentState) -> AgentState:
-    deal = state["deal_state"]
-    ask = deal.supplier_ask
+SUBJECT = "Re: WTG + LTSA commercial alignment and next steps"
+DISCLAIMER = "Draft is based on the current email context; please verify numbers/dates against the source message before sending."
 
-    trade_options = []
-    raw = deal.metadata.get("trade_options", [])
-    if isinstance(raw, list):
-        for item in raw:
-            try:
-                trade_options.append(TradeOption.model_validate(item))
-            except Exception:
-                pass
+_SYSTEM = """You draft external procurement emails to offshore wind WTG+LTSA suppliers.
+Write only the email body (greeting to sign-off "Procurement Team"), plain text, under 220 words.
+Never disclose internal targets, limits, approvals or predicted acceptance.
+Never introduce numbers, percentages or dates that are not in the supplier email or the facts given.
+Every give must be paired with a get.
+"""
 
-    # Pick best trade option for the draft (top-ranked)
-    chosen = trade_options[0] if trade_options else None
+_PCT = re.compile(r"(\d+(?:\.\d+)?)\s*%")
 
-    subject = f"Re: WTG + LTSA commercial alignment and next steps"
+
+def template_draft(deal: DealState, chosen: Optional[TradeOption]) -> EmailDraft:
+    ask = deal.supplier_ask
 
     # Keep it procurement-safe: no internal targets, no invented numbers
     lines = []
@@ -52,21 +59,112 @@ def draft_email_node(state: AgentState) -> AgentState:
     lines.append("")
     lines.append("Best regards,")
     lines.append("Procurement Team")
+    return _draft("\n".join(lines))
 
+
+def _draft(body: str) -> EmailDraft:
     # glossary term detection (very lightweight)
-    glossary_used = []
-    body = "\n".join(lines)
-    for term in ["WTG", "LTSA", "LDs", "Indexation", "Availability guarantee"]:
-        if term in body:
-            glossary_used.append(term)
-
-    draft = EmailDraft(
-        subject=subject,
+    glossary_used = [term for term in ["WTG", "LTSA", "LDs", "Indexation", "Availability guarantee"] if term in body]
+    return EmailDraft(
+        subject=SUBJECT,
         body=body,
         tone="professional_firm",
         glossary_terms_used=glossary_used,
-        missing_info_disclaimer="Draft is based on the current email context; please verify numbers/dates against the source message before sending.",
+        missing_info_disclaimer=DISCLAIMER,
+    )
+
+
+def _draft_prompt(state: AgentState, deal: DealState, chosen: Optional[TradeOption]) -> str:
+    ask = deal.supplier_ask
+    supplier: Optional[SupplierMemory] = state.get("supplier_memory")
+    facts = [f"Supplier: {deal.supplier_name}"]
+    if supplier is not None:
+        facts.append(f"Supplier style: {supplier.style.replace('_', ' ')}")
+        if supplier.typical_tactics:
+            facts.append("Typical tactics to stay calm about: " + "; ".join(supplier.typical_tactics[:3]))
+    if ask:
+        facts.append(f"Intent: {ask.intent.value.replace('_', ' ')}" + (f" ({ask.reason})" if ask.reason else ""))
+        if ask.headline_price_change_pct:
+            facts.append(f"Requested adjustment: {ask.headline_price_change_pct.value:.1f}%")
+        if ask.requested_trades:
+            facts.append("They asked for: " + "; ".join(ask.requested_trades))
+    if chosen:
+        facts.append(f"Trade package to propose - we offer: {chosen.we_offer}; we request: {chosen.we_request}")
+    glossary = ", ".join(f"{k} = {v}" for k, v in list(DEFAULT_GLOSSARY.items())[:4])
+    return (
+        f"Supplier email:\n{state.get('email_text', '')}\n\nFacts:\n- " + "\n- ".join(facts)
+        + f"\n\nGlossary (spell out on first use if helpful): {glossary}\n\nDraft the reply body."
     )
 
+
+def _stream_writer() -> Callable[[dict], None]:
+    # Custom stream events reach graph.stream(..., stream_mode="custom") consumers; no-op outside a graph run.
+    try:
+        from langgraph.config import get_stream_writer
+
+        return get_stream_writer()
+    except RuntimeError:
+        return lambda _event: None
+
+
+def llm_draft(state: AgentState, deal: DealState, chosen: Optional[TradeOption], fallback: EmailDraft) -> EmailDraft:
+    """
+    Streams an LLM-written body, emitting {"draft_delta": text} per token and {"draft_ttft_ms": ms}
+    on the first one. Any timeout, error or percentage not grounded in the email / template
+    emits {"draft_reset": True} and returns the template draft.
+    """
+    cfg = load_config()
+    write = _stream_writer()
+    parts = []
+    t0 = time.perf_counter()
+    try:
+        for delta in llm_stream(
+            _SYSTEM,
+            _draft_prompt(state, deal, chosen),
+            first_token_timeout=cfg.draft_first_token_timeout_s,
+            timeout=cfg.draft_timeout_s,
+            node="draft_email",
+        ):
+            if not parts:
+                write({"draft_ttft_ms": round((time.perf_counter() - t0) * 1000.0, 3)})
+            parts.append(delta)
+            write({"draft_delta": delta})
+    except Exception as e:
+        annotate(fallback="template", draft_error=f"{type(e).__name__}: {e}")
+        write({"draft_reset": True})
+        return fallback
+
+    body = "".join(parts).strip()
+    grounded = {float(p) for p in _PCT.findall(state.get("email_text", "") + "\n" + fallback.body)}
+    if not body or any(float(p) not in grounded for p in _PCT.findall(body)):
+        annotate(fallback="template", draft_error="empty or ungrounded numbers")
+        write({"draft_reset": True})
+        return fallback
+    return _draft(body)
+
+
+READS = (
+    "email_text",
+    "supplier_memory",
+    "trade_options",
+    "deal_state.supplier_name",
+    "deal_state.supplier_ask",
+    "deal_state.metadata.trade_options",
+)
+WRITES = ("email_draft",)
+
+
+def draft_email_node(state: AgentState) -> AgentState:
+    deal = state["deal_state"]
+
+    trade_options = get_trade_options(state)
+
+    # Pick best trade option for the draft (top-ranked)
+    chosen = trade_options[0] if trade_options else None
+
+    draft = template_draft(deal, chosen)
+    if load_config().draft_mode == "llm" and use_llm():
+        draft = llm_draft(state, deal, chosen, draft)
+
     state["email_draft"] = draft
     return state
@@ -2,9 +2,15 @@ from __future__ import annotations
 
 import re
 from datetime import datetime, timedelta
+from typing import Any, List, Optional
+
+from pydantic import BaseModel, field_validator
 
 from owpa.agent.state import AgentState
+from owpa.agent.structured import StructuredOutput
+from owpa.agent.tracing import annotate
 from owpa.agent.utils import llm_json, use_llm
+from owpa.data.near_dup import NearDuplicate, changed_sentences, get_index, variant_key
 from owpa.schemas.deal_state import Percentage, SupplierAsk
 
 
@@ -26,6 +32,32 @@ _SCHEMA = """
 """.strip()
 
 
+class ExtractReply(BaseModel):
+    headline_price_change_pct: Optional[float] = None
+    requested_trades: List[str] = []
+    deadline_iso: Optional[str] = None
+    raw_snippets: List[str] = []
+
+    @field_validator("headline_price_change_pct", mode="before")
+    @classmethod
+    def _strip_percent(cls, v: Any) -> Any:
+        # "+9 %" -> "9"
+        if isinstance(v, str):
+            return v.replace("%", "").replace("+", "").strip() or None
+        return v
+
+    @field_validator("requested_trades", "raw_snippets", mode="before")
+    @classmethod
+    def _as_strings(cls, v: Any) -> Any:
+        if v is None:
+            return []
+        return [str(x) for x in v if x is not None] if isinstance(v, list) else v
+
+
+_OUTPUT = StructuredOutput(ExtractReply, _SCHEMA)
+_VARIANT = variant_key(_SYSTEM, _SCHEMA)
+
+
 def _regex_extract_pct(text: str) -> float | None:
     # Finds patterns like "9%" or "+ 9 %"
     m = re.search(r"([+-]?\s*\d{1,2}(\.\d+)?)\s*%", text)
@@ -38,6 +70,14 @@ def _regex_extract_pct(text: str) -> float | None:
         return None
 
 
+def _pct_snippet(text: str) -> str:
+    # best-effort snippet around %
+    idx = text.find("%")
+    start = max(0, idx - 60)
+    end = min(len(text), idx + 60)
+    return text[start:end].strip()
+
+
 def _rule_extract(text: str) -> dict:
     pct = _regex_extract_pct(text)
 
@@ -54,11 +94,7 @@ def _rule_extract(text: str) -> dict:
 
     snippets = []
     if pct is not None:
-        # best-effort snippet around %
-        idx = text.find("%")
-        start = max(0, idx - 60)
-        end = min(len(text), idx + 60)
-        snippets.append(text[start:end].strip())
+        snippets.append(_pct_snippet(text))
 
     # Deadline: very rough fallback (LLM is better). Use "by Friday" heuristic.
     deadline_iso = None
@@ -81,17 +117,77 @@ def _rule_extract(text: str) -> dict:
     }
 
 
+def _reuse(match: NearDuplicate, email_text: str) -> Optional[dict]:
+    """
+    The extraction of a near-duplicate email adapted to this one, or None when its percentage
+    cannot be re-verified or some of its sentences are gone from this email (the trades or
+    deadline they produced cannot be told apart). The percentage is re-read by the span
+    extractor, and only sentences that are new or changed (percentages aside) go to the LLM.
+    """
+    removed = changed_sentences(email_text, match.text)
+    if removed:
+        annotate(near_dup_removed_sentences=len(removed))
+        return None
+
+    data = dict(match.data)
+    old_pct, new_pct = _regex_extract_pct(match.text), _regex_extract_pct(email_text)
+    if new_pct != old_pct:
+        if data.get("headline_price_change_pct") != old_pct:
+            return None  # the stored number is not the one the span extractor sees
+        data["headline_price_change_pct"] = new_pct
+
+    flat = " ".join(email_text.split())
+    snippets = [x for x in data.get("raw_snippets") or [] if " ".join(str(x).split()) in flat]
+    if new_pct is not None and new_pct != old_pct:
+        snippets.append(_pct_snippet(email_text))
+    data["raw_snippets"] = snippets
+
+    changed = changed_sentences(match.text, email_text)
+    annotate(reused="near_duplicate", near_dup_distance=match.distance, reanalyzed_sentences=len(changed))
+    if changed:
+        part = llm_json(
+            _SYSTEM,
+            "Email excerpt (sentences that differ from an already analyzed letter):\n"
+            + "\n".join(changed)
+            + "\n\nExtract key facts. If absent, use null/empty.",
+            output=_OUTPUT,
+            node="extract",
+        )
+        if part.get("headline_price_change_pct") is not None:
+            data["headline_price_change_pct"] = part["headline_price_change_pct"]
+        if part.get("deadline_iso"):
+            data["deadline_iso"] = part["deadline_iso"]
+        trades = list(data.get("requested_trades") or [])
+        data["requested_trades"] = trades + [t for t in part.get("requested_trades") or [] if t not in trades]
+        data["raw_snippets"] = data["raw_snippets"] + list(part.get("raw_snippets") or [])
+    return data
+
+
+READS = ("email_text", "deal_state.supplier_ask")
+WRITES = ("deal_state.supplier_ask",)
+
+
 def extract_node(state: AgentState) -> AgentState:
     email_text = state.get("email_text", "")
 
-    if use_llm():
+    index = get_index() if use_llm() else None
+    match = index.lookup("extract", _VARIANT, email_text) if index is not None else None
+    data = _reuse(match, email_text) if match is not None else None
+    if data is not None:
+        if not match.exact:
+            index.add("extract", _VARIANT, email_text, data)
+    elif use_llm():
         data = llm_json(
             _SYSTEM,
             f"Email:\n{email_text}\n\nExtract key facts. If absent, use null/empty.",
-            schema_hint=_SCHEMA,
+            output=_OUTPUT,
+            node="extract",
         )
+        if index is not None:
+            index.add("extract", _VARIANT, email_text, data)
     else:
         data = _rule_extract(email_text)
+        annotate(fallback="rules")
 
     deal = state["deal_state"]
     ask = deal.supplier_ask or SupplierAsk(intent=deal.supplier_ask.intent if deal.supplier_ask else None)  # type: ignore
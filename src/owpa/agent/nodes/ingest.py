@@ -5,6 +5,16 @@ from datetime import datetime
 from owpa.agent.state import AgentState
 
 
+# Also stamps the receive time, so it runs on every round (owpa.agent.incremental.ALWAYS_RUN).
+READS = ("email_text", "supplier_email_subject", "deal_state.last_supplier_email_subject")
+WRITES = (
+    "deal_state.last_supplier_email_subject",
+    "deal_state.last_supplier_email_received_at",
+    "deal_state.last_updated_at",
+    "deal_state.metadata.last_email_text",
+)
+
+
 def ingest_node(state: AgentState) -> AgentState:
     deal = state["deal_state"]
 
@@ -1,18 +1,57 @@
 from __future__ import annotations
 
+import threading
+from pathlib import Path
+from typing import Dict, Tuple
+
 from owpa.agent.state import AgentState
 from owpa.config import load_config
 from owpa.data.loader import get_supplier, load_playbook, load_suppliers_fixture
+from owpa.data.supplier_matrix import shared_suppliers
+from owpa.data.supplier_store import SupplierMemoryStore
+from owpa.schemas.supplier_memory import SupplierMemory
+
+
+# Also reads the playbook and supplier files / stores, which the state does not carry.
+READS = ("deal_state.supplier_name",)
+WRITES = ("supplier_memory", "playbook", "deal_state.metadata.supplier_id")
+
+
+# Learned supplier memory by (store, supplier_id), with the version it was read at (read-only downstream).
+_LEARNED: Dict[Tuple[Path, str], Tuple[int, SupplierMemory]] = {}
+_learned_lock = threading.Lock()
+
+
+def _learned_supplier(store: SupplierMemoryStore, supplier_name: str) -> SupplierMemory:
+    # One indexed row per round; the full history is re-read only after a closed deal bumped the version.
+    supplier_id, version = store.ref(supplier_name=supplier_name)
+    key = (store.path, supplier_id)
+    with _learned_lock:
+        cached = _LEARNED.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    supplier = store.get(supplier_id=supplier_id)
+    with _learned_lock:
+        _LEARNED[key] = (version, supplier)
+    return supplier
 
 
 def load_memory_node(state: AgentState) -> AgentState:
     cfg = load_config()
 
-    suppliers = load_suppliers_fixture(cfg.suppliers_fixture_path)
     playbook = load_playbook(cfg.playbook_path)
 
     deal = state["deal_state"]
-    supplier = get_supplier(suppliers, supplier_name=deal.supplier_name)
+    if cfg.supplier_memory_db_path:
+        # Learned memory: episodes and preferences updated by closed deals.
+        store = SupplierMemoryStore(cfg.supplier_memory_db_path, seed_fixture=cfg.suppliers_fixture_path)
+        supplier = _learned_supplier(store, deal.supplier_name)
+    elif cfg.supplier_matrix_dir:
+        # Fixture built once into shared memory-mapped arrays; only this supplier is materialized.
+        supplier = shared_suppliers(cfg.suppliers_fixture_path, cfg.supplier_matrix_dir).get(supplier_name=deal.supplier_name)
+    else:
+        suppliers = load_suppliers_fixture(cfg.suppliers_fixture_path)
+        supplier = get_supplier(suppliers, supplier_name=deal.supplier_name)
 
     state["supplier_memory"] = supplier
     state["playbook"] = playbook
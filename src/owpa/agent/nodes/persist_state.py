@@ -1,10 +1,34 @@
 from __future__ import annotations
 
+import sqlite3
 from datetime import datetime
 
 from owpa.agent.state import AgentState
+from owpa.agent.tracing import annotate
 from owpa.config import load_config
-from owpa.data.storage import JsonlDealStateStore
+from owpa.data.aggregates import PortfolioAggregates, approval_threshold
+from owpa.data.deadlines import DeadlineIndex
+from owpa.data.storage import JsonlDealStateStore, VersionConflict
+from owpa.schemas.deal_state import DealState
+
+MAX_REBASES = 5
+
+# Fields a round writes from the supplier email; everything else belongs to the stored deal.
+ROUND_FIELDS = ("last_supplier_email_subject", "last_supplier_email_received_at", "supplier_ask")
+
+
+def rebase_round(ours: DealState, latest: DealState) -> DealState:
+    """
+    Replays this round's email-derived fields on top of a snapshot another writer stored meanwhile.
+    """
+    update = {f: getattr(ours, f) for f in ROUND_FIELDS}
+    update["metadata"] = {**latest.metadata, **ours.metadata}
+    return latest.model_copy(update=update, deep=True)
+
+
+# Side effects (state store, aggregates): never replayed.
+READS = ("deal_state", "playbook")
+WRITES = ("deal_state",)
 
 
 def persist_state_node(state: AgentState) -> AgentState:
@@ -12,9 +36,32 @@ def persist_state_node(state: AgentState) -> AgentState:
     store = JsonlDealStateStore(cfg.state_store_path)
 
     deal = state["deal_state"]
-    deal.round_number += 1
-    deal.last_updated_at = datetime.utcnow()
+    base_round = deal.round_number
+
+    for attempt in range(MAX_REBASES + 1):
+        deal.round_number = base_round + 1
+        deal.last_updated_at = datetime.utcnow()
+        try:
+            store.append_if_version(deal, base_round)
+            break
+        except VersionConflict:
+            latest = store.load_latest(deal.deal_id)
+            if attempt == MAX_REBASES or latest is None:
+                raise
+            deal = rebase_round(deal, latest)
+            base_round = latest.round_number
+    if attempt:
+        annotate(rebased=attempt)
+
+    # Aggregates and deadlines are derived data (rebuildable from the store); never fail a stored round over them.
+    try:
+        PortfolioAggregates(cfg.aggregates_db_path).apply(deal, threshold=approval_threshold(state.get("playbook")))
+    except sqlite3.Error as e:
+        annotate(aggregates_error=str(e))
+    try:
+        DeadlineIndex(cfg.deadlines_db_path).apply(deal)
+    except sqlite3.Error as e:
+        annotate(deadlines_error=str(e))
 
-    store.append(deal)
     state["deal_state"] = deal
     return state
@@ -1,7 +1,10 @@
 from __future__ import annotations
 
+from typing import List, Optional, Sequence, Tuple
+
 from owpa.agent.state import AgentState
 from owpa.schemas.outputs import TradeOption
+from owpa.schemas.supplier_memory import SupplierMemory
 
 
 def _similarity_score(intent: str, episode_context: str) -> float:
@@ -17,53 +20,66 @@ def _similarity_score(intent: str, episode_context: str) -> float:
     return min(0.5, s)
 
 
-def predict_trade_node(state: AgentState) -> AgentState:
-    supplier = state["supplier_memory"]
-    deal = state["deal_state"]
-    ask = deal.supplier_ask
-
-    if ask is None:
-        state["deal_state"].metadata["prediction_note"] = "No supplier ask available."
-        return state
-
-    # Candidate trades (MVP) – deliberately small and explainable
-    candidates = [
-        ("earlier milestone payment (improve cashflow)", "reduce headline uplift"),
-        ("extend LTSA term by 2 years", "reduce headline uplift"),
-        ("accept capped indexation (cap/floor + transparency)", "reduce base uplift now"),
-        ("bundle critical spares package", "reduce service uplift / improve availability terms"),
-        ("adjust delay LDs structure to capped LD + recovery plan (LDs = Liquidated Damages)", "reduce uplift / confirm slot")
-    ]
-
+# Candidate trades (MVP) – deliberately small and explainable.
+# (option_id, we_offer, we_request); option_id is what gets persisted with the deal.
+CANDIDATE_TRADES = [
+    ("payment_acceleration", "earlier milestone payment (improve cashflow)", "reduce headline uplift"),
+    ("ltsa_term_extension", "extend LTSA term by 2 years", "reduce headline uplift"),
+    ("capped_indexation", "accept capped indexation (cap/floor + transparency)", "reduce base uplift now"),
+    ("spares_bundle", "bundle critical spares package", "reduce service uplift / improve availability terms"),
+    ("capped_lds", "adjust delay LDs structure to capped LD + recovery plan (LDs = Liquidated Damages)", "reduce uplift / confirm slot"),
+]
+
+
+def trade_lever(we_offer: str) -> Optional[str]:
+    """
+    MovementPreferences field a trade mainly pulls on (None if unknown).
+    """
+    o = we_offer.lower()
+    if "payment" in o:
+        return "payment_terms"
+    if "ltsa" in o or "term" in o:
+        return "service_scope"
+    if "indexation" in o:
+        return "price"  # often linked to price mechanism
+    if "spares" in o or "service" in o:
+        return "service_scope"
+    if "ld" in o or "schedule" in o or "slot" in o:
+        return "schedule_slots"
+    return None
+
+
+def score_trade_options(
+    supplier: SupplierMemory,
+    intent: str,
+    candidates: Sequence[Tuple[str, str, str]] = CANDIDATE_TRADES,
+) -> List[TradeOption]:
+    """
+    Scores every candidate against the supplier's memory, best first.
+    Options are built with model_construct: all fields are produced here and already in range,
+    so downstream nodes can use them as-is without re-validation.
+    """
     # Leverage supplier movement preferences to score acceptance
     prefs = supplier.movement_preferences
 
     def base_accept(we_offer: str) -> float:
-        o = we_offer.lower()
-        if "payment" in o:
-            return prefs.payment_terms
-        if "ltsa" in o or "term" in o:
-            return prefs.service_scope
-        if "indexation" in o:
-            return prefs.price  # often linked to price mechanism
-        if "spares" in o or "service" in o:
-            return prefs.service_scope
-        if "ld" in o or "schedule" in o or "slot" in o:
-            return prefs.schedule_slots
-        return 0.35
+        lever = trade_lever(we_offer)
+        return getattr(prefs, lever) if lever else 0.35
 
     # Episode reinforcement: if a trade appears in history, boost
-    history_text = " ".join([e.primary_trade_used or "" for e in supplier.episodes]).lower()
+    history_text = " ".join(supplier.episodes.trades()).lower()
+    recent = supplier.episodes[:3]
 
     options = []
-    for offer, request in candidates:
+    for option_id, offer, request in candidates:
         p = base_accept(offer)
+        offer_l = offer.lower()
 
-        if offer.lower() in history_text:
+        if offer_l in history_text:
             p += 0.10
 
         # intent shaping: if they are pressuring on slot, schedule trades become more plausible
-        if ask.intent.value == "slot_pressure_deadline" and ("ld" in offer.lower() or "schedule" in offer.lower()):
+        if intent == "slot_pressure_deadline" and ("ld" in offer_l or "schedule" in offer_l):
             p += 0.10
 
         # cap to [0, 1]
@@ -72,13 +88,15 @@ def predict_trade_node(state: AgentState) -> AgentState:
         rationale = []
         rationale.append(f"Supplier movement preference suggests this lever is negotiable (based on stored profile).")
         # Add a couple episode-based rationales
-        for ep in supplier.episodes[:3]:
-            if ep.primary_trade_used and any(tok in ep.primary_trade_used.lower() for tok in offer.lower().split()[:2]):
+        lead_tokens = offer_l.split()[:2]
+        for ep in recent:
+            if ep.primary_trade_used and any(tok in ep.primary_trade_used.lower() for tok in lead_tokens):
                 rationale.append(f"Similar trade appeared in prior negotiation context: '{ep.context}'.")
                 break
 
         options.append(
-            TradeOption(
+            TradeOption.model_construct(
+                option_id=option_id,
                 we_offer=offer,
                 we_request=request,
                 predicted_acceptance=round(p, 2),
@@ -86,9 +104,39 @@ def predict_trade_node(state: AgentState) -> AgentState:
             )
         )
 
+    return sorted(options, key=lambda x: x.predicted_acceptance, reverse=True)
+
+
+READS = ("supplier_memory", "deal_state.supplier_ask")
+WRITES = (
+    "trade_options",
+    "deal_state.metadata.prediction_note",
+    "deal_state.metadata.trade_options",
+    "deal_state.metadata.trade_options_count",
+    "deal_state.metadata.trade_option_refs",
+)
+
+
+def predict_trade_node(state: AgentState) -> AgentState:
+    supplier = state["supplier_memory"]
+    deal = state["deal_state"]
+    ask = deal.supplier_ask
+
+    if ask is None:
+        deal.metadata["prediction_note"] = "No supplier ask available."
+        # The previous round's options no longer apply; don't persist their references.
+        for key in ("trade_options", "trade_options_count", "trade_option_refs"):
+            deal.metadata.pop(key, None)
+        state["trade_options"] = []
+        return state
+
     # pick top 2–3 options
-    options = sorted(options, key=lambda x: x.predicted_acceptance, reverse=True)[:3]
+    options = score_trade_options(supplier, ask.intent.value)[:3]
+
+    # Typed options travel in AgentState; the persisted snapshot only keeps a compact reference.
+    state["trade_options"] = options
+    deal.metadata.pop("trade_options", None)
     deal.metadata["trade_options_count"] = len(options)
+    deal.metadata["trade_option_refs"] = [[o.option_id, o.predicted_acceptance] for o in options]
     state["deal_state"] = deal
-    state["deal_state"].metadata["trade_options"] = [o.model_dump() for o in options]
     return state
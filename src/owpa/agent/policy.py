@@ -0,0 +1,235 @@
+"""
+Playbook policy thresholds compiled into predicate rules.
+
+Each rule is one comparison on one deal feature (the requested uplift, or whether the current
+ask touches a contract term). The comparison runs on scalars for a single DealState (coach_node)
+and on numpy columns for a whole portfolio, so "which deals need approval now" is one vectorized
+pass per rule over the latest snapshots.
+
+  PYTHONPATH=src python -m owpa.agent.policy
+  PYTHONPATH=src python -m owpa.agent.policy --rule internal_approval
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import operator
+import re
+import sys
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from owpa.data.aggregates import DEFAULT_APPROVAL_THRESHOLD, deal_status
+from owpa.schemas.deal_state import DealState
+
+
+FEATURES = ("uplift_pct", "liability_cap", "warranty_exclusion", "ld_cap")
+
+# Contract terms a rule can be about, matched within one clause of the ask / open issues.
+_TERM_PATTERNS = {
+    "liability_cap": re.compile(r"liabilit\w*[^.;]*\bcap|\bcap\w*[^.;]*liabilit", re.I),
+    "warranty_exclusion": re.compile(r"warrant\w*[^.;]*exclu|exclu\w*[^.;]*warrant", re.I),
+    "ld_cap": re.compile(
+        r"\b(?:LDs?|liquidated damages)\b[^.;]*\bcap|\bcap\w*[^.;]*\b(?:LDs?|liquidated damages)\b", re.I
+    ),
+}
+
+# policy_thresholds key -> (rule name, feature, approvers, flag message).
+# A numeric setting is the threshold; `true` enables a term rule, `false` disables it.
+_RULE_SPECS: Dict[str, Tuple[str, str, Tuple[str, ...], str]] = {
+    "price_uplift_pct_requires_internal_approval": (
+        "internal_approval",
+        "uplift_pct",
+        ("internal",),
+        "Approval flag: uplift > {value}% threshold → internal approval likely required before committing.",
+    ),
+    "liability_cap_deviation_requires_legal": (
+        "legal_liability_cap",
+        "liability_cap",
+        ("legal",),
+        "Legal flag: the ask touches the liability cap → legal review required before responding.",
+    ),
+    "warranty_exclusion_changes_require_legal": (
+        "legal_warranty_exclusions",
+        "warranty_exclusion",
+        ("legal",),
+        "Legal flag: warranty exclusions are in play → legal review required before responding.",
+    ),
+    "ld_cap_change_requires_pm_and_legal": (
+        "pm_legal_ld_cap",
+        "ld_cap",
+        ("pm", "legal"),
+        "PM + legal flag: LD (Liquidated Damages) cap change requested → project manager and legal sign-off required.",
+    ),
+}
+
+
+@dataclass(frozen=True)
+class PolicyRule:
+    """
+    `op(feature, value)`; operator functions work on floats and numpy arrays alike (NaN never matches).
+    """
+    name: str
+    feature: str
+    op: Callable[[Any, Any], Any]
+    value: float
+    approvers: Tuple[str, ...]
+    message: str
+
+    def matches(self, features: Mapping[str, float]) -> bool:
+        return bool(self.op(features[self.feature], self.value))
+
+    def mask(self, columns: Mapping[str, np.ndarray]) -> np.ndarray:
+        return np.asarray(self.op(columns[self.feature], self.value), dtype=bool)
+
+
+def deal_features(deal: DealState) -> Dict[str, float]:
+    """
+    One float per FEATURES entry: uplift % (NaN if not stated) and 0/1 term indicators taken from
+    the current ask plus unresolved open issues.
+    """
+    ask = deal.supplier_ask
+    texts: List[str] = []
+    if ask:
+        texts.extend(ask.requested_trades)
+        texts.extend(ask.raw_snippets)
+        if ask.reason:
+            texts.append(ask.reason)
+    for issue in deal.open_issues:
+        if issue.status not in ("agreed", "rejected"):
+            texts.append(f"{issue.topic}. {issue.detail or ''}")
+
+    features = {"uplift_pct": ask.headline_price_change_pct.value if ask and ask.headline_price_change_pct else float("nan")}
+    for feature, pattern in _TERM_PATTERNS.items():
+        features[feature] = float(any(pattern.search(t) for t in texts))
+    return features
+
+
+@dataclass
+class PortfolioFlags:
+    """
+    Boolean matrix (deals x rules) from one vectorized evaluation.
+    """
+    deal_ids: List[str]
+    rules: Tuple[PolicyRule, ...]
+    matrix: np.ndarray
+
+    def deals_for(self, rule_name: str) -> List[str]:
+        col = [r.name for r in self.rules].index(rule_name)
+        return [self.deal_ids[i] for i in np.flatnonzero(self.matrix[:, col])]
+
+    def flags_by_deal(self) -> Dict[str, List[str]]:
+        return {
+            self.deal_ids[i]: [self.rules[j].name for j in np.flatnonzero(self.matrix[i])]
+            for i in np.flatnonzero(self.matrix.any(axis=1))
+        }
+
+    def counts(self) -> Dict[str, int]:
+        return {r.name: int(n) for r, n in zip(self.rules, self.matrix.sum(axis=0))}
+
+
+@dataclass(frozen=True)
+class CompiledPolicy:
+    rules: Tuple[PolicyRule, ...]
+    unknown: Tuple[str, ...] = ()  # threshold keys without a rule spec (kept visible, never evaluated)
+
+    def evaluate(self, deal: DealState) -> List[PolicyRule]:
+        features = deal_features(deal)
+        return [r for r in self.rules if r.matches(features)]
+
+    def flags(self, deal: DealState) -> List[str]:
+        return [r.message for r in self.evaluate(deal)]
+
+    def evaluate_portfolio(self, deals: Iterable[DealState], *, open_only: bool = True) -> PortfolioFlags:
+        """
+        Extracts features once per deal into columns, then evaluates each rule over all deals at once.
+        Closed deals are skipped unless open_only=False.
+        """
+        deal_ids: List[str] = []
+        rows: List[List[float]] = []
+        for deal in deals:
+            if open_only and deal_status(deal) == "closed":
+                continue
+            features = deal_features(deal)
+            deal_ids.append(deal.deal_id)
+            rows.append([features[f] for f in FEATURES])
+
+        table = np.array(rows, dtype=float).reshape(len(rows), len(FEATURES))
+        columns = {f: table[:, i] for i, f in enumerate(FEATURES)}
+        matrix = np.zeros((len(deal_ids), len(self.rules)), dtype=bool)
+        for j, rule in enumerate(self.rules):
+            matrix[:, j] = rule.mask(columns)
+        return PortfolioFlags(deal_ids=deal_ids, rules=self.rules, matrix=matrix)
+
+
+def compile_policy(playbook: Optional[dict]) -> CompiledPolicy:
+    """
+    Compiled rules for a playbook's policy_thresholds (cached per distinct threshold set).
+    """
+    thresholds = dict((playbook or {}).get("policy_thresholds", {}))
+    thresholds.setdefault("price_uplift_pct_requires_internal_approval", DEFAULT_APPROVAL_THRESHOLD)
+    return _compile(tuple(sorted((k, json.dumps(v)) for k, v in thresholds.items())))
+
+
+@lru_cache(maxsize=32)
+def _compile(items: Tuple[Tuple[str, str], ...]) -> CompiledPolicy:
+    rules: List[PolicyRule] = []
+    unknown: List[str] = []
+    for key, raw in items:
+        setting = json.loads(raw)
+        spec = _RULE_SPECS.get(key)
+        if spec is None:
+            unknown.append(key)
+            continue
+        name, feature, approvers, message = spec
+        if isinstance(setting, bool):
+            if not setting:
+                continue
+            value = 0.0
+        else:
+            value = float(setting)
+        rules.append(PolicyRule(name, feature, operator.gt, value, approvers, message.format(value=setting)))
+    # Stable order: the order rules are declared in _RULE_SPECS, not the playbook's key order.
+    order = [spec[0] for spec in _RULE_SPECS.values()]
+    rules.sort(key=lambda r: order.index(r.name))
+    return CompiledPolicy(rules=tuple(rules), unknown=tuple(unknown))
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    from owpa.config import load_config
+    from owpa.data.loader import load_playbook
+    from owpa.data.storage import JsonlDealStateStore
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rule", default=None, help="Only list deals flagged by this rule")
+    parser.add_argument("--include-closed", action="store_true")
+    parser.add_argument("--json", action="store_true", help="Print {deal_id: [rule, ...]} as JSON")
+    args = parser.parse_args(argv)
+
+    cfg = load_config()
+    policy = compile_policy(load_playbook(cfg.playbook_path))
+    result = policy.evaluate_portfolio(
+        JsonlDealStateStore(cfg.state_store_path).iter_latest(), open_only=not args.include_closed
+    )
+
+    if args.rule:
+        if args.rule not in {r.name for r in policy.rules}:
+            parser.error(f"unknown rule {args.rule!r}; expected one of {[r.name for r in policy.rules]}")
+        flagged = {deal_id: [args.rule] for deal_id in result.deals_for(args.rule)}
+    else:
+        flagged = result.flags_by_deal()
+
+    if args.json:
+        print(json.dumps(flagged, indent=2))
+        return 0
+    print(f"{len(result.deal_ids)} deals evaluated; " + ", ".join(f"{k}: {v}" for k, v in result.counts().items()))
+    for deal_id, rules in flagged.items():
+        print(f"  {deal_id}: {', '.join(rules)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,312 @@
+"""
+Cross-process rate limiter for LLM calls (SQLite), governing requests and estimated tokens per minute.
+
+Every process (UI jobs, batch, API workers) queues its calls in the same database. Only the head
+of the queue may take from the two token buckets:
+  - priority class first: interactive (UI rounds, API) before default before batch
+  - then fair queuing across deals: the deal served least recently goes next, so one deal with
+    many queued calls cannot starve the others
+Buckets hold only a few seconds of rate (BURST_SECONDS), so throughput follows the provider limit
+without bursts. A 429 pauses every process at once and the buckets restart empty, so calls resume
+paced instead of all retrying together.
+
+  PYTHONPATH=src python -m owpa.agent.ratelimit          # buckets and queue by class / deal
+"""
+from __future__ import annotations
+
+import argparse
+import contextvars
+import json
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, ContextManager, Dict, Iterator, Optional, Sequence, Tuple, TypeVar
+
+from owpa.data.storage import ensure_parent_dir, sqlite_connect
+
+T = TypeVar("T")
+
+PRIORITIES = {"interactive": 0, "default": 1, "batch": 2}
+
+# Seconds of rate a bucket can hold; small values mean smooth pacing instead of bursts.
+BURST_SECONDS = 2.0
+# Output tokens assumed per call until the real usage is known (settle() corrects it).
+EST_OUTPUT_TOKENS = 400
+# Waiters that stopped polling this long ago (crashed process) are dropped from the queue.
+STALE_SECONDS = 10.0
+POLL_SECONDS = 0.05
+DEFAULT_PAUSE_SECONDS = 5.0
+RATE_LIMIT_RETRIES = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    name    TEXT PRIMARY KEY,
+    level   REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS limiter_meta (
+    key   TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS waiters (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    priority  INTEGER NOT NULL,
+    deal_id   TEXT NOT NULL,
+    tokens    REAL NOT NULL,
+    enqueued  REAL NOT NULL,
+    heartbeat REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS deal_service (
+    deal_id     TEXT PRIMARY KEY,
+    last_served REAL NOT NULL
+);
+"""
+
+
+class RateLimitTimeout(TimeoutError):
+    """No slot within the caller's timeout."""
+
+
+@dataclass
+class Grant:
+    tokens: float
+    waited_ms: float
+
+
+_scope: contextvars.ContextVar[Tuple[str, Optional[str]]] = contextvars.ContextVar("owpa_llm_scope", default=("default", None))
+
+
+@contextmanager
+def llm_scope(priority: str, deal_id: Optional[str] = None) -> Iterator[None]:
+    """
+    Priority class and deal for every LLM call made inside the block (graph nodes inherit it).
+    """
+    if priority not in PRIORITIES:
+        raise ValueError(f"priority must be one of {tuple(PRIORITIES)}")
+    token = _scope.set((priority, deal_id))
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def estimate_tokens(*texts: str) -> int:
+    # ~4 chars/token for the prompt plus a fixed allowance for the reply.
+    return sum(len(t) for t in texts) // 4 + EST_OUTPUT_TOKENS
+
+
+class RateLimiter:
+    def __init__(self, path: str | Path, *, rpm: float, tpm: float, burst_seconds: float = BURST_SECONDS):
+        self.path = Path(path).expanduser().resolve()
+        self.rates = {"requests": rpm / 60.0, "tokens": tpm / 60.0}
+        self.capacity = {
+            "requests": max(1.0, self.rates["requests"] * burst_seconds),
+            "tokens": max(float(EST_OUTPUT_TOKENS), self.rates["tokens"] * burst_seconds),
+        }
+        ensure_parent_dir(self.path)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            now = time.time()
+            for name, cap in self.capacity.items():
+                conn.execute("INSERT OR IGNORE INTO buckets (name, level, updated) VALUES (?, ?, ?)", (name, cap, now))
+
+    def _connect(self) -> ContextManager[sqlite3.Connection]:
+        return sqlite_connect(self.path, autocommit=True)
+
+    def _levels(self, conn: sqlite3.Connection, now: float) -> Dict[str, float]:
+        levels = {}
+        for name, level, updated in conn.execute("SELECT name, level, updated FROM buckets"):
+            levels[name] = min(self.capacity[name], level + self.rates[name] * max(0.0, now - updated))
+        return levels
+
+    def _store_levels(self, conn: sqlite3.Connection, levels: Dict[str, float], now: float) -> None:
+        conn.executemany("UPDATE buckets SET level = ?, updated = ? WHERE name = ?", [(v, now, k) for k, v in levels.items()])
+
+    def acquire(
+        self,
+        tokens: float,
+        *,
+        priority: Optional[str] = None,
+        deal_id: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> Grant:
+        """
+        Blocks until this call is at the head of the queue and both buckets can cover it
+        (a call larger than the token bucket only needs a full bucket and leaves it in debt).
+        Priority and deal default to the enclosing llm_scope. Raises RateLimitTimeout.
+        """
+        scope_priority, scope_deal = _scope.get()
+        prio = PRIORITIES[priority or scope_priority]
+        deal = deal_id or scope_deal or ""
+        start = time.time()
+        with self._connect() as conn:
+            waiter = conn.execute(
+                "INSERT INTO waiters (priority, deal_id, tokens, enqueued, heartbeat) VALUES (?, ?, ?, ?, ?)",
+                (prio, deal, float(tokens), start, start),
+            ).lastrowid
+            try:
+                self._wait(conn, waiter, deal, float(tokens), start, timeout)
+            except BaseException:
+                conn.execute("DELETE FROM waiters WHERE id = ?", (waiter,))
+                raise
+        return Grant(tokens=float(tokens), waited_ms=round((time.time() - start) * 1000.0, 3))
+
+    def _wait(self, conn: sqlite3.Connection, waiter: int, deal: str, tokens: float, start: float, timeout: Optional[float]) -> None:
+        while True:
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                wait = self._try_take(conn, waiter, deal, tokens, now)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            if wait is None:
+                return
+            if timeout is not None and now + wait - start > timeout:
+                raise RateLimitTimeout(f"No LLM slot within {timeout}s")
+            time.sleep(wait)
+
+    def _try_take(self, conn: sqlite3.Connection, waiter: int, deal: str, tokens: float, now: float) -> Optional[float]:
+        """
+        Takes the slot and returns None, or returns how long to sleep before trying again.
+        """
+        conn.execute("DELETE FROM waiters WHERE heartbeat < ?", (now - STALE_SECONDS,))
+        conn.execute("UPDATE waiters SET heartbeat = ? WHERE id = ?", (now, waiter))
+
+        row = conn.execute("SELECT value FROM limiter_meta WHERE key = 'paused_until'").fetchone()
+        if row is not None and row[0] > now:
+            return min(1.0, row[0] - now)
+
+        head = conn.execute(
+            "SELECT w.id FROM waiters w LEFT JOIN deal_service s ON s.deal_id = w.deal_id "
+            "ORDER BY w.priority, COALESCE(s.last_served, 0), w.id LIMIT 1"
+        ).fetchone()
+        if head is None or head[0] != waiter:
+            return POLL_SECONDS
+
+        levels = self._levels(conn, now)
+        need = {"requests": 1.0, "tokens": min(tokens, self.capacity["tokens"])}
+        deficit = max((need[k] - levels[k]) / self.rates[k] for k in need)
+        if deficit > 0:
+            return min(1.0, max(0.005, deficit))
+
+        levels["requests"] -= 1.0
+        levels["tokens"] -= tokens
+        self._store_levels(conn, levels, now)
+        conn.execute("DELETE FROM waiters WHERE id = ?", (waiter,))
+        conn.execute("INSERT OR REPLACE INTO deal_service (deal_id, last_served) VALUES (?, ?)", (deal, now))
+        return None
+
+    def settle(self, grant: Grant, actual_tokens: Optional[float]) -> None:
+        """
+        Corrects the token bucket once the provider reports real usage (refund or extra charge).
+        """
+        if actual_tokens is None:
+            return
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            levels = self._levels(conn, now)
+            levels["tokens"] = min(self.capacity["tokens"], levels["tokens"] + grant.tokens - float(actual_tokens))
+            self._store_levels(conn, levels, now)
+            conn.execute("COMMIT")
+
+    def pause(self, seconds: float) -> None:
+        """
+        After a 429: no process takes a slot for `seconds`, and buckets restart empty.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            until = time.time() + seconds
+            conn.execute(
+                "INSERT INTO limiter_meta (key, value) VALUES ('paused_until', ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = MAX(value, excluded.value)",
+                (until,),
+            )
+            self._store_levels(conn, {"requests": 0.0, "tokens": 0.0}, until)
+            conn.execute("COMMIT")
+
+    def call(self, request: Callable[[], T], *, tokens: float) -> Tuple[T, Grant]:
+        """
+        Runs `request` in a slot; on a 429 pauses everyone (Retry-After if given) and queues again.
+        """
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            grant = self.acquire(tokens)
+            try:
+                return request(), grant
+            except Exception as e:
+                if getattr(e, "status_code", None) != 429 or attempt == RATE_LIMIT_RETRIES:
+                    raise
+                self.settle(grant, 0)
+                self.pause(_retry_after(e))
+                from owpa.agent.tracing import annotate
+
+                annotate(retries=attempt + 1)
+        raise AssertionError("unreachable")
+
+    def status(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._connect() as conn:
+            levels = self._levels(conn, now)
+            queue = conn.execute(
+                "SELECT priority, deal_id, COUNT(*), MIN(enqueued) FROM waiters WHERE heartbeat >= ? GROUP BY priority, deal_id ORDER BY priority",
+                (now - STALE_SECONDS,),
+            ).fetchall()
+            paused = conn.execute("SELECT value FROM limiter_meta WHERE key = 'paused_until'").fetchone()
+        names = {v: k for k, v in PRIORITIES.items()}
+        return {
+            "buckets": {k: {"level": round(v, 2), "capacity": self.capacity[k], "per_s": round(self.rates[k], 3)} for k, v in levels.items()},
+            "paused_s": round(max(0.0, paused[0] - now), 2) if paused else 0.0,
+            "queue": [
+                {"class": names.get(p, str(p)), "deal_id": d, "waiting": n, "oldest_s": round(now - t, 2)} for p, d, n, t in queue
+            ],
+        }
+
+
+def _retry_after(e: Exception) -> float:
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return DEFAULT_PAUSE_SECONDS
+
+
+_limiters: Dict[Tuple[Path, float, float], RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter() -> Optional[RateLimiter]:
+    """
+    The process-wide limiter for RATE_LIMIT_DB_PATH, or None when rate limiting is off.
+    """
+    from owpa.config import load_config
+
+    cfg = load_config()
+    if cfg.rate_limit_db_path is None:
+        return None
+    key = (Path(cfg.rate_limit_db_path).expanduser().resolve(), cfg.llm_rpm, cfg.llm_tpm)
+    with _limiters_lock:
+        if key not in _limiters:
+            _limiters[key] = RateLimiter(key[0], rpm=cfg.llm_rpm, tpm=cfg.llm_tpm)
+        return _limiters[key]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args(argv)
+    limiter = get_limiter()
+    if limiter is None:
+        print("Rate limiting is off (set RATE_LIMIT_DB_PATH)", file=sys.stderr)
+        return 1
+    print(json.dumps(limiter.status(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
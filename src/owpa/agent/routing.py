@@ -0,0 +1,202 @@
+"""
+Latency-aware model routing per pipeline node.
+
+With MODEL_ROUTING=true, a node that lists candidates (MODEL_ROUTES_<NODE>=cheap,strong, in
+preference order) gets, on every call, the first candidate whose rolling p90 latency is within
+the node's budget (MODEL_LATENCY_BUDGET_MS[_<NODE>]) and whose error rate is acceptable.
+Candidates with too few samples are tried first (warm-up); every PROBE_EVERY-th call re-samples
+the least observed candidate, so a model that recovered can win again. If nothing qualifies,
+the candidate with the best latency/error score is used.
+
+Every decision is kept in the router (`decisions`) and recorded on the LLM span as
+model / route / route_stats, so traces show why each call used the model it did.
+
+  PYTHONPATH=src python -m owpa.agent.routing outputs/traces.jsonl   # decisions per node / model
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Mapping, Optional, Sequence, Tuple
+
+from owpa.evaluation.metrics import percentile
+
+WINDOW = 50            # observations kept per (node, model)
+MIN_SAMPLES = 5        # below this a candidate is still warming up
+MAX_ERROR_RATE = 0.2
+PROBE_EVERY = 20
+ERROR_PENALTY = 4.0    # score = p90 * (1 + ERROR_PENALTY * error_rate)
+
+
+@dataclass
+class RouteDecision:
+    node: str
+    model: str
+    reason: str           # fixed | warmup | within_budget | probe | best_effort
+    at: float
+    stats: Dict[str, Dict[str, float]] = field(default_factory=dict)
+
+
+class _Window:
+    def __init__(self, size: int):
+        self.obs: Deque[Tuple[float, bool]] = deque(maxlen=size)
+
+    def summary(self) -> Dict[str, float]:
+        latencies = [ms for ms, _ in self.obs]
+        n = len(self.obs)
+        return {
+            "n": float(n),
+            "p90_ms": round(percentile(latencies, 90), 3) if n else 0.0,
+            "error_rate": round(sum(1 for _, ok in self.obs if not ok) / n, 3) if n else 0.0,
+        }
+
+
+class ModelRouter:
+    def __init__(
+        self,
+        routes: Mapping[str, Sequence[str]],
+        *,
+        budget_ms: float,
+        node_budgets_ms: Optional[Mapping[str, float]] = None,
+        window: int = WINDOW,
+        min_samples: int = MIN_SAMPLES,
+        max_error_rate: float = MAX_ERROR_RATE,
+        probe_every: int = PROBE_EVERY,
+        history: int = 1000,
+    ):
+        self.routes = {node: tuple(models) for node, models in routes.items() if models}
+        self.budget_ms = budget_ms
+        self.node_budgets_ms = dict(node_budgets_ms or {})
+        self.window = window
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.probe_every = probe_every
+        self.decisions: Deque[RouteDecision] = deque(maxlen=history)
+        self._stats: Dict[Tuple[str, str], _Window] = {}
+        self._calls: Counter[str] = Counter()
+        self._lock = threading.Lock()
+
+    def _summary(self, node: str, model: str) -> Dict[str, float]:
+        w = self._stats.get((node, model))
+        return w.summary() if w is not None else {"n": 0.0, "p90_ms": 0.0, "error_rate": 0.0}
+
+    def choose(self, node: str, default: str) -> RouteDecision:
+        with self._lock:
+            candidates = self.routes.get(node)
+            if not candidates:
+                decision = RouteDecision(node=node, model=default, reason="fixed", at=time.time())
+                self.decisions.append(decision)
+                return decision
+
+            self._calls[node] += 1
+            stats = {m: self._summary(node, m) for m in candidates}
+            budget = self.node_budgets_ms.get(node, self.budget_ms)
+            model, reason = None, "best_effort"
+            if len(candidates) > 1 and self._calls[node] % self.probe_every == 0:
+                model, reason = min(candidates, key=lambda m: stats[m]["n"]), "probe"
+            else:
+                for m in candidates:
+                    s = stats[m]
+                    if s["n"] < self.min_samples:
+                        model, reason = m, "warmup"
+                        break
+                    if s["p90_ms"] <= budget and s["error_rate"] <= self.max_error_rate:
+                        model, reason = m, "within_budget"
+                        break
+            if model is None:
+                model = min(candidates, key=lambda m: stats[m]["p90_ms"] * (1.0 + ERROR_PENALTY * stats[m]["error_rate"]))
+            decision = RouteDecision(node=node, model=model, reason=reason, at=time.time(), stats=stats)
+            self.decisions.append(decision)
+            return decision
+
+    def observe(self, node: str, model: str, latency_ms: float, ok: bool) -> None:
+        with self._lock:
+            w = self._stats.get((node, model))
+            if w is None:
+                w = self._stats[(node, model)] = _Window(self.window)
+            w.obs.append((float(latency_ms), bool(ok)))
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        with self._lock:
+            out: Dict[str, Dict[str, Dict[str, float]]] = {}
+            for (node, model), w in sorted(self._stats.items()):
+                out.setdefault(node, {})[model] = w.summary()
+            return out
+
+
+_UNSET = object()
+_router: Any = _UNSET
+
+
+def _router_from_config() -> Optional[ModelRouter]:
+    from owpa.config import load_config
+
+    cfg = load_config()
+    if not cfg.model_routing:
+        return None
+    return ModelRouter(cfg.model_routes, budget_ms=cfg.model_latency_budget_ms, node_budgets_ms=cfg.node_latency_budgets_ms)
+
+
+def get_router() -> Optional[ModelRouter]:
+    """
+    Process-wide router, or None when MODEL_ROUTING is off (each node uses its configured model).
+    """
+    global _router
+    if _router is _UNSET:
+        _router = _router_from_config()
+    return _router
+
+
+def set_router(router: Optional[ModelRouter]) -> None:
+    """
+    Install a router programmatically (e.g. with stubbed backends in tests); None turns routing off.
+    """
+    global _router
+    _router = router
+
+
+def reset_router() -> None:
+    global _router
+    _router = _UNSET
+
+
+def summarize(spans: Sequence[dict]) -> Dict[str, Dict[str, Any]]:
+    """
+    Per node: calls by model and by route reason, from LLM spans of a trace file.
+    """
+    out: Dict[str, Dict[str, Any]] = {}
+    for d in spans:
+        attrs = d.get("attrs") or {}
+        if d.get("kind") != "llm" or "route" not in attrs:
+            continue
+        node = d.get("parent") or "?"
+        s = out.setdefault(node, {"models": Counter(), "reasons": Counter(), "errors": 0})
+        s["models"][attrs.get("model")] += 1
+        s["reasons"][attrs["route"]] += 1
+        s["errors"] += 1 if attrs.get("error") else 0
+    return {node: {**s, "models": dict(s["models"]), "reasons": dict(s["reasons"])} for node, s in sorted(out.items())}
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    from owpa.agent.tracing import read_spans
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", default=os.getenv("OWPA_TRACE_PATH", "./outputs/traces.jsonl"))
+    args = parser.parse_args(argv)
+
+    summary = summarize(list(read_spans(args.path)))
+    if not summary:
+        print(f"No routed LLM calls in {args.path}", file=sys.stderr)
+        return 1
+    print(json.dumps(summary, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,9 @@
 from __future__ import annotations
 
-from typing import Optional, TypedDict
+from typing import List, Optional, TypedDict
 
 from owpa.schemas.deal_state import DealState
-from owpa.schemas.outputs import CoachNotes, EmailDraft
+from owpa.schemas.outputs import CoachNotes, EmailDraft, TradeOption
 from owpa.schemas.supplier_memory import SupplierMemory
 
 
@@ -15,5 +15,71 @@ class AgentState(TypedDict, total=False):
     supplier_memory: SupplierMemory
     playbook: dict
 
+    # Ranked options from predict_trade, already typed (no re-validation downstream)
+    trade_options: List[TradeOption]
+
     coach_notes: CoachNotes
-    email_draft: EmailDraft
\ No newline at end of file
+    email_draft: EmailDraft
+
+    # Checkpoint thread of the round, taken from its input before any node ran (owpa.agent.checkpoint)
+    checkpoint_thread: str
+
+
+def get_trade_options(state: AgentState) -> List[TradeOption]:
+    """
+    Trade options for the current round.
+    Fast path: the typed list set by predict_trade. Snapshots written before options moved
+    into AgentState carried them as dicts in deal.metadata["trade_options"]; those are validated.
+    """
+    options = state.get("trade_options")
+    if options is not None:
+        return options
+
+    deal = state.get("deal_state")
+    raw = deal.metadata.get("trade_options", []) if deal is not None else []
+    legacy = []
+    if isinstance(raw, list):
+        for item in raw:
+            try:
+                legacy.append(TradeOption.model_validate(item))
+            except Exception:
+                pass
+    return legacy
+
+
+_MODEL_FIELDS = {
+    "deal_state": DealState,
+    "supplier_memory": SupplierMemory,
+    "coach_notes": CoachNotes,
+    "email_draft": EmailDraft,
+}
+
+
+def dump_agent_state(state: AgentState) -> dict:
+    """
+    JSON-safe dict of an AgentState (job results, checkpoints, API responses).
+    """
+    out = {}
+    for key, value in state.items():
+        if value is not None and key in _MODEL_FIELDS:
+            out[key] = value.model_dump(mode="json")
+        elif key == "trade_options" and value is not None:
+            out[key] = [o.model_dump(mode="json") for o in value]
+        else:
+            out[key] = value
+    return out
+
+
+def load_agent_state(data: dict) -> AgentState:
+    """
+    Inverse of dump_agent_state; data read back from disk is validated.
+    """
+    state: AgentState = {}
+    for key, value in data.items():
+        if value is not None and key in _MODEL_FIELDS:
+            state[key] = _MODEL_FIELDS[key].model_validate(value)  # type: ignore[literal-required]
+        elif key == "trade_options" and value is not None:
+            state["trade_options"] = [TradeOption.model_validate(o) for o in value]
+        else:
+            state[key] = value  # type: ignore[literal-required]
+    return state
@@ -0,0 +1,359 @@
+from __future__ import annotations
+
+import copy
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Generic, List, Optional, Sequence, Tuple, Type, TypeVar
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+
+M = TypeVar("M", bound=BaseModel)
+
+_LITERALS = {"true": True, "True": True, "false": False, "False": False, "null": None, "None": None}
+_ESCAPES = {'"': '"', "'": "'", "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+_NUMBER = re.compile(r"[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?")
+
+
+class _Frame:
+    __slots__ = ("container", "slot", "key", "after_colon")
+
+    def __init__(self, container: Any, slot: Any):
+        self.container = container
+        self.slot = slot                   # key / index of this container in its parent
+        self.key: Optional[str] = None     # object: key waiting for its value
+        self.after_colon = False
+
+
+class PartialJSONParser:
+    """
+    Incremental, tolerant JSON parser for LLM replies. Feed text as it arrives; `value()` is the
+    best-effort result at any point. Tolerates prose around the object, // and # comments,
+    /* */ comments, trailing commas, single quotes, Python literals and unquoted keys, and closes
+    whatever is still open when the text is truncated. Everything after the root closes is ignored.
+    """
+
+    def __init__(self) -> None:
+        self.root: Any = None
+        self.done = False
+        self.repairs: List[str] = []
+        self._stack: List[_Frame] = []
+        self._mode = "start"   # start | normal | string | literal | line_comment | block_comment
+        self._quote = '"'
+        self._buf: List[str] = []
+        self._escape: Optional[str] = None   # "" after a backslash, "uXXXX" digits while reading \u
+        self._slash = False                  # a "/" that may open a comment
+        self._star = False                   # a "*" that may close a block comment
+
+    # --- feeding -------------------------------------------------------------------------------
+
+    def feed(self, text: str) -> "PartialJSONParser":
+        for ch in text:
+            if self.done:
+                break
+            self._step(ch)
+        return self
+
+    def _step(self, ch: str) -> None:
+        mode = self._mode
+        if mode == "start":
+            if ch in "{[":
+                self._open({} if ch == "{" else [])
+                self._mode = "normal"
+            return
+        if mode == "string":
+            self._string_char(ch)
+            return
+        if mode == "line_comment":
+            if ch == "\n":
+                self._mode = "normal"
+            return
+        if mode == "block_comment":
+            if self._star and ch == "/":
+                self._mode = "normal"
+            self._star = ch == "*"
+            return
+        if mode == "literal":
+            if ch.isalnum() or ch in "+-._":
+                self._buf.append(ch)
+                return
+            self._emit_literal()
+            self._mode = "normal"
+
+        if self._slash:
+            self._slash = False
+            if ch == "/":
+                self._mode = "line_comment"
+                self._note("comment")
+                return
+            if ch == "*":
+                self._mode = "block_comment"
+                self._star = False
+                self._note("comment")
+                return
+        if ch.isspace():
+            return
+        if ch == "/":
+            self._slash = True
+        elif ch == "#":
+            self._mode = "line_comment"
+            self._note("comment")
+        elif ch in "{[":
+            self._open({} if ch == "{" else [])
+        elif ch in "}]":
+            self._close()
+        elif ch == ",":
+            top = self._stack[-1]
+            if isinstance(top.container, dict) and top.key is not None:
+                self._note("dangling key")
+                top.key, top.after_colon = None, False
+        elif ch == ":":
+            self._stack[-1].after_colon = True
+        elif ch in "\"'":
+            if ch == "'":
+                self._note("single quotes")
+            self._mode, self._quote, self._buf = "string", ch, []
+        elif ch.isalnum() or ch in "+-.":
+            self._mode, self._buf = "literal", [ch]
+        else:
+            self._note("stray character")
+
+    def _string_char(self, ch: str) -> None:
+        if self._escape is not None:
+            if self._escape.startswith("u"):
+                self._escape += ch
+                if len(self._escape) == 5:
+                    try:
+                        self._buf.append(chr(int(self._escape[1:], 16)))
+                    except ValueError:
+                        self._note("bad escape")
+                    self._escape = None
+            elif ch == "u":
+                self._escape = "u"
+            else:
+                self._buf.append(_ESCAPES.get(ch, ch))
+                self._escape = None
+            return
+        if ch == "\\":
+            self._escape = ""
+        elif ch == self._quote:
+            self._mode = "normal"
+            self._emit("".join(self._buf), is_string=True)
+        else:
+            self._buf.append(ch)
+
+    # --- structure -----------------------------------------------------------------------------
+
+    def _open(self, container: Any) -> None:
+        slot = None
+        if self._stack:
+            top = self._stack[-1]
+            slot = len(top.container) if isinstance(top.container, list) else top.key
+            if not self._attach(container):
+                container = {} if isinstance(container, dict) else []  # parsed but dropped
+        else:
+            self.root = container
+        self._stack.append(_Frame(container, slot))
+
+    def _close(self) -> None:
+        frame = self._stack.pop()
+        if isinstance(frame.container, dict) and frame.key is not None:
+            self._note("dangling key")
+        if not self._stack:
+            self.done = True
+
+    def _attach(self, value: Any) -> bool:
+        top = self._stack[-1]
+        if isinstance(top.container, list):
+            top.container.append(value)
+            return True
+        if top.key is None:
+            self._note("value without key")
+            return False
+        top.container[top.key] = value
+        top.key, top.after_colon = None, False
+        return True
+
+    def _emit(self, value: Any, *, is_string: bool) -> None:
+        top = self._stack[-1]
+        if isinstance(top.container, dict) and top.key is None:
+            if not is_string:
+                self._note("unquoted key")
+            top.key = str(value) if not is_string else value
+            return
+        self._attach(value)
+
+    def _emit_literal(self) -> None:
+        token = "".join(self._buf)
+        top = self._stack[-1]
+        if isinstance(top.container, dict) and top.key is None:
+            self._emit(token, is_string=False)
+            return
+        ok, value = _literal(token)
+        if ok:
+            if token not in ("true", "false", "null") and not _NUMBER.fullmatch(token):
+                self._note("python literal")
+            self._attach(value)
+        else:
+            self._note("bad literal")
+            top.key, top.after_colon = None, False
+
+    # --- results -------------------------------------------------------------------------------
+
+    def value(self) -> Any:
+        """
+        Snapshot of the parsed value; open containers are closed, a truncated string value is
+        kept as is, and a key still waiting for its value is left out.
+        """
+        if self.root is None:
+            return None
+        if self.done:
+            return self.root
+        snapshot = copy.deepcopy(self.root)
+        # Walk the open path in the copy and apply the token being read, if any.
+        top = snapshot
+        for frame in self._stack[1:]:
+            try:
+                top = top[frame.slot]
+            except (KeyError, IndexError, TypeError):
+                return snapshot  # inside a container that was dropped (value without key)
+        top_frame = self._stack[-1]
+        pending = None
+        if self._mode == "string":
+            pending = (True, "".join(self._buf))
+        elif self._mode == "literal":
+            pending = _literal("".join(self._buf))
+        if pending and pending[0]:
+            if isinstance(top, list):
+                top.append(pending[1])
+            elif top_frame.key is not None and top_frame.after_colon:
+                top[top_frame.key] = pending[1]
+        return snapshot
+
+    @property
+    def truncated(self) -> bool:
+        return self.root is not None and not self.done
+
+    def _note(self, repair: str) -> None:
+        if repair not in self.repairs:
+            self.repairs.append(repair)
+
+
+def _literal(token: str) -> Tuple[bool, Any]:
+    if token in _LITERALS:
+        return True, _LITERALS[token]
+    if _NUMBER.fullmatch(token):
+        f = float(token)
+        return True, int(f) if re.fullmatch(r"[+-]?\d+", token) else f
+    return False, None
+
+
+def _json_start(text: str) -> int:
+    """
+    Where the JSON object most likely starts: after a ```json fence, else the first "{" that is
+    followed by a quote, "}" or a newline (skips braces in leading prose), else the first "{".
+    """
+    fence = re.search(r"```(?:json)?\s*\n", text)
+    if fence:
+        return fence.end()
+    m = re.search(r"\{\s*[\"'}\n]", text)
+    if m:
+        return m.start()
+    i = text.find("{")
+    return i if i >= 0 else len(text)
+
+
+def parse_lenient(text: str) -> Tuple[Any, PartialJSONParser]:
+    """
+    (best-effort value, parser) for a complete LLM reply; the parser exposes repairs/truncation.
+    """
+    parser = PartialJSONParser().feed(text[_json_start(text):])
+    value = parser.value()
+    if parser.truncated:
+        parser._note("truncated")
+    return value, parser
+
+
+@dataclass
+class Parsed(Generic[M]):
+    value: M
+    missing: Tuple[str, ...]             # fields absent or invalid in the reply (defaults used)
+    repairs: List[str] = field(default_factory=list)
+    truncated: bool = False
+    invalid: Tuple[str, ...] = ()
+
+
+class StructuredOutput(Generic[M]):
+    """
+    A node's reply schema compiled once: the pydantic TypeAdapter that validates it and the
+    prompt hint the model sees. Fields that are missing or invalid are reported, so the caller can
+    ask for just those instead of re-running the whole prompt.
+    """
+
+    def __init__(self, model: Type[M], hint: str, *, required: Sequence[str] = ()):
+        self.model = model
+        self.hint = hint
+        self.required = tuple(required)  # fields a complete reply must still contain
+        self.adapter: TypeAdapter[M] = TypeAdapter(model)
+        self.fields = tuple(model.model_fields)
+        self._hint_lines = _hint_lines(hint)
+
+    def validate(self, data: Any) -> Parsed[M]:
+        """
+        Validates a (possibly partial) dict; invalid fields are dropped and reported as missing.
+        """
+        if not isinstance(data, dict):
+            data = {}
+        data = {k: v for k, v in data.items() if k in self.fields}
+        invalid: List[str] = []
+        while True:
+            try:
+                value = self.adapter.validate_python(data)
+                break
+            except ValidationError as e:
+                bad = {str(err["loc"][0]) for err in e.errors() if err["loc"]}
+                if not bad or not bad & set(data):
+                    raise
+                invalid.extend(sorted(bad & set(data)))
+                data = {k: v for k, v in data.items() if k not in bad}
+        missing = tuple(f for f in self.fields if f not in value.model_fields_set or f in invalid)
+        return Parsed(value=value, missing=missing, repairs=[f"invalid {f}" for f in invalid], invalid=tuple(invalid))
+
+    def parse(self, text: str) -> Parsed[M]:
+        data, parser = parse_lenient(text)
+        parsed = self.validate(data)
+        parsed.repairs = parser.repairs + parsed.repairs
+        parsed.truncated = data is None or parser.truncated
+        return parsed
+
+    def needs_followup(self, parsed: Parsed[M]) -> bool:
+        """
+        Missing fields are only worth another call when the reply was broken (truncated / no
+        JSON / invalid values) or a required field is absent; a complete reply may omit optionals.
+        """
+        if not parsed.missing:
+            return False
+        return parsed.truncated or bool(parsed.invalid) or any(f in parsed.missing for f in self.required)
+
+    def merge(self, parsed: Parsed[M], data: Any) -> Parsed[M]:
+        """
+        Fills the missing fields of `parsed` from a follow-up reply.
+        """
+        base = parsed.value.model_dump(include=set(self.fields) - set(parsed.missing))
+        extra = {k: v for k, v in (data if isinstance(data, dict) else {}).items() if k in parsed.missing}
+        merged = self.validate({**base, **extra})
+        merged.repairs = parsed.repairs + merged.repairs
+        return merged
+
+    def hint_for(self, fields: Sequence[str]) -> str:
+        lines = [self._hint_lines.get(f, f'"{f}": ...') for f in fields]
+        return "{\n  " + ",\n  ".join(lines) + "\n}"
+
+
+def _hint_lines(hint: str) -> Dict[str, str]:
+    out = {}
+    for line in hint.splitlines():
+        m = re.match(r'\s*"(\w+)"\s*:\s*(.*?),?\s*$', line)
+        if m:
+            out[m.group(1)] = f'"{m.group(1)}": {m.group(2)}'
+    return out
@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import argparse
+import contextvars
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+
+@dataclass
+class Span:
+    """
+    One timed unit of work: a graph node ("node") or an LLM call ("llm").
+    attrs carries tokens_in/tokens_out, retries, fallback, cache_hit, ttft_ms, error, ...
+    """
+    name: str
+    kind: str
+    start: float                      # epoch seconds
+    duration_ms: float = 0.0
+    run_id: Optional[str] = None      # "<deal_id>:<round_number>" of the round being processed
+    parent: Optional[str] = None
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+
+class RingBufferSink:
+    """
+    In-process sink keeping the most recent `size` spans (oldest dropped first).
+    """
+
+    def __init__(self, size: int = 2048):
+        self._spans: deque[Span] = deque(maxlen=size)
+
+    def emit(self, span: Span) -> None:
+        self._spans.append(span)
+
+    def spans(self) -> List[Span]:
+        return list(self._spans)
+
+    def clear(self) -> None:
+        self._spans.clear()
+
+
+class JsonlTraceSink:
+    """
+    Appends one JSON line per span to a local trace file.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path).expanduser().resolve()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def emit(self, span: Span) -> None:
+        line = json.dumps(asdict(span), ensure_ascii=False, default=str)
+        with self._lock:
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("owpa_current_span", default=None)
+
+
+class Tracer:
+    def __init__(self, sink):
+        self.sink = sink
+
+    @contextmanager
+    def span(self, name: str, *, kind: str, run_id: Optional[str] = None, **attrs: Any) -> Iterator[Span]:
+        parent = _current_span.get()
+        sp = Span(
+            name=name,
+            kind=kind,
+            start=time.time(),
+            run_id=run_id or (parent.run_id if parent else None),
+            parent=parent.name if parent else None,
+            attrs=dict(attrs),
+        )
+        token = _current_span.set(sp)
+        t0 = time.perf_counter()
+        try:
+            yield sp
+        except BaseException as e:
+            sp.attrs["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            sp.duration_ms = round((time.perf_counter() - t0) * 1000.0, 3)
+            _current_span.reset(token)
+            self.sink.emit(sp)
+
+
+_UNSET = object()
+_tracer: Any = _UNSET
+
+
+def _tracer_from_env() -> Optional[Tracer]:
+    """
+    OWPA_TRACE=off (default) | ring | jsonl
+    OWPA_TRACE_PATH (jsonl, default ./outputs/traces.jsonl), OWPA_TRACE_RING_SIZE (ring, default 2048)
+    """
+    mode = os.getenv("OWPA_TRACE", "off").strip().lower()
+    if mode == "jsonl":
+        return Tracer(JsonlTraceSink(os.getenv("OWPA_TRACE_PATH", "./outputs/traces.jsonl")))
+    if mode == "ring":
+        return Tracer(RingBufferSink(int(os.getenv("OWPA_TRACE_RING_SIZE", "2048"))))
+    return None
+
+
+def get_tracer() -> Optional[Tracer]:
+    """
+    Process-wide tracer, or None when tracing is off (callers skip all span work).
+    """
+    global _tracer
+    if _tracer is _UNSET:
+        _tracer = _tracer_from_env()
+    return _tracer
+
+
+def set_tracer(tracer: Optional[Tracer]) -> None:
+    """
+    Install a tracer programmatically (e.g. a RingBufferSink in tests or the UI); None turns tracing off.
+    """
+    global _tracer
+    _tracer = tracer
+
+
+def reset_tracer() -> None:
+    """
+    Forget the current tracer so the next get_tracer() re-reads OWPA_TRACE.
+    """
+    global _tracer
+    _tracer = _UNSET
+
+
+def annotate(**attrs: Any) -> None:
+    """
+    Attach attributes to the innermost open span. No-op when tracing is off.
+    """
+    sp = _current_span.get()
+    if sp is not None:
+        sp.attrs.update(attrs)
+
+
+def _run_id(state: Any) -> Optional[str]:
+    deal = state.get("deal_state") if isinstance(state, dict) else None
+    if deal is None:
+        return None
+    return f"{deal.deal_id}:{deal.round_number}"
+
+
+def traced_node(name: str, fn: Callable) -> Callable:
+    """
+    Wraps a graph node in a "node" span. When tracing is off at graph build time the
+    node is returned unwrapped, so the disabled path has zero per-call overhead.
+    """
+    tracer = get_tracer()
+    if tracer is None:
+        return fn
+
+    @functools.wraps(fn)
+    def wrapper(state):
+        with tracer.span(name, kind="node", run_id=_run_id(state)):
+            return fn(state)
+
+    return wrapper
+
+
+def read_spans(path: str | Path) -> Iterator[dict]:
+    p = Path(path)
+    if not p.exists():
+        return
+    with p.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def aggregate(spans: Iterable[dict | Span]) -> Dict[str, Dict[str, Any]]:
+    """
+    Per "<kind>:<name>" latency percentiles plus token, retry, fallback and cache-hit totals
+    (and time-to-first-token percentiles for streamed LLM calls).
+    """
+    from owpa.evaluation.metrics import latency_summary
+
+    durations: Dict[str, List[float]] = {}
+    ttfts: Dict[str, List[float]] = {}
+    totals: Dict[str, Dict[str, Any]] = {}
+    for sp in spans:
+        d = asdict(sp) if isinstance(sp, Span) else sp
+        key = f"{d['kind']}:{d['name']}"
+        attrs = d.get("attrs") or {}
+        durations.setdefault(key, []).append(float(d.get("duration_ms", 0.0)))
+        t = totals.setdefault(
+            key, {"tokens_in": 0, "tokens_out": 0, "retries": 0, "fallbacks": 0, "cache_hits": 0, "errors": 0}
+        )
+        t["tokens_in"] += int(attrs.get("tokens_in") or 0)
+        t["tokens_out"] += int(attrs.get("tokens_out") or 0)
+        t["retries"] += int(attrs.get("retries") or 0)
+        t["fallbacks"] += 1 if attrs.get("fallback") else 0
+        t["cache_hits"] += 1 if attrs.get("cache_hit") else 0
+        t["errors"] += 1 if attrs.get("error") else 0
+        if attrs.get("ttft_ms") is not None:
+            ttfts.setdefault(key, []).append(float(attrs["ttft_ms"]))
+
+    out = {key: {**latency_summary(durations[key]), **totals[key]} for key in sorted(durations)}
+    for key, values in ttfts.items():
+        summary = latency_summary(values)
+        out[key].update(ttft_p50=summary["p50"], ttft_p95=summary["p95"])
+    return out
+
+
+def format_aggregate(agg: Dict[str, Dict[str, Any]]) -> str:
+    lines = [f"{'span':<28} {'n':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'tok_in':>8} {'tok_out':>8} {'retry':>6} {'fallbk':>6} {'cache':>6} {'err':>5}"]
+    for key, s in agg.items():
+        lines.append(
+            f"{key:<28} {int(s['count']):>6} {s['p50']:>9.1f} {s['p95']:>9.1f} {s['p99']:>9.1f} "
+            f"{s['tokens_in']:>8} {s['tokens_out']:>8} {s['retries']:>6} {s['fallbacks']:>6} {s['cache_hits']:>6} {s['errors']:>5}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Aggregate per-node / per-LLM-call latency from a JSONL trace file.")
+    parser.add_argument("path", nargs="?", default=os.getenv("OWPA_TRACE_PATH", "./outputs/traces.jsonl"))
+    parser.add_argument("--json", action="store_true", help="Print machine-readable JSON instead of a table")
+    args = parser.parse_args(argv)
+
+    agg = aggregate(read_spans(args.path))
+    if not agg:
+        print(f"No spans found in {args.path}", file=sys.stderr)
+        return 1
+    print(json.dumps(agg, indent=2) if args.json else format_aggregate(agg))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,24 @@
 from __future__ import annotations
 
+import contextvars
 import json
 import os
+import queue
 import re
-from typing import Any, Dict, Optional
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterator, Optional, Tuple
 
 from dotenv import load_dotenv
 
+from owpa.agent.cassettes import CassetteMiss, CassetteStore, cassette_dir, cassette_key, cassette_mode
+from owpa.agent.ratelimit import Grant, RateLimiter, estimate_tokens, get_limiter
+from owpa.agent.routing import get_router
+from owpa.agent.structured import StructuredOutput, parse_lenient
+from owpa.agent.tracing import annotate, get_tracer
+from owpa.config import load_config
+
 load_dotenv()
 
 
@@ -15,45 +27,332 @@ def use_llm() -> bool:
     return v in {"1", "true", "yes", "y", "on"}
 
 
-def get_model_name() -> str:
-    return os.getenv("OPENAI_MODEL", "gpt-4.1-mini")
+def get_model_name(node: Optional[str] = None) -> str:
+    """
+    OPENAI_MODEL_<NODE> for a graph node when configured, else OPENAI_MODEL.
+    """
+    cfg = load_config()
+    return cfg.node_models.get(node, cfg.openai_model) if node else cfg.openai_model
 
 
-def _openai_client():
-    # OpenAI Python SDK v1.x
+def _select_model(node: Optional[str]) -> str:
+    """
+    Model for this call: routed by observed latency/errors when MODEL_ROUTING is on
+    (the decision is recorded on the span), else the node's configured model.
+    """
+    default = get_model_name(node)
+    router = get_router()
+    if router is None or node is None:
+        annotate(model=default)
+        return default
+    decision = router.choose(node, default)
+    annotate(model=decision.model, route=decision.reason, route_stats=decision.stats)
+    return decision.model
+
+
+# Milliseconds the calls inside the current _observed block spent queued on the rate limiter.
+_limiter_wait_ms: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("owpa_limiter_wait_ms", default=None)
+
+
+@contextmanager
+def _observed(node: Optional[str], model: str) -> Iterator[None]:
+    # Feeds the router with live call latency and errors; cassette replay says nothing about the model.
+    # Time queued on the rate limiter or paused by a 429 is not the model's latency and is left out.
+    router = get_router()
+    if router is None or node is None or cassette_mode() == "replay":
+        yield
+        return
+    waited = [0.0]
+    token = _limiter_wait_ms.set(waited)
+    t0 = time.perf_counter()
+    ok = False
+    try:
+        yield
+        ok = True
+    except GeneratorExit:
+        ok = True  # caller stopped reading a stream: not the model's fault
+        raise
+    finally:
+        _limiter_wait_ms.reset(token)
+        router.observe(node, model, max(0.0, (time.perf_counter() - t0) * 1000.0 - waited[0]), ok)
+
+
+_client = None
+
+
+def set_llm_client(client) -> None:
+    """
+    Reuse one long-lived client (e.g. the UI's cached resource) instead of building one per call.
+    Pass None to go back to per-call construction.
+    """
+    global _client
+    _client = client
+
+
+def new_llm_client(*, max_retries: Optional[int] = None):
+    """
+    A new provider client (OpenAI SDK v1.x), for callers that keep their own and install it
+    with set_llm_client. Never returns the installed one. max_retries=None keeps the SDK default.
+    """
     from openai import OpenAI  # type: ignore
-    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    kwargs = {} if max_retries is None else {"max_retries": max_retries}
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"), **kwargs)
+
+
+def _openai_client():
+    return _client if _client is not None else new_llm_client()
 
 
-def llm_json(system: str, user: str, *, schema_hint: Optional[str] = None) -> Dict[str, Any]:
+def _create(system: str, prompt: str, **kwargs: Any) -> Tuple[Any, Optional[Tuple[RateLimiter, Grant]]]:
+    """
+    One provider call, through the shared rate limiter when RATE_LIMIT_DB_PATH is set.
+    Returns (response, slot); pass the slot to _settle once usage is known.
+    """
+    client = _openai_client()
+    messages = [{"role": "system", "content": system}, {"role": "user", "content": prompt}]
+    limiter = get_limiter()
+    if limiter is None:
+        return client.chat.completions.create(messages=messages, **kwargs), None
+    if hasattr(client, "with_options"):
+        # The SDK would retry a 429 with its own backoff in every process; the limiter must see it.
+        client = client.with_options(max_retries=0)
+    last = [0.0]
+
+    def request() -> Any:
+        t = time.perf_counter()
+        try:
+            return client.chat.completions.create(messages=messages, **kwargs)
+        finally:
+            last[0] = time.perf_counter() - t
+
+    t0 = time.perf_counter()
+    resp, grant = limiter.call(request, tokens=estimate_tokens(system, prompt))
+    waited = _limiter_wait_ms.get()
+    if waited is not None:
+        # Everything but the attempt that went through: queueing, 429 pauses, rejected attempts.
+        waited[0] += (time.perf_counter() - t0 - last[0]) * 1000.0
+    annotate(rate_limit_wait_ms=grant.waited_ms)
+    return resp, (limiter, grant)
+
+
+def _settle(slot: Optional[Tuple[RateLimiter, Grant]], usage: Any) -> None:
+    if usage is not None:
+        annotate(tokens_in=usage.prompt_tokens, tokens_out=usage.completion_tokens)
+    if slot is not None:
+        limiter, grant = slot
+        limiter.settle(grant, usage.total_tokens if usage is not None else None)
+
+
+def _chat_completion(model: str, system: str, prompt: str) -> str:
+    resp, slot = _create(system, prompt, model=model, temperature=0.2)
+    _settle(slot, getattr(resp, "usage", None))
+    return resp.choices[0].message.content or "{}"
+
+
+def _complete(model: str, system: str, prompt: str) -> str:
+    """
+    Raw completion text, routed through the cassette store when
+    OWPA_LLM_CASSETTE_MODE is replay/record (see owpa.agent.cassettes).
     """
-    Minimal JSON-only LLM call.
+    mode = cassette_mode()
+    if mode == "off":
+        return _chat_completion(model, system, prompt)
+
+    store = CassetteStore(cassette_dir())
+    if mode == "replay":
+        text = store.get(system, prompt)
+        if text is None:
+            raise CassetteMiss(f"No cassette for prompt key {cassette_key(system, prompt)} in {store.path}")
+        # No usage block on replay: ~4 chars/token estimate keeps token reports meaningful.
+        annotate(cache_hit=True, tokens_estimated=True, tokens_in=(len(system) + len(prompt)) // 4, tokens_out=len(text) // 4)
+        return text
+
+    text = _chat_completion(model, system, prompt)
+    store.put(system, prompt, text, model=model)
+    return text
+
+
+def llm_json(
+    system: str,
+    user: str,
+    *,
+    schema_hint: Optional[str] = None,
+    output: Optional[StructuredOutput] = None,
+    node: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Minimal JSON-only LLM call; `node` picks the model (see get_model_name / owpa.agent.routing).
+    With a compiled `output` schema the reply is validated (see _llm_structured); otherwise it is
+    parsed leniently and returned as is.
     If USE_LLM=false, raises (caller should fallback).
     """
     if not use_llm():
         raise RuntimeError("USE_LLM=false")
 
-    client = _openai_client()
-    model = get_model_name()
+    tracer = get_tracer()
+    if tracer is None:
+        return _llm_json(system, user, schema_hint=schema_hint, output=output, node=node)
+    with tracer.span("llm_json", kind="llm"):
+        return _llm_json(system, user, schema_hint=schema_hint, output=output, node=node)
+
+
+def _llm_json(
+    system: str,
+    user: str,
+    *,
+    schema_hint: Optional[str] = None,
+    output: Optional[StructuredOutput] = None,
+    node: Optional[str] = None,
+) -> Dict[str, Any]:
+    model = _select_model(node)
 
     # We keep it robust by requesting strict JSON in plain text.
     # (Avoids depending on newer structured-output features.)
     prompt = user
+    schema_hint = output.hint if output is not None else schema_hint
     if schema_hint:
         prompt = f"{user}\n\nReturn ONLY valid JSON matching this schema:\n{schema_hint}"
 
-    resp = client.chat.completions.create(
-        model=model,
-        temperature=0.2,
-        messages=[
-            {"role": "system", "content": system},
-            {"role": "user", "content": prompt},
-        ],
-    )
-    text = resp.choices[0].message.content or "{}"
-
-    # Best-effort: extract JSON object from response
-    m = re.search(r"\{.*\}", text, flags=re.S)
-    if not m:
-        return {}
-    return json.loads(m.group(0))
+    with _observed(node, model):
+        text = _complete(model, system, prompt)
+    if output is not None:
+        return _llm_structured(model, system, user, text, output)
+
+    # Best-effort: tolerant parse of the first JSON object (prose, comments, truncation)
+    data, parser = parse_lenient(text)
+    if parser.repairs:
+        annotate(json_repairs=parser.repairs)
+    return data if isinstance(data, dict) else {}
+
+
+# Follow-up calls allowed per reply to fill fields a malformed reply lost.
+MAX_FOLLOWUPS = 1
+
+
+def _llm_structured(model: str, system: str, user: str, text: str, output: StructuredOutput) -> Dict[str, Any]:
+    """
+    Repairs and validates a reply against `output`. If the reply was truncated, had invalid
+    fields or lacks a required one, the model is asked for just those fields instead of
+    re-running the whole prompt; whatever is still missing keeps the schema defaults.
+    """
+    parsed = output.parse(text)
+    followups = 0
+    while output.needs_followup(parsed) and followups < MAX_FOLLOWUPS:
+        followups += 1
+        prompt = f"{user}\n\nReturn ONLY valid JSON with just these fields:\n{output.hint_for(parsed.missing)}"
+        try:
+            data, _ = parse_lenient(_complete(model, system, prompt))
+        except Exception as e:
+            annotate(followup_error=f"{type(e).__name__}: {e}")
+            break
+        parsed = output.merge(parsed, data)
+
+    if parsed.repairs:
+        annotate(json_repairs=parsed.repairs)
+    if followups:
+        annotate(retries=followups)  # the tracing summary's retries column
+    if parsed.missing:
+        annotate(missing_fields=list(parsed.missing))
+    return parsed.value.model_dump(mode="json")
+
+
+_DONE = object()
+
+
+def _stream_deltas(model: str, system: str, prompt: str, stop: threading.Event) -> Iterator[str]:
+    """
+    Text deltas of one streamed completion, cassette-aware like _complete.
+    Replay yields the recorded text word by word; record stores the full text once the stream ends.
+    """
+    mode = cassette_mode()
+    store = CassetteStore(cassette_dir()) if mode != "off" else None
+    if store is not None and mode == "replay":
+        text = store.get(system, prompt)
+        if text is None:
+            raise CassetteMiss(f"No cassette for prompt key {cassette_key(system, prompt)} in {store.path}")
+        annotate(cache_hit=True, tokens_estimated=True, tokens_in=(len(system) + len(prompt)) // 4, tokens_out=len(text) // 4)
+        yield from re.findall(r"\s*\S+", text)
+        return
+
+    resp, slot = _create(system, prompt, model=model, temperature=0.2, stream=True, stream_options={"include_usage": True})
+    parts = []
+    usage = None
+    try:
+        for chunk in resp:
+            if stop.is_set():
+                return
+            usage = getattr(chunk, "usage", None) or usage
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                yield delta
+    finally:
+        close = getattr(resp, "close", None)
+        if close is not None:
+            close()
+        _settle(slot, usage)
+    if store is not None:
+        store.put(system, prompt, "".join(parts), model=model)
+
+
+def llm_stream(
+    system: str,
+    user: str,
+    *,
+    first_token_timeout: Optional[float] = None,
+    timeout: Optional[float] = None,
+    node: Optional[str] = None,
+) -> Iterator[str]:
+    """
+    Streamed plain-text LLM call: yields text deltas as they arrive.
+    The request runs on a daemon thread, so the caller never blocks past the deadlines:
+    TimeoutError if no token within `first_token_timeout` s or the whole text not within `timeout` s.
+    Time to first token is recorded as `ttft_ms` on the "llm_stream" span.
+    If USE_LLM=false, raises (caller should fallback).
+    """
+    if not use_llm():
+        raise RuntimeError("USE_LLM=false")
+
+    tracer = get_tracer()
+    with tracer.span("llm_stream", kind="llm") if tracer is not None else nullcontext():
+        model = _select_model(node)
+        q: "queue.Queue[Any]" = queue.Queue()
+        stop = threading.Event()
+
+        def produce() -> None:
+            try:
+                for delta in _stream_deltas(model, system, user, stop):
+                    q.put(delta)
+                q.put(_DONE)
+            except BaseException as e:
+                q.put(e)
+
+        with _observed(node, model):
+            # Copy of the current context, so token usage lands on this span and limiter waits reach _observed.
+            ctx = contextvars.copy_context()
+            threading.Thread(target=ctx.run, args=(produce,), name="owpa-llm-stream", daemon=True).start()
+
+            t0 = time.perf_counter()
+            first = True
+            try:
+                while True:
+                    limits = []
+                    if timeout is not None:
+                        limits.append(t0 + timeout)
+                    if first and first_token_timeout is not None:
+                        limits.append(t0 + first_token_timeout)
+                    try:
+                        item = q.get(timeout=max(0.0, min(limits) - time.perf_counter()) if limits else None)
+                    except queue.Empty:
+                        annotate(timeout=True)
+                        raise TimeoutError("first token" if first else "draft completion") from None
+                    if item is _DONE:
+                        return
+                    if isinstance(item, BaseException):
+                        raise item
+                    if first:
+                        annotate(ttft_ms=round((time.perf_counter() - t0) * 1000.0, 3))
+                        first = False
+                    yield item
+            finally:
+                stop.set()
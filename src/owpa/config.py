@@ -3,22 +3,70 @@ from __future__ import annotations
 import os
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Dict, Optional, Tuple
 
 
 @dataclass(frozen=True)
 class AppConfig:
     # Fixtures
     suppliers_fixture_path: Path
+    # Memory-mapped supplier matrices built from the fixture (None = load the fixture per round)
+    supplier_matrix_dir: Optional[Path]
     playbook_path: Path
     # State store
     state_store_path: Path
 
-    # Model
+    # Model (OPENAI_MODEL, overridden per node by OPENAI_MODEL_<NODE>)
     openai_model: str
+    node_models: Dict[str, str]
+
+    # Latency-aware routing: MODEL_ROUTES_<NODE>=cheap,strong candidates in preference order
+    model_routing: bool
+    model_routes: Dict[str, Tuple[str, ...]]
+    model_latency_budget_ms: float
+    node_latency_budgets_ms: Dict[str, float]
 
     # Rules
     require_snippet_for_numbers: bool
 
+    # Background jobs (UI rounds)
+    jobs_db_path: Path
+    job_workers: int
+
+    # Node-level checkpoints (None = disabled)
+    checkpoint_db_path: Optional[Path]
+    checkpoint_ttl_hours: float
+    # In-process memo of node outputs by input fingerprint, per compiled graph (0 = disabled)
+    node_memo_size: int
+
+    # Mailbox ingestion (thread -> deal map, watermarks)
+    mailbox_db_path: Path
+
+    # Portfolio aggregates maintained by persist_state
+    aggregates_db_path: Path
+    # Deadline index maintained by persist_state (defaults to the aggregates database)
+    deadlines_db_path: Path
+
+    # Writable supplier memory (None = read-only suppliers fixture)
+    supplier_memory_db_path: Optional[Path]
+
+    # Email drafts: "template" or "llm" (streamed, template fallback on timeout)
+    draft_mode: str
+    draft_first_token_timeout_s: float
+    draft_timeout_s: float
+
+    # Reuse of classify/extract analyses for near-duplicate emails (None = disabled)
+    near_dup_db_path: Optional[Path]
+
+    # Shared LLM rate limiter across processes (None = disabled)
+    rate_limit_db_path: Optional[Path]
+    llm_rpm: float
+    llm_tpm: float
+
+
+# Values that turn an optional path setting off.
+_OFF = {"", "0", "off", "false", "no", "none"}
+
 
 def _bool_env(name: str, default: bool) -> bool:
     val = os.getenv(name)
@@ -27,20 +75,106 @@ def _bool_env(name: str, default: bool) -> bool:
     return val.strip().lower() in {"1", "true", "yes", "y", "on"}
 
 
+def _node_env(prefix: str) -> Dict[str, str]:
+    # PREFIX_<NODE>=value -> {"<node>": value}, e.g. OPENAI_MODEL_CLASSIFY -> "classify"
+    return {k[len(prefix):].lower(): v.strip() for k, v in os.environ.items() if k.startswith(prefix) and v.strip()}
+
+
+def isolated_env(root: Path) -> Dict[str, str]:
+    """
+    Env overrides for test and golden runs: the stores a round writes live under `root` and the
+    optional ones are off. Set explicitly (not unset), so a local .env cannot turn them back on.
+    """
+    root = Path(root)
+    return {
+        "STATE_STORE_PATH": str(root / "state_store.jsonl"),
+        "AGGREGATES_DB_PATH": str(root / "aggregates.sqlite"),
+        "DEADLINES_DB_PATH": "",  # the aggregates database above
+        "JOBS_DB_PATH": str(root / "jobs.sqlite"),
+        "MAILBOX_DB_PATH": str(root / "mailbox.sqlite"),
+        "CHECKPOINT_DB_PATH": "",
+        "NEAR_DUP_DB_PATH": "",
+        "SUPPLIER_MEMORY_DB_PATH": "",
+        "SUPPLIER_MATRIX_DIR": "off",
+        "RATE_LIMIT_DB_PATH": "",
+        "NODE_MEMO_SIZE": "0",
+        "MODEL_ROUTING": "false",
+    }
+
+
 def load_config() -> AppConfig:
     suppliers_fixture_path = Path(
         os.getenv("SUPPLIERS_FIXTURE_PATH", "./data/fixtures/suppliers.json")
     )
+    supplier_matrix = os.getenv("SUPPLIER_MATRIX_DIR", "").strip()
+    supplier_matrix_dir = None if supplier_matrix.lower() in _OFF else Path(supplier_matrix)
     playbook_path = Path(os.getenv("PLAYBOOK_PATH", "./data/fixtures/playbook_wtg_ltsa.json"))
     state_store_path = Path(os.getenv("STATE_STORE_PATH", "./outputs/state_store.jsonl"))
 
     openai_model = os.getenv("OPENAI_MODEL", "gpt-4.1-mini")
+    node_models = _node_env("OPENAI_MODEL_")
+    model_routing = _bool_env("MODEL_ROUTING", False)
+    model_routes = {
+        node: tuple(m.strip() for m in v.split(",") if m.strip()) for node, v in _node_env("MODEL_ROUTES_").items()
+    }
+    model_latency_budget_ms = float(os.getenv("MODEL_LATENCY_BUDGET_MS", "4000"))
+    node_latency_budgets_ms = {node: float(v) for node, v in _node_env("MODEL_LATENCY_BUDGET_MS_").items()}
     require_snippet_for_numbers = _bool_env("REQUIRE_CITATION_FOR_NUMBERS", True)
 
+    jobs_db_path = Path(os.getenv("JOBS_DB_PATH", "./outputs/jobs.sqlite"))
+    job_workers = int(os.getenv("OWPA_JOB_WORKERS", "4"))
+
+    checkpoint_db = os.getenv("CHECKPOINT_DB_PATH", "").strip()
+    checkpoint_db_path = Path(checkpoint_db) if checkpoint_db else None
+    checkpoint_ttl_hours = float(os.getenv("CHECKPOINT_TTL_HOURS", "168"))
+    node_memo_size = int(os.getenv("NODE_MEMO_SIZE", "0"))
+
+    mailbox_db_path = Path(os.getenv("MAILBOX_DB_PATH", "./outputs/mailbox.sqlite"))
+    aggregates_db_path = Path(os.getenv("AGGREGATES_DB_PATH", "./outputs/aggregates.sqlite"))
+    deadlines_db = os.getenv("DEADLINES_DB_PATH", "").strip()
+    deadlines_db_path = Path(deadlines_db) if deadlines_db else aggregates_db_path
+
+    supplier_memory_db = os.getenv("SUPPLIER_MEMORY_DB_PATH", "").strip()
+    supplier_memory_db_path = Path(supplier_memory_db) if supplier_memory_db else None
+
+    draft_mode = os.getenv("DRAFT_MODE", "template").strip().lower()
+    draft_first_token_timeout_s = float(os.getenv("DRAFT_FIRST_TOKEN_TIMEOUT_S", "3"))
+    draft_timeout_s = float(os.getenv("DRAFT_TIMEOUT_S", "20"))
+
+    near_dup_db = os.getenv("NEAR_DUP_DB_PATH", "").strip()
+    near_dup_db_path = Path(near_dup_db) if near_dup_db else None
+
+    rate_limit_db = os.getenv("RATE_LIMIT_DB_PATH", "").strip()
+    rate_limit_db_path = Path(rate_limit_db) if rate_limit_db else None
+    llm_rpm = float(os.getenv("LLM_RPM", "500"))
+    llm_tpm = float(os.getenv("LLM_TPM", "200000"))
+
     return AppConfig(
         suppliers_fixture_path=suppliers_fixture_path,
+        supplier_matrix_dir=supplier_matrix_dir,
         playbook_path=playbook_path,
         state_store_path=state_store_path,
         openai_model=openai_model,
+        node_models=node_models,
+        model_routing=model_routing,
+        model_routes=model_routes,
+        model_latency_budget_ms=model_latency_budget_ms,
+        node_latency_budgets_ms=node_latency_budgets_ms,
         require_snippet_for_numbers=require_snippet_for_numbers,
+        jobs_db_path=jobs_db_path,
+        job_workers=job_workers,
+        checkpoint_db_path=checkpoint_db_path,
+        checkpoint_ttl_hours=checkpoint_ttl_hours,
+        node_memo_size=node_memo_size,
+        mailbox_db_path=mailbox_db_path,
+        aggregates_db_path=aggregates_db_path,
+        deadlines_db_path=deadlines_db_path,
+        supplier_memory_db_path=supplier_memory_db_path,
+        draft_mode=draft_mode,
+        draft_first_token_timeout_s=draft_first_token_timeout_s,
+        draft_timeout_s=draft_timeout_s,
+        near_dup_db_path=near_dup_db_path,
+        rate_limit_db_path=rate_limit_db_path,
+        llm_rpm=llm_rpm,
+        llm_tpm=llm_tpm,
     )
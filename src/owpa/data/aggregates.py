@@ -0,0 +1,256 @@
+"""
+Materialized portfolio aggregates keyed by (package, supplier, intent, month).
+
+Every deal contributes one vector of counters and sums (from its latest snapshot) to exactly one
+key. persist_state applies the difference between a deal's new and previous contribution, which
+is O(1) per round and never scans the state store. `rebuild` recomputes everything from the store.
+
+  PYTHONPATH=src python -m owpa.data.aggregates rebuild
+  PYTHONPATH=src python -m owpa.data.aggregates show --group supplier
+"""
+from __future__ import annotations
+
+import argparse
+import sqlite3
+import sys
+from pathlib import Path
+from typing import Any, ContextManager, Dict, List, Optional, Sequence, Set
+
+from owpa.data.storage import JsonlDealStateStore, ensure_parent_dir, sqlite_connect
+from owpa.schemas.deal_state import DealState
+
+
+DEFAULT_APPROVAL_THRESHOLD = 5.0
+
+KEY_COLUMNS = ("package", "supplier", "intent", "month")
+METRICS = (
+    "deals",
+    "open_deals",
+    "closed_deals",
+    "rounds",
+    "requested_n",        # open deals with a stated uplift in their latest ask
+    "requested_sum",
+    "opening_n",          # ... and the first uplift they asked for
+    "opening_sum",
+    "settled_n",          # closed deals: metadata settled_pct, else last stated uplift
+    "settled_sum",
+    "approval_breaches",  # open deals whose latest uplift exceeds the approval threshold
+)
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS portfolio_aggregates (
+    {", ".join(f"{c} TEXT NOT NULL" for c in KEY_COLUMNS)},
+    {", ".join(f"{m} REAL NOT NULL DEFAULT 0" for m in METRICS)},
+    PRIMARY KEY ({", ".join(KEY_COLUMNS)})
+);
+CREATE TABLE IF NOT EXISTS deal_contributions (
+    deal_id        TEXT PRIMARY KEY,
+    round_number   INTEGER NOT NULL,
+    opening_uplift REAL,
+    {", ".join(f"{c} TEXT NOT NULL" for c in KEY_COLUMNS)},
+    {", ".join(f"{m} REAL NOT NULL" for m in METRICS)}
+);
+"""
+
+
+def deal_status(deal: DealState) -> str:
+    return str(deal.metadata.get("status") or "open")
+
+
+def contribution(deal: DealState, *, opening_uplift: Optional[float], threshold: float) -> tuple[tuple, Dict[str, float]]:
+    """
+    (key, metric vector) a deal adds to the aggregates.
+    """
+    ask = deal.supplier_ask
+    seen = deal.last_supplier_email_received_at or deal.last_updated_at
+    key = (
+        deal.package.value,
+        deal.supplier_name,
+        ask.intent.value if ask else "none",
+        seen.strftime("%Y-%m"),
+    )
+    uplift = ask.headline_price_change_pct.value if ask and ask.headline_price_change_pct else None
+    is_open = deal_status(deal) != "closed"
+    m = dict.fromkeys(METRICS, 0.0)
+    m["deals"] = 1.0
+    m["open_deals"] = float(is_open)
+    m["closed_deals"] = float(not is_open)
+    m["rounds"] = float(deal.round_number)
+    if uplift is not None and is_open:
+        m["requested_n"], m["requested_sum"] = 1.0, uplift
+        m["approval_breaches"] = float(uplift > threshold)
+    if opening_uplift is not None and is_open:
+        m["opening_n"], m["opening_sum"] = 1.0, opening_uplift
+    settled = deal.metadata.get("settled_pct", uplift)
+    if settled is not None and not is_open:
+        m["settled_n"], m["settled_sum"] = 1.0, float(settled)
+    return key, m
+
+
+def approval_threshold(playbook: Optional[dict]) -> float:
+    thresholds = (playbook or {}).get("policy_thresholds", {})
+    return float(thresholds.get("price_uplift_pct_requires_internal_approval", DEFAULT_APPROVAL_THRESHOLD))
+
+
+# Databases whose schema was already created by this process (persist_state opens one per round).
+_READY: Set[Path] = set()
+
+
+class PortfolioAggregates:
+    """
+    SQLite tables: portfolio_aggregates (one row per key) and deal_contributions (what each deal
+    currently adds, so the next round can subtract it).
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path).expanduser().resolve()
+        if self.path in _READY and self.path.exists():
+            return
+        ensure_parent_dir(self.path)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+        _READY.add(self.path)
+
+    def _connect(self) -> ContextManager[sqlite3.Connection]:
+        return sqlite_connect(self.path, autocommit=True)
+
+    def apply(self, deal: DealState, *, threshold: float = DEFAULT_APPROVAL_THRESHOLD) -> bool:
+        """
+        Replaces the deal's previous contribution with the one of this snapshot.
+        Snapshots older than the one already applied are ignored (returns False).
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                applied = self._apply(conn, deal, threshold)
+                conn.execute("COMMIT")
+                return applied
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _apply(self, conn: sqlite3.Connection, deal: DealState, threshold: float, opening: Optional[float] = None) -> bool:
+        cols = ", ".join(("round_number", "opening_uplift") + KEY_COLUMNS + METRICS)
+        row = conn.execute(f"SELECT {cols} FROM deal_contributions WHERE deal_id = ?", (deal.deal_id,)).fetchone()
+
+        if row is not None:
+            if deal.round_number < row[0]:
+                return False
+            opening = row[1]
+            prev_key = tuple(row[2 : 2 + len(KEY_COLUMNS)])
+            prev = dict(zip(METRICS, row[2 + len(KEY_COLUMNS) :]))
+            self._add(conn, prev_key, {k: -v for k, v in prev.items()})
+
+        ask = deal.supplier_ask
+        if opening is None and ask and ask.headline_price_change_pct:
+            opening = ask.headline_price_change_pct.value
+        key, new = contribution(deal, opening_uplift=opening, threshold=threshold)
+        self._add(conn, key, new)
+        conn.execute(
+            f"INSERT OR REPLACE INTO deal_contributions (deal_id, {cols}) VALUES ({', '.join('?' * (3 + len(KEY_COLUMNS) + len(METRICS)))})",
+            (deal.deal_id, deal.round_number, opening, *key, *(new[m] for m in METRICS)),
+        )
+        return True
+
+    @staticmethod
+    def _add(conn: sqlite3.Connection, key: tuple, delta: Dict[str, float]) -> None:
+        conn.execute(
+            f"INSERT INTO portfolio_aggregates ({', '.join(KEY_COLUMNS + METRICS)}) "
+            f"VALUES ({', '.join('?' * (len(KEY_COLUMNS) + len(METRICS)))}) "
+            f"ON CONFLICT ({', '.join(KEY_COLUMNS)}) DO UPDATE SET "
+            + ", ".join(f"{m} = {m} + excluded.{m}" for m in METRICS),
+            (*key, *(delta[m] for m in METRICS)),
+        )
+        conn.execute(
+            f"DELETE FROM portfolio_aggregates WHERE deals <= 0 AND {' AND '.join(f'{c} = ?' for c in KEY_COLUMNS)}", key
+        )
+
+    def opening_uplift(self, deal_id: str) -> Optional[float]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT opening_uplift FROM deal_contributions WHERE deal_id = ?", (deal_id,)).fetchone()
+        return row[0] if row else None
+
+    def rebuild(self, store: JsonlDealStateStore, *, threshold: float = DEFAULT_APPROVAL_THRESHOLD) -> int:
+        """
+        Recomputes both tables from the state store in one transaction. Returns the number of deals.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM portfolio_aggregates")
+                conn.execute("DELETE FROM deal_contributions")
+                first_uplift: Dict[str, float] = {}
+                latest: Dict[str, dict] = {}
+                for rec in store.iter_records():
+                    state = rec["state"]
+                    pct = ((state.get("supplier_ask") or {}).get("headline_price_change_pct") or {}).get("value")
+                    if pct is not None:
+                        first_uplift.setdefault(rec["deal_id"], float(pct))
+                    latest[rec["deal_id"]] = state
+                for deal_id, state in latest.items():
+                    # The latest snapshot alone does not carry the opening ask; seed it from the first one.
+                    self._apply(conn, DealState.model_validate(state), threshold, opening=first_uplift.get(deal_id))
+                conn.execute("DELETE FROM portfolio_aggregates WHERE deals <= 0")
+                conn.execute("COMMIT")
+                return len(latest)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def summary(self, group_by: Sequence[str] = ("supplier",), **filters: str) -> List[Dict[str, Any]]:
+        """
+        Metric sums grouped by any key columns, plus avg_requested / avg_opening / avg_settled uplift.
+        Filters are equality matches on key columns (e.g. package="WTG+LTSA").
+        """
+        for c in list(group_by) + list(filters):
+            if c not in KEY_COLUMNS:
+                raise ValueError(f"Unknown aggregate key {c!r}; expected one of {KEY_COLUMNS}")
+        where = " AND ".join(f"{c} = ?" for c in filters) or "1 = 1"
+        select = ", ".join(list(group_by) + [f"SUM({m})" for m in METRICS])
+        group = f"GROUP BY {', '.join(group_by)} ORDER BY {', '.join(group_by)}" if group_by else ""
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT {select} FROM portfolio_aggregates WHERE {where} {group}", tuple(filters.values())).fetchall()
+
+        out = []
+        for row in rows:
+            item: Dict[str, Any] = dict(zip(group_by, row[: len(group_by)]))
+            m = dict(zip(METRICS, row[len(group_by) :]))
+            if m["deals"] is None:
+                continue
+            item.update({k: int(v) if k.endswith(("deals", "_n", "rounds", "breaches")) else round(v, 4) for k, v in m.items()})
+            for name in ("requested", "opening", "settled"):
+                n = m[f"{name}_n"]
+                item[f"avg_{name}_pct"] = round(m[f"{name}_sum"] / n, 2) if n else None
+            out.append(item)
+        return out
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    from owpa.config import load_config
+    from owpa.data.loader import load_playbook
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("rebuild", help="Recompute aggregates from the state store")
+    show = sub.add_parser("show", help="Print aggregates")
+    show.add_argument("--group", default="supplier", help=f"Comma-separated subset of {','.join(KEY_COLUMNS)}")
+    show.add_argument("--package", default=None)
+    args = parser.parse_args(argv)
+
+    cfg = load_config()
+    agg = PortfolioAggregates(cfg.aggregates_db_path)
+    if args.cmd == "rebuild":
+        n = agg.rebuild(JsonlDealStateStore(cfg.state_store_path), threshold=approval_threshold(load_playbook(cfg.playbook_path)))
+        print(f"Rebuilt aggregates for {n} deals -> {agg.path}")
+        return 0
+
+    group = [g.strip() for g in args.group.split(",") if g.strip()]
+    filters = {"package": args.package} if args.package else {}
+    for row in agg.summary(group, **filters):
+        print(row)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,320 @@
+"""
+Deadline index over open deals, and a scheduler that streams them in deadline order.
+
+persist_state (and closing a deal) upserts the deal's latest SupplierAsk.deadline into one SQLite
+row, and only writes when the deadline appears, moves or goes away. Rows are indexed by
+deadline, so "what expires in the next 48 hours" is a range scan that never reads the state
+store. Every write takes the next change sequence number. DeadlineScheduler keeps a heapq
+min-heap fed from those changes: O(log n) per update, with superseded entries dropped lazily
+when they reach the top.
+
+  PYTHONPATH=src python -m owpa.data.deadlines upcoming --hours 48
+  PYTHONPATH=src python -m owpa.data.deadlines watch --lead-hours 24
+  PYTHONPATH=src python -m owpa.data.deadlines rebuild
+"""
+from __future__ import annotations
+
+import argparse
+import heapq
+import sqlite3
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, ContextManager, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from owpa.data.aggregates import deal_status
+from owpa.data.storage import JsonlDealStateStore, ensure_parent_dir, sqlite_connect
+from owpa.schemas.deal_state import DealState
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS deadlines (
+    deal_id      TEXT PRIMARY KEY,
+    supplier     TEXT NOT NULL,
+    intent       TEXT NOT NULL,
+    deadline     TEXT,              -- as extracted (ISO-8601)
+    deadline_ts  REAL,              -- epoch seconds, naive deadlines read as UTC; NULL = none / closed
+    round_number INTEGER NOT NULL,
+    seq          INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS deadlines_by_ts ON deadlines (deadline_ts) WHERE deadline_ts IS NOT NULL;
+CREATE INDEX IF NOT EXISTS deadlines_by_seq ON deadlines (seq);
+-- Last change sequence number handed out; rebuild never resets it, so schedulers keep up.
+CREATE TABLE IF NOT EXISTS deadlines_meta (
+    key   TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+_COLUMNS = "deal_id, supplier, intent, deadline, deadline_ts, round_number, seq"
+
+
+def epoch(deadline: datetime) -> float:
+    return (deadline if deadline.tzinfo else deadline.replace(tzinfo=timezone.utc)).timestamp()
+
+
+@dataclass(frozen=True)
+class DeadlineEntry:
+    deal_id: str
+    supplier: str
+    intent: str
+    deadline: Optional[datetime]
+    deadline_ts: Optional[float]
+    round_number: int
+    seq: int
+
+    @classmethod
+    def from_row(cls, row: tuple) -> "DeadlineEntry":
+        deal_id, supplier, intent, deadline, ts, round_number, seq = row
+        return cls(deal_id, supplier, intent, datetime.fromisoformat(deadline) if deadline else None, ts, round_number, seq)
+
+    def hours_left(self, now: Optional[float] = None) -> float:
+        return round(((self.deadline_ts or 0.0) - (time.time() if now is None else now)) / 3600.0, 1)
+
+
+def _next_seq(conn: sqlite3.Connection) -> int:
+    # Indexes created before the counter existed start from their highest row.
+    return conn.execute(
+        "INSERT INTO deadlines_meta (key, value) VALUES ('seq', (SELECT COALESCE(MAX(seq), 0) + 1 FROM deadlines)) "
+        "ON CONFLICT (key) DO UPDATE SET value = value + 1 RETURNING value"
+    ).fetchone()[0]
+
+
+# Databases whose schema was already created by this process (persist_state opens one per round).
+_READY: Set[Path] = set()
+
+
+class DeadlineIndex:
+    """
+    One row per deal that ever had a deadline; deadline_ts is NULL once it has none or is closed.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path).expanduser().resolve()
+        if self.path in _READY and self.path.exists():
+            return
+        ensure_parent_dir(self.path)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+        _READY.add(self.path)
+
+    def _connect(self) -> ContextManager[sqlite3.Connection]:
+        return sqlite_connect(self.path, autocommit=True)
+
+    def apply(self, deal: DealState) -> bool:
+        """
+        Records the deal's current deadline. Returns True when the row changed; snapshots older
+        than the one already applied and unchanged deadlines are no-ops.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                changed = self._apply(conn, deal)
+                conn.execute("COMMIT")
+                return changed
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _apply(self, conn: sqlite3.Connection, deal: DealState) -> bool:
+        row = conn.execute(
+            "SELECT round_number, deadline_ts, supplier, intent FROM deadlines WHERE deal_id = ?", (deal.deal_id,)
+        ).fetchone()
+        if row is not None and deal.round_number < row[0]:
+            return False
+
+        ask = deal.supplier_ask
+        deadline = ask.deadline if ask and deal_status(deal) != "closed" else None
+        ts = epoch(deadline) if deadline else None
+        intent = ask.intent.value if ask else "none"
+        if row is None and ts is None:
+            return False
+        if row is not None and tuple(row[1:]) == (ts, deal.supplier_name, intent):
+            return False
+
+        conn.execute(
+            f"INSERT OR REPLACE INTO deadlines ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (deal.deal_id, deal.supplier_name, intent, deadline.isoformat() if deadline else None, ts, deal.round_number, _next_seq(conn)),
+        )
+        return True
+
+    def rebuild(self, store: JsonlDealStateStore) -> int:
+        """
+        Re-applies every deal's latest snapshot from the state store. Returns the number of deadlines.
+        Rebuilt rows are numbered after every earlier change, so a running scheduler picks them up.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                dropped = conn.execute("SELECT deal_id, supplier, intent, round_number FROM deadlines WHERE deadline_ts IS NOT NULL").fetchall()
+                conn.execute("DELETE FROM deadlines")
+                for deal in store.iter_latest():
+                    self._apply(conn, deal)
+                present = {row[0] for row in conn.execute("SELECT deal_id FROM deadlines")}
+                for deal_id, supplier, intent, round_number in dropped:
+                    if deal_id not in present:
+                        # Gone from the store: a cleared row tells schedulers to forget it.
+                        conn.execute(
+                            f"INSERT INTO deadlines ({_COLUMNS}) VALUES (?, ?, ?, NULL, NULL, ?, ?)",
+                            (deal_id, supplier, intent, round_number, _next_seq(conn)),
+                        )
+                n = conn.execute("SELECT COUNT(*) FROM deadlines WHERE deadline_ts IS NOT NULL").fetchone()[0]
+                conn.execute("COMMIT")
+                return n
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def upcoming(
+        self,
+        within: Optional[timedelta] = None,
+        *,
+        now: Optional[float] = None,
+        include_overdue: bool = True,
+        limit: Optional[int] = None,
+    ) -> List[DeadlineEntry]:
+        """
+        Open deadlines in deadline order, up to now + `within` (all when None).
+        """
+        now = time.time() if now is None else now
+        where = ["deadline_ts IS NOT NULL"]
+        params: List[float | int] = []
+        if not include_overdue:
+            where.append("deadline_ts >= ?")
+            params.append(now)
+        if within is not None:
+            where.append("deadline_ts <= ?")
+            params.append(now + within.total_seconds())
+        sql = f"SELECT {_COLUMNS} FROM deadlines WHERE {' AND '.join(where)} ORDER BY deadline_ts, deal_id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._connect() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return [DeadlineEntry.from_row(r) for r in rows]
+
+    def changes_since(self, seq: int) -> List[DeadlineEntry]:
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT {_COLUMNS} FROM deadlines WHERE seq > ? ORDER BY seq", (seq,)).fetchall()
+        return [DeadlineEntry.from_row(r) for r in rows]
+
+
+class DeadlineScheduler:
+    """
+    Min-heap of (deadline_ts, seq, deal_id) over the index. refresh() pushes only rows changed since
+    the last call; an entry is stale when its deal has a newer seq, and is skipped at the top.
+    """
+
+    def __init__(self, index: DeadlineIndex):
+        self.index = index
+        self._heap: List[Tuple[float, int, str]] = []
+        self._current: Dict[str, DeadlineEntry] = {}
+        self._seq = 0
+
+    def __len__(self) -> int:
+        return len(self._current)
+
+    def refresh(self) -> int:
+        """
+        Pulls changes from the index; returns how many deals changed.
+        """
+        changes = self.index.changes_since(self._seq)
+        for entry in changes:
+            self._seq = max(self._seq, entry.seq)
+            if entry.deadline_ts is None:
+                self._current.pop(entry.deal_id, None)
+                continue
+            self._current[entry.deal_id] = entry
+            heapq.heappush(self._heap, (entry.deadline_ts, entry.seq, entry.deal_id))
+        return len(changes)
+
+    def _top(self) -> Optional[DeadlineEntry]:
+        while self._heap:
+            _, seq, deal_id = self._heap[0]
+            entry = self._current.get(deal_id)
+            if entry is not None and entry.seq == seq:
+                return entry
+            heapq.heappop(self._heap)
+        return None
+
+    def peek(self) -> Optional[DeadlineEntry]:
+        return self._top()
+
+    def due(self, *, now: Optional[float] = None, lead: timedelta = timedelta(0)) -> Iterator[DeadlineEntry]:
+        """
+        Pops, in deadline order, every entry due by now + `lead`. Each (deal, deadline) is
+        yielded once; a deal whose deadline moves is scheduled again.
+        """
+        horizon = (time.time() if now is None else now) + lead.total_seconds()
+        while True:
+            entry = self._top()
+            if entry is None or (entry.deadline_ts or 0.0) > horizon:
+                return
+            heapq.heappop(self._heap)
+            del self._current[entry.deal_id]
+            yield entry
+
+    def stream(
+        self,
+        *,
+        lead: timedelta = timedelta(0),
+        poll_s: float = 30.0,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> Iterator[DeadlineEntry]:
+        """
+        Endless stream of deadlines as they come within `lead`, checking the index every `poll_s`.
+        """
+        while True:
+            self.refresh()
+            yield from self.due(now=clock(), lead=lead)
+            nxt = self.peek()
+            wait = poll_s if nxt is None else min(poll_s, max(0.0, nxt.deadline_ts - lead.total_seconds() - clock()))
+            sleep(wait)
+
+
+def _print_entry(entry: DeadlineEntry, now: Optional[float] = None) -> None:
+    left = entry.hours_left(now)
+    when = f"overdue by {-left:.1f}h" if left < 0 else f"in {left:.1f}h"
+    print(f"{entry.deadline.isoformat() if entry.deadline else '-'}  {when:>18}  {entry.deal_id}  {entry.supplier}  ({entry.intent})")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    from owpa.config import load_config
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    up = sub.add_parser("upcoming", help="Open deadlines in order (overdue first)")
+    up.add_argument("--hours", type=float, default=48.0, help="Horizon in hours (0 = all)")
+    up.add_argument("--no-overdue", action="store_true")
+    watch = sub.add_parser("watch", help="Print each deadline as it comes within --lead-hours")
+    watch.add_argument("--lead-hours", type=float, default=24.0)
+    watch.add_argument("--poll", type=float, default=30.0, help="Seconds between index checks")
+    sub.add_parser("rebuild", help="Recompute the index from the state store")
+    args = parser.parse_args(argv)
+
+    cfg = load_config()
+    index = DeadlineIndex(cfg.deadlines_db_path)
+    if args.cmd == "rebuild":
+        n = index.rebuild(JsonlDealStateStore(cfg.state_store_path))
+        print(f"Indexed {n} open deadlines -> {index.path}")
+        return 0
+    if args.cmd == "upcoming":
+        within = timedelta(hours=args.hours) if args.hours > 0 else None
+        for entry in index.upcoming(within, include_overdue=not args.no_overdue):
+            _print_entry(entry)
+        return 0
+
+    try:
+        for entry in DeadlineScheduler(index).stream(lead=timedelta(hours=args.lead_hours), poll_s=args.poll):
+            _print_entry(entry)
+            sys.stdout.flush()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
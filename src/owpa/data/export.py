@@ -0,0 +1,324 @@
+"""
+Streaming columnar export of the deal state store for analytics.
+
+Snapshots are read in bounded chunks and flattened into three tables of typed columns:
+  rounds       one row per snapshot (supplier_ask / our_position / metadata status flattened)
+  concessions  one row per concession entry of a snapshot
+  open_issues  one row per open issue of a snapshot
+Each chunk becomes one part file per table: Parquet when pyarrow is installed, else NumPy .npz.
+A watermark (byte offset + inode of the store) makes the next run export only appended records.
+
+  PYTHONPATH=src python -m owpa.data.export --out outputs/export
+  PYTHONPATH=src python -m owpa.data.export --out outputs/export --format npz --full
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import warnings
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_CHUNK_ROWS = 50_000
+WATERMARK_FILE = "_watermark.json"
+
+# column -> (numpy dtype, getter on the snapshot/item dict). "M8[us]" columns hold NaT when missing;
+# "U" columns are object arrays of str (a fixed-width U array pads every row to the longest one).
+_Getter = Callable[[Dict[str, Any]], Any]
+
+
+def _ask(s: Dict[str, Any]) -> Dict[str, Any]:
+    return s.get("supplier_ask") or {}
+
+
+def _pos(s: Dict[str, Any]) -> Dict[str, Any]:
+    return s.get("our_position") or {}
+
+
+def _pct(d: Optional[Dict[str, Any]]) -> Optional[float]:
+    return d.get("value") if d else None
+
+
+ROUND_COLUMNS: Dict[str, Tuple[str, _Getter]] = {
+    "deal_id": ("U", lambda s: s.get("deal_id")),
+    "round_number": ("i4", lambda s: s.get("round_number", 0)),
+    "package": ("U", lambda s: s.get("package")),
+    "supplier_name": ("U", lambda s: s.get("supplier_name")),
+    "email_subject": ("U", lambda s: s.get("last_supplier_email_subject")),
+    "email_received_at": ("M8[us]", lambda s: s.get("last_supplier_email_received_at")),
+    "last_updated_at": ("M8[us]", lambda s: s.get("last_updated_at")),
+    "intent": ("U", lambda s: _ask(s).get("intent")),
+    "uplift_pct": ("f8", lambda s: _pct(_ask(s).get("headline_price_change_pct"))),
+    "uplift_amount": ("f8", lambda s: (_ask(s).get("headline_price_change_amount") or {}).get("amount")),
+    "uplift_currency": ("U", lambda s: (_ask(s).get("headline_price_change_amount") or {}).get("currency")),
+    "reason": ("U", lambda s: _ask(s).get("reason")),
+    "deadline": ("M8[us]", lambda s: _ask(s).get("deadline")),
+    "requested_trades": ("U", lambda s: "; ".join(_ask(s).get("requested_trades") or [])),
+    "n_requested_trades": ("i4", lambda s: len(_ask(s).get("requested_trades") or [])),
+    "target_pct": ("f8", lambda s: _pct(_pos(s).get("target_price_change_pct"))),
+    "max_pct": ("f8", lambda s: _pct(_pos(s).get("max_price_change_pct"))),
+    "status": ("U", lambda s: (s.get("metadata") or {}).get("status") or "open"),
+    "settled_pct": ("f8", lambda s: (s.get("metadata") or {}).get("settled_pct")),
+    "n_concessions": ("i4", lambda s: len(s.get("concessions") or [])),
+    "n_open_issues": ("i4", lambda s: len(s.get("open_issues") or [])),
+}
+
+CONCESSION_COLUMNS: Dict[str, Tuple[str, _Getter]] = {
+    "timestamp": ("M8[us]", lambda c: c.get("timestamp")),
+    "we_gave": ("U", lambda c: c.get("we_gave")),
+    "we_got": ("U", lambda c: c.get("we_got")),
+    "value_note": ("U", lambda c: c.get("value_note")),
+    "approval_required": ("?", lambda c: c.get("approval_required", False)),
+}
+
+ISSUE_COLUMNS: Dict[str, Tuple[str, _Getter]] = {
+    "topic": ("U", lambda i: i.get("topic")),
+    "status": ("U", lambda i: i.get("status")),
+    "detail": ("U", lambda i: i.get("detail")),
+}
+
+TABLES = ("rounds", "concessions", "open_issues")
+
+
+def _datetime64(value: Optional[str]) -> np.datetime64:
+    if not value:
+        return np.datetime64("NaT", "us")
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return np.datetime64(dt, "us")
+
+
+def _column(dtype: str, values: List[Any]) -> np.ndarray:
+    if dtype == "U":
+        out = np.empty(len(values), dtype=object)
+        out[:] = ["" if v is None else str(v) for v in values]
+        return out
+    if dtype == "M8[us]":
+        # Bulk parse for naive ISO strings (what model_dump writes); per value for offset-aware ones.
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("error")
+                return np.array([v or "NaT" for v in values], dtype="M8[us]")
+        except (ValueError, Warning):
+            return np.array([_datetime64(v) for v in values], dtype="M8[us]")
+    if dtype == "f8":
+        return np.array([np.nan if v is None else v for v in values], dtype="f8")
+    return np.array(values, dtype=dtype)
+
+
+class _Chunk:
+    """
+    Row buffers for one chunk; the parent snapshot of child rows is its record offset.
+    """
+
+    def __init__(self) -> None:
+        self.rows: Dict[str, List[Any]] = {t: [] for t in TABLES}
+        self.n = 0
+
+    def add(self, offset: int, state: Dict[str, Any]) -> None:
+        self.rows["rounds"].append((offset, state))
+        for c in state.get("concessions") or []:
+            self.rows["concessions"].append((offset, state, c))
+        for i in state.get("open_issues") or []:
+            self.rows["open_issues"].append((offset, state, i))
+        self.n += 1
+
+    def columns(self) -> Dict[str, Dict[str, np.ndarray]]:
+        out: Dict[str, Dict[str, np.ndarray]] = {}
+        rounds = self.rows["rounds"]
+        out["rounds"] = {"record_offset": np.array([o for o, _ in rounds], dtype="i8")}
+        for name, (dtype, get) in ROUND_COLUMNS.items():
+            out["rounds"][name] = _column(dtype, [get(s) for _, s in rounds])
+        for table, spec in (("concessions", CONCESSION_COLUMNS), ("open_issues", ISSUE_COLUMNS)):
+            rows = self.rows[table]
+            cols = {
+                "record_offset": np.array([o for o, _, _ in rows], dtype="i8"),
+                "deal_id": _column("U", [s.get("deal_id") for _, s, _ in rows]),
+                "round_number": np.array([s.get("round_number", 0) for _, s, _ in rows], dtype="i4"),
+            }
+            for name, (dtype, get) in spec.items():
+                cols[name] = _column(dtype, [get(item) for _, _, item in rows])
+            out[table] = cols
+        return out
+
+
+def iter_chunks(store_path: Path, start: int, chunk_rows: int) -> Iterator[Tuple[_Chunk, int]]:
+    """
+    Yields (chunk, byte offset after its last complete line) reading from `start`.
+    A trailing line without a newline (in-flight append) is left for the next export.
+    """
+    with store_path.open("rb") as f:
+        f.seek(start)
+        offset = start
+        chunk = _Chunk()
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            if line.strip():
+                chunk.add(offset, json.loads(line)["state"])
+            offset += len(line)
+            if chunk.n >= chunk_rows:
+                yield chunk, offset
+                chunk = _Chunk()
+        if chunk.n:
+            yield chunk, offset
+
+
+def resolve_format(fmt: str) -> str:
+    if fmt != "auto":
+        return fmt
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return "npz"
+    return "parquet"
+
+
+# .npz keys of a string column: UTF-8 bytes of all rows, and row boundaries into them (n + 1).
+_UTF8, _OFFSETS = ".utf8", ".offsets"
+
+
+def _pack_strings(name: str, values: np.ndarray) -> Dict[str, np.ndarray]:
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype="i8")
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return {name + _UTF8: np.frombuffer(b"".join(encoded), dtype="u1"), name + _OFFSETS: offsets}
+
+
+def _unpack_strings(data: bytes, offsets: np.ndarray) -> np.ndarray:
+    out = np.empty(len(offsets) - 1, dtype=object)
+    out[:] = [data[a:b].decode("utf-8") for a, b in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+    return out
+
+
+def _write_part(path: Path, columns: Dict[str, np.ndarray], fmt: str) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    if fmt == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        pq.write_table(pa.table({k: pa.array(v, type=pa.string()) if v.dtype == object else v for k, v in columns.items()}), tmp)
+    else:
+        arrays: Dict[str, np.ndarray] = {}
+        for k, v in columns.items():
+            arrays.update(_pack_strings(k, v) if v.dtype == object else {k: v})
+        with tmp.open("wb") as f:
+            np.savez(f, **arrays)
+    os.replace(tmp, path)
+
+
+def _read_watermark(out_dir: Path) -> Optional[Dict[str, Any]]:
+    path = out_dir / WATERMARK_FILE
+    return json.loads(path.read_text(encoding="utf-8")) if path.exists() else None
+
+
+def _write_watermark(out_dir: Path, watermark: Dict[str, Any]) -> None:
+    path = out_dir / WATERMARK_FILE
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(watermark, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def export_store(
+    store_path: str | Path,
+    out_dir: str | Path,
+    *,
+    fmt: str = "auto",
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    full: bool = False,
+) -> Dict[str, Any]:
+    """
+    Exports records appended since the last run (everything on the first run, after `full=True`,
+    or when the store was replaced/truncated). Returns the updated watermark plus "exported" rows.
+    """
+    store_path = Path(store_path).expanduser().resolve()
+    out_dir = Path(out_dir)
+    fmt = resolve_format(fmt)
+
+    st = store_path.stat() if store_path.exists() else None
+    watermark = None if full else _read_watermark(out_dir)
+    if watermark is not None and (
+        st is None
+        or watermark.get("inode") != st.st_ino
+        or watermark.get("offset", 0) > st.st_size
+        or watermark.get("format") != fmt
+    ):
+        watermark = None  # store replaced/truncated or format changed: start over
+    if watermark is None:
+        for table in TABLES:
+            shutil.rmtree(out_dir / table, ignore_errors=True)
+        watermark = {"store": str(store_path), "inode": st.st_ino if st else None, "offset": 0, "records": 0, "parts": 0, "format": fmt}
+
+    for table in TABLES:
+        (out_dir / table).mkdir(parents=True, exist_ok=True)
+    exported = 0
+    if st is not None:
+        ext = "parquet" if fmt == "parquet" else "npz"
+        for chunk, end in iter_chunks(store_path, watermark["offset"], chunk_rows):
+            part = watermark["parts"]
+            for table, columns in chunk.columns().items():
+                _write_part(out_dir / table / f"part-{part:06d}.{ext}", columns, fmt)
+            # Parts first, watermark last: a crash in between only re-writes the same part number.
+            watermark.update(offset=end, records=watermark["records"] + chunk.n, parts=part + 1)
+            _write_watermark(out_dir, watermark)
+            exported += chunk.n
+    _write_watermark(out_dir, watermark)
+    return {**watermark, "exported": exported}
+
+
+def load_table(out_dir: str | Path, table: str = "rounds") -> Dict[str, np.ndarray]:
+    """
+    Concatenated columns of one exported table (either format), for notebooks without pandas.
+    """
+    parts = sorted((Path(out_dir) / table).glob("part-*"))
+    if not parts:
+        return {}
+    chunks: List[Dict[str, np.ndarray]] = []
+    for part in parts:
+        if part.suffix == ".parquet":
+            import pyarrow.parquet as pq
+
+            data = pq.read_table(part)
+            chunks.append({k: data.column(k).to_numpy() for k in data.column_names})
+        else:
+            with np.load(part) as data:
+                columns = {}
+                for k in data.files:
+                    if k.endswith(_UTF8):
+                        name = k[: -len(_UTF8)]
+                        columns[name] = _unpack_strings(data[k].tobytes(), data[name + _OFFSETS])
+                    elif not k.endswith(_OFFSETS):
+                        columns[k] = data[k]
+                chunks.append(columns)
+    return {k: np.concatenate([c[k] for c in chunks]) for k in chunks[0]}
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    from owpa.config import load_config
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default="outputs/export", help="Export directory (one sub-directory per table)")
+    parser.add_argument("--store", default=None, help="State store JSONL (default: STATE_STORE_PATH)")
+    parser.add_argument("--format", choices=("auto", "parquet", "npz"), default="auto")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--full", action="store_true", help="Ignore the watermark and re-export everything")
+    args = parser.parse_args(argv)
+
+    store = args.store or load_config().state_store_path
+    result = export_store(store, args.out, fmt=args.format, chunk_rows=args.chunk_rows, full=args.full)
+    print(
+        f"Exported {result['exported']} snapshots ({result['records']} total, {result['parts']} parts, "
+        f"{result['format']}) -> {args.out}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,452 @@
+"""
+Incremental mailbox ingestion: mbox files, Maildir folders and directories of .eml files.
+
+Messages are parsed lazily (one at a time), mapped to deals by Message-ID / In-Reply-To /
+References, then by normalized subject from the same sender domain, and written as a batch manifest for owpa.agent.batch.
+A per-mailbox watermark (byte offset for mbox) or the set of files already processed (Maildir/.eml)
+means each run only reads messages that arrived since the previous one, however late they were delivered.
+
+  PYTHONPATH=src python -m owpa.data.mailbox ~/Mail/suppliers.mbox --run
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from email.errors import HeaderParseError
+from email.header import decode_header, make_header
+from email.parser import BytesParser
+from email.utils import parseaddr, parsedate_to_datetime
+from pathlib import Path
+from typing import AbstractSet, Iterator, List, Optional, Sequence, Set, Tuple
+
+from owpa.config import load_config
+from owpa.data.storage import ensure_parent_dir
+
+
+@dataclass
+class MailMessage:
+    position: str  # mbox watermark once this message is processed; file key for Maildir/.eml
+    message_id: str
+    subject: str
+    sender: str
+    body: str
+    date: Optional[datetime] = None
+    in_reply_to: Optional[str] = None
+    references: List[str] = field(default_factory=list)
+
+
+_PARSER = BytesParser()
+_MSGID_RE = re.compile(r"<[^<>\s]+>")
+_SUBJECT_PREFIX_RE = re.compile(r"^\s*((re|fwd?|aw|wg|sv|tr)\s*(\[\d+\])?\s*:|\[[^\]]*\])\s*", re.IGNORECASE)
+_DEAL_TAG_RE = re.compile(r"\b(DEAL-[A-Z0-9][A-Z0-9-]*)\b")
+_QUOTE_HEADER_RE = re.compile(r"^(On .+wrote:|-+\s*Original Message\s*-+|From: .+)$", re.IGNORECASE)
+_TAG_RE = re.compile(r"<[^>]+>")
+
+
+def sender_key(sender: str) -> str:
+    """
+    "Anna Berg <Anna@Battila-Turbines.com>" -> "battila-turbines.com"
+    """
+    addr = parseaddr(sender or "")[1].strip().lower()
+    return addr.rpartition("@")[2] or addr
+
+
+def normalize_subject(subject: str) -> str:
+    """
+    "RE: Fwd: [EXT] Price  update" -> "price update"
+    """
+    s = subject or ""
+    while True:
+        stripped = _SUBJECT_PREFIX_RE.sub("", s, count=1)
+        if stripped == s:
+            break
+        s = stripped
+    return " ".join(s.split()).lower()
+
+
+def _strip_quoted(text: str) -> str:
+    # Keep only the new part of a reply: drop ">" lines and everything after a quote header.
+    out = []
+    for line in text.splitlines():
+        if _QUOTE_HEADER_RE.match(line.strip()):
+            break
+        if not line.lstrip().startswith(">"):
+            out.append(line)
+    return "\n".join(out).strip()
+
+
+def _header(msg, name: str) -> str:
+    value = msg.get(name)
+    if value is None:
+        return ""
+    try:
+        return str(make_header(decode_header(str(value))))
+    except (HeaderParseError, LookupError, UnicodeDecodeError):
+        return str(value)
+
+
+def _body(msg) -> str:
+    # First text/plain part, else the first text/html part with tags stripped.
+    html = None
+    for part in msg.walk():
+        ctype = part.get_content_type()
+        if ctype not in ("text/plain", "text/html") or part.get_filename():
+            continue
+        payload = part.get_payload(decode=True) or b""
+        try:
+            text = payload.decode(part.get_content_charset() or "utf-8", errors="replace")
+        except LookupError:
+            text = payload.decode("utf-8", errors="replace")
+        if ctype == "text/plain":
+            return text
+        html = html if html is not None else _TAG_RE.sub(" ", text)
+    return html or ""
+
+
+def parse_message(raw: bytes, position: str) -> MailMessage:
+    # compat32 parsing is several times faster than policy.default; headers are decoded on demand.
+    msg = _PARSER.parsebytes(raw)
+
+    message_id = (msg.get("Message-ID") or "").strip()
+    if not message_id:
+        # No Message-ID: a content digest keeps re-scans idempotent.
+        message_id = f"<{hashlib.sha1(raw).hexdigest()}@owpa.local>"
+
+    date = None
+    if msg.get("Date"):
+        try:
+            date = parsedate_to_datetime(str(msg["Date"]))
+        except (TypeError, ValueError):
+            pass
+
+    in_reply_to = _MSGID_RE.findall(str(msg.get("In-Reply-To") or ""))
+    return MailMessage(
+        position=position,
+        message_id=message_id,
+        subject=_header(msg, "Subject"),
+        sender=_header(msg, "From"),
+        body=_strip_quoted(_body(msg)),
+        date=date,
+        in_reply_to=in_reply_to[0] if in_reply_to else None,
+        references=_MSGID_RE.findall(str(msg.get("References") or "")),
+    )
+
+
+# --- sources -----------------------------------------------------------------------------------
+
+
+def iter_mbox(path: str | Path, start: int = 0) -> Iterator[MailMessage]:
+    """
+    Streams an mbox file from byte offset `start`. Each message's position is the offset of the
+    next "From " envelope line, so resuming from it never re-reads earlier messages.
+    """
+    with Path(path).open("rb") as f:
+        f.seek(start)
+        offset = start
+        buf: Optional[List[bytes]] = None
+        prev_blank = True
+        for line in f:
+            if line.startswith(b"From ") and prev_blank:
+                if buf:
+                    yield parse_message(_unescape_mbox(buf), str(offset))
+                buf = []
+            elif buf is not None:
+                buf.append(line)
+            prev_blank = not line.strip()
+            offset += len(line)
+        if buf:
+            yield parse_message(_unescape_mbox(buf), str(offset))
+
+
+def _unescape_mbox(lines: List[bytes]) -> bytes:
+    return b"".join(line[1:] if line.startswith(b">From ") else line for line in lines)
+
+
+def _iter_files(entries: Iterator[Tuple[str, os.DirEntry]], done: AbstractSet[str]) -> Iterator[MailMessage]:
+    # (key, entry) pairs; files whose key is in `done` are never opened. Oldest first.
+    todo = []
+    for key, entry in entries:
+        if key not in done:
+            todo.append((entry.stat().st_mtime_ns, key, entry.path))
+    for _, key, file_path in sorted(todo):
+        yield parse_message(Path(file_path).read_bytes(), key)
+
+
+def iter_maildir(path: str | Path, done: AbstractSet[str] = frozenset()) -> Iterator[MailMessage]:
+    """
+    Messages in <maildir>/new and <maildir>/cur whose unique name is not in `done`. The key drops
+    the ":2,<flags>" suffix, so a message moved from new/ to cur/ or flagged is not read again.
+    """
+    def entries():
+        for sub in ("new", "cur"):
+            d = Path(path) / sub
+            if d.is_dir():
+                yield from ((e.name.split(":", 1)[0], e) for e in os.scandir(d) if e.is_file() and not e.name.startswith("."))
+
+    yield from _iter_files(entries(), done)
+
+
+def iter_eml_dir(path: str | Path, done: AbstractSet[str] = frozenset()) -> Iterator[MailMessage]:
+    """
+    *.eml files anywhere under `path` whose path relative to it is not in `done`.
+    """
+    def entries(d):
+        for e in os.scandir(d):
+            if e.is_dir():
+                yield from entries(e.path)
+            elif e.name.lower().endswith(".eml"):
+                yield Path(os.path.relpath(e.path, path)).as_posix(), e
+
+    yield from _iter_files(entries(path), done)
+
+
+def detect_kind(path: str | Path) -> str:
+    p = Path(path)
+    if p.is_file():
+        return "mbox"
+    if (p / "cur").is_dir() or (p / "new").is_dir():
+        return "maildir"
+    return "eml"
+
+
+def iter_new_messages(
+    path: str | Path, kind: str, watermark: Optional[str], done: AbstractSet[str] = frozenset()
+) -> Iterator[MailMessage]:
+    """
+    mbox: messages after byte offset `watermark`; Maildir/.eml: files whose key is not in `done`.
+    """
+    if kind == "mbox":
+        start = int(watermark or 0)
+        if start > Path(path).stat().st_size:
+            start = 0  # mbox was rewritten (e.g. compacted)
+        return iter_mbox(path, start)
+    return iter_maildir(path, done) if kind == "maildir" else iter_eml_dir(path, done)
+
+
+# --- thread -> deal mapping ----------------------------------------------------------------------
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    message_id  TEXT PRIMARY KEY,
+    deal_id     TEXT NOT NULL,
+    mailbox     TEXT NOT NULL,
+    subject_key TEXT NOT NULL,
+    received_at TEXT
+);
+CREATE TABLE IF NOT EXISTS thread_subjects (
+    sender      TEXT NOT NULL,      -- sender domain (address when it has none)
+    subject_key TEXT NOT NULL,
+    deal_id     TEXT NOT NULL,
+    PRIMARY KEY (sender, subject_key)
+);
+CREATE TABLE IF NOT EXISTS watermarks (
+    mailbox     TEXT PRIMARY KEY,
+    kind        TEXT NOT NULL,
+    position    TEXT NOT NULL,
+    updated_at  REAL NOT NULL
+);
+-- Maildir / .eml files already processed; file mtimes say nothing about delivery order.
+CREATE TABLE IF NOT EXISTS mailbox_files (
+    mailbox     TEXT NOT NULL,
+    file_key    TEXT NOT NULL,
+    PRIMARY KEY (mailbox, file_key)
+);
+"""
+
+
+class ThreadIndex:
+    """
+    SQLite map of Message-ID -> deal_id and (sender domain, normalized subject) -> deal_id, plus
+    mbox watermarks and the files processed per Maildir/.eml folder.
+    One instance holds one connection; call commit() to persist a run atomically.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path).expanduser().resolve()
+        ensure_parent_dir(self.path)
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def commit(self) -> None:
+        self.conn.commit()
+
+    def seen(self, message_id: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM messages WHERE message_id = ?", (message_id,)).fetchone() is not None
+
+    def resolve(self, msg: MailMessage) -> str:
+        """
+        deal_id for a message: explicit DEAL-... tag in the subject, then the deal of any message it
+        replies to or references, then the deal of the same normalized subject from the same sender
+        domain, else a new deal. Generic subjects ("Price adjustment 2025") are common to many
+        suppliers' form letters, so subjects never match across senders.
+        """
+        tag = _DEAL_TAG_RE.search(msg.subject or "")
+        if tag:
+            return tag.group(1)
+
+        parents = ([msg.in_reply_to] if msg.in_reply_to else []) + list(reversed(msg.references))
+        for parent in parents:
+            row = self.conn.execute("SELECT deal_id FROM messages WHERE message_id = ?", (parent,)).fetchone()
+            if row:
+                return row[0]
+
+        key = normalize_subject(msg.subject)
+        sender = sender_key(msg.sender)
+        if key:
+            row = self.conn.execute(
+                "SELECT deal_id FROM thread_subjects WHERE sender = ? AND subject_key = ?", (sender, key)
+            ).fetchone()
+            if row:
+                return row[0]
+        seed = f"{sender}\x00{key}" if key else msg.message_id
+        digest = hashlib.sha1(seed.encode("utf-8")).hexdigest()[:10].upper()
+        return f"DEAL-MAIL-{digest}"
+
+    def record(self, msg: MailMessage, deal_id: str, mailbox: str) -> None:
+        key = normalize_subject(msg.subject)
+        self.conn.execute(
+            "INSERT OR IGNORE INTO messages (message_id, deal_id, mailbox, subject_key, received_at) VALUES (?, ?, ?, ?, ?)",
+            (msg.message_id, deal_id, mailbox, key, msg.date.isoformat() if msg.date else None),
+        )
+        if key:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO thread_subjects (sender, subject_key, deal_id) VALUES (?, ?, ?)",
+                (sender_key(msg.sender), key, deal_id),
+            )
+
+    def watermark(self, mailbox: str) -> Optional[str]:
+        row = self.conn.execute("SELECT position FROM watermarks WHERE mailbox = ?", (mailbox,)).fetchone()
+        return row[0] if row else None
+
+    def set_watermark(self, mailbox: str, kind: str, position: str) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO watermarks (mailbox, kind, position, updated_at) VALUES (?, ?, ?, ?)",
+            (mailbox, kind, position, time.time()),
+        )
+
+    def files(self, mailbox: str) -> Set[str]:
+        return {row[0] for row in self.conn.execute("SELECT file_key FROM mailbox_files WHERE mailbox = ?", (mailbox,))}
+
+    def add_file(self, mailbox: str, file_key: str) -> None:
+        self.conn.execute("INSERT OR IGNORE INTO mailbox_files (mailbox, file_key) VALUES (?, ?)", (mailbox, file_key))
+
+
+def guess_supplier(sender: str, supplier_names: Sequence[str]) -> Optional[str]:
+    """
+    Supplier whose name shares a word (>= 4 letters) with the sender's display name or domain.
+    """
+    display, addr = parseaddr(sender)
+    hay = f"{display} {addr.rpartition('@')[2]}".lower()
+    for name in supplier_names:
+        if any(len(w) >= 4 and w in hay for w in re.findall(r"[a-z0-9]+", name.lower())):
+            return name
+    return None
+
+
+def ingest(
+    path: str | Path,
+    manifest_path: str | Path,
+    *,
+    index: ThreadIndex,
+    supplier_names: Sequence[str] = (),
+    default_supplier: Optional[str] = None,
+    kind: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> int:
+    """
+    Appends one manifest line per new message (oldest first) and advances the mailbox watermark
+    (mbox) or records the files read (Maildir/.eml).
+    Manifest lines are flushed before the watermark and thread map are committed, so a crash
+    can at worst re-emit messages, which the Message-ID check then skips. Returns lines written.
+    """
+    mailbox = str(Path(path).expanduser().resolve())
+    kind = kind or detect_kind(mailbox)
+    position = index.watermark(mailbox) if kind == "mbox" else None
+    done = index.files(mailbox) if kind != "mbox" else frozenset()
+
+    written = 0
+    ensure_parent_dir(manifest_path)
+    with Path(manifest_path).open("a", encoding="utf-8") as out:
+        for msg in iter_new_messages(mailbox, kind, position, done):
+            if kind == "mbox":
+                position = msg.position
+            else:
+                index.add_file(mailbox, msg.position)
+            if index.seen(msg.message_id) or not msg.body:
+                continue
+            deal_id = index.resolve(msg)
+            index.record(msg, deal_id, mailbox)
+            line = {"deal_id": deal_id, "email_text": msg.body, "subject": msg.subject, "message_id": msg.message_id}
+            supplier = guess_supplier(msg.sender, supplier_names) or default_supplier
+            if supplier:
+                line["supplier_name"] = supplier
+            out.write(json.dumps(line, ensure_ascii=False) + "\n")
+            written += 1
+            if limit is not None and written >= limit:
+                break
+        out.flush()
+        os.fsync(out.fileno())
+
+    if position is not None:
+        index.set_watermark(mailbox, kind, position)
+    index.commit()
+    return written
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mailbox", help="mbox file, Maildir folder or directory of .eml files")
+    parser.add_argument("--kind", choices=["mbox", "maildir", "eml"], default=None, help="Default: detected")
+    parser.add_argument("--manifest", default=None, help="Default: outputs/mailbox/<timestamp>.jsonl")
+    parser.add_argument("--default-supplier", default=None, help="For senders that match no known supplier")
+    parser.add_argument("--limit", type=int, default=None, help="Max new messages this run")
+    parser.add_argument("--run", action="store_true", help="Run the batch for the new messages")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    from owpa.data.loader import load_suppliers_fixture
+
+    cfg = load_config()
+    manifest = Path(args.manifest or f"outputs/mailbox/{datetime.now():%Y%m%d-%H%M%S}.jsonl")
+    suppliers = [s.name for s in load_suppliers_fixture(cfg.suppliers_fixture_path)]
+
+    index = ThreadIndex(cfg.mailbox_db_path)
+    started = time.perf_counter()
+    try:
+        n = ingest(
+            args.mailbox,
+            manifest,
+            index=index,
+            supplier_names=suppliers,
+            default_supplier=args.default_supplier,
+            kind=args.kind,
+            limit=args.limit,
+        )
+    finally:
+        index.close()
+    print(f"{n} new messages -> {manifest} ({time.perf_counter() - started:.2f}s)")
+    if not n:
+        manifest.unlink(missing_ok=True)
+
+    if args.run and n:
+        from owpa.agent.batch import load_manifest, main as batch_main
+
+        load_manifest(manifest)  # fail fast on a bad manifest before any round runs
+        return batch_main([str(manifest), "--workers", str(args.workers)])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
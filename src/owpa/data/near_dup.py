@@ -0,0 +1,280 @@
+"""
+Near-duplicate index over analyzed email bodies (64-bit SimHash, banded LSH in SQLite).
+
+Suppliers send the same form letter to many deals with only the name, a percentage or a date
+changed. Bodies are normalized (greeting and sign-off dropped, lower case, percentages and other
+numbers masked) and shingled into word 3-grams; the SimHash of the shingles is split into BANDS
+bands of 8 bits. Any two fingerprints within MAX_HAMMING bits share at least one band, so a lookup
+only compares against rows that share a band, then confirms with the Jaccard similarity of the
+shingle sets.
+
+Each row stores one node's analysis (classify / extract) of one email, keyed by a variant (hash
+of the node's prompt), so changing a prompt never reuses stale analyses.
+
+  PYTHONPATH=src python -m owpa.data.near_dup stats
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import re
+import sqlite3
+import sys
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, ContextManager, Dict, FrozenSet, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from owpa.data.storage import ensure_parent_dir, sqlite_connect
+
+BANDS = 8
+BAND_BITS = 64 // BANDS
+MAX_HAMMING = BANDS - 1    # pigeonhole: at most this many differing bits always share a band
+MIN_JACCARD = 0.8
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    node        TEXT NOT NULL,
+    variant     TEXT NOT NULL,
+    fingerprint INTEGER NOT NULL,
+    text_hash   TEXT NOT NULL,
+    text        TEXT NOT NULL,
+    data        TEXT NOT NULL,
+    created_at  REAL NOT NULL,
+    hits        INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (node, variant, text_hash)
+);
+CREATE TABLE IF NOT EXISTS lsh_bands (
+    band        INTEGER NOT NULL,
+    key         INTEGER NOT NULL,
+    analysis_id INTEGER NOT NULL,
+    PRIMARY KEY (band, key, analysis_id)
+) WITHOUT ROWID;
+"""
+
+_PCT = re.compile(r"[+-]?\s*\d+(?:[.,]\d+)?\s*%")
+_NUM = re.compile(r"\d+(?:[.,:/-]\d+)*")
+_WORD = re.compile(r"[a-z<>]+")
+
+
+_GREETING = re.compile(r"^\s*(dear|hi|hello)\b", re.IGNORECASE)
+_SIGN_OFF = re.compile(r"^\s*(best|kind regards|regards|sincerely|thank you|thanks)\b", re.IGNORECASE)
+
+
+def body_lines(text: str) -> List[str]:
+    """
+    Lines between the greeting and the sign-off, where form letters carry no names.
+    """
+    out = []
+    for line in text.splitlines():
+        if _SIGN_OFF.match(line):
+            break
+        if not _GREETING.match(line):
+            out.append(line)
+    return out
+
+
+def normalize(text: str) -> List[str]:
+    """
+    Body word tokens with percentages -> <pct> and other numbers -> <num>.
+    """
+    t = "\n".join(body_lines(text)).lower()
+    return _WORD.findall(_NUM.sub(" <num> ", _PCT.sub(" <pct> ", t)))
+
+
+def shingles(text: str, n: int = 3) -> FrozenSet[str]:
+    words = normalize(text)
+    if len(words) < n:
+        return frozenset([" ".join(words)]) if words else frozenset()
+    return frozenset(" ".join(words[i:i + n]) for i in range(len(words) - n + 1))
+
+
+def _hash64(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+@lru_cache(maxsize=256)
+def simhash(text: str) -> int:
+    """
+    64-bit SimHash of the shingle set (each shingle votes on every bit).
+    """
+    grams = shingles(text)
+    if not grams:
+        return 0
+    hashes = np.array([_hash64(g) for g in grams], dtype="<u8")
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    fingerprint = (bits.sum(axis=0) * 2 > len(hashes)).astype(np.uint8)
+    return int.from_bytes(np.packbits(fingerprint, bitorder="little").tobytes(), "little")
+
+
+def bands(fingerprint: int) -> List[Tuple[int, int]]:
+    mask = (1 << BAND_BITS) - 1
+    return [(b, (fingerprint >> (b * BAND_BITS)) & mask) for b in range(BANDS)]
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _signed(u: int) -> int:
+    # SQLite INTEGER is signed 64-bit
+    return u - (1 << 64) if u >= 1 << 63 else u
+
+
+def _unsigned(s: int) -> int:
+    return s + (1 << 64) if s < 0 else s
+
+
+def variant_key(*parts: str) -> str:
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass
+class NearDuplicate:
+    analysis_id: int
+    text: str             # the email the stored analysis was made for
+    data: Dict[str, Any]
+    distance: int         # SimHash Hamming distance
+    similarity: float     # shingle Jaccard
+    exact: bool
+
+
+_READY: Set[Path] = set()
+
+
+class NearDuplicateIndex:
+    def __init__(self, path: str | Path):
+        self.path = Path(path).expanduser().resolve()
+        if self.path in _READY and self.path.exists():
+            return
+        ensure_parent_dir(self.path)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+        _READY.add(self.path)
+
+    def _connect(self) -> ContextManager[sqlite3.Connection]:
+        return sqlite_connect(self.path, autocommit=True)
+
+    def add(self, node: str, variant: str, text: str, data: Dict[str, Any]) -> None:
+        fp = simhash(text)
+        text_hash = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO analyses (node, variant, fingerprint, text_hash, text, data, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (node, variant, _signed(fp), text_hash, text, json.dumps(data, ensure_ascii=False), time.time()),
+                )
+                if cur.rowcount:
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO lsh_bands (band, key, analysis_id) VALUES (?, ?, ?)",
+                        [(b, k, cur.lastrowid) for b, k in bands(fp)],
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def lookup(self, node: str, variant: str, text: str) -> Optional[NearDuplicate]:
+        """
+        Closest stored analysis within MAX_HAMMING bits and MIN_JACCARD, or None.
+        """
+        fp = simhash(text)
+        grams = shingles(text)
+        where = " OR ".join("(b.band = ? AND b.key = ?)" for _ in range(BANDS))
+        params: List[Any] = [node, variant]
+        for b, k in bands(fp):
+            params.extend((b, k))
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT DISTINCT a.id, a.fingerprint, a.text, a.data FROM lsh_bands b "
+                "JOIN analyses a ON a.id = b.analysis_id "
+                f"WHERE a.node = ? AND a.variant = ? AND ({where})",
+                params,
+            ).fetchall()
+            best: Optional[NearDuplicate] = None
+            for analysis_id, stored_fp, stored_text, data in rows:
+                distance = hamming(fp, _unsigned(stored_fp))
+                if distance > MAX_HAMMING:
+                    continue
+                similarity = jaccard(grams, shingles(stored_text))
+                if similarity < MIN_JACCARD:
+                    continue
+                if best is None or (similarity, -distance) > (best.similarity, -best.distance):
+                    best = NearDuplicate(
+                        analysis_id=analysis_id,
+                        text=stored_text,
+                        data=json.loads(data),
+                        distance=distance,
+                        similarity=round(similarity, 4),
+                        exact=stored_text == text,
+                    )
+            if best is not None:
+                conn.execute("UPDATE analyses SET hits = hits + 1 WHERE id = ?", (best.analysis_id,))
+            return best
+
+    def stats(self) -> Dict[str, Any]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT node, COUNT(*), SUM(hits) FROM analyses GROUP BY node ORDER BY node").fetchall()
+        return {node: {"analyses": n, "reused": int(hits or 0)} for node, n, hits in rows}
+
+
+def get_index() -> Optional[NearDuplicateIndex]:
+    """
+    The index at NEAR_DUP_DB_PATH, or None when analysis reuse is off.
+    """
+    from owpa.config import load_config
+
+    path = load_config().near_dup_db_path
+    return NearDuplicateIndex(path) if path is not None else None
+
+
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+
+
+def _sentences(text: str) -> List[str]:
+    # Sentences may wrap across lines; blank lines end one.
+    paragraphs = re.split(r"\n\s*\n", "\n".join(body_lines(text)))
+    return [" ".join(s.split()) for p in paragraphs for s in _SENTENCE.split(p) if s.strip()]
+
+
+def changed_sentences(old: str, new: str) -> List[str]:
+    """
+    Body sentences of `new` not in `old`, comparing with percentages masked (those are
+    re-verified separately).
+    """
+    def key(sentence: str) -> str:
+        return _PCT.sub("<pct>", sentence).lower()
+
+    seen = {key(s) for s in _sentences(old)}
+    return [s for s in _sentences(new) if key(s) not in seen]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("stats",))
+    parser.parse_args(argv)
+
+    index = get_index()
+    if index is None:
+        print("Near-duplicate reuse is off (set NEAR_DUP_DB_PATH)", file=sys.stderr)
+        return 1
+    print(json.dumps(index.stats(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,31 +1,162 @@
 from __future__ import annotations
 
 import json
+import sqlite3
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Iterable, Optional
+from typing import Dict, Iterable, Iterator, Optional, Tuple
 
 from owpa.schemas.deal_state import DealState
 
+try:
+    import fcntl
+except ImportError:  # Windows: in-process locking only
+    fcntl = None  # type: ignore[assignment]
+
 
 def ensure_parent_dir(file_path: str | Path) -> None:
     Path(file_path).expanduser().resolve().parent.mkdir(parents=True, exist_ok=True)
 
 
+@contextmanager
+def sqlite_connect(path: str | Path, *, autocommit: bool = False) -> Iterator[sqlite3.Connection]:
+    """
+    A connection to one of the local SQLite stores, always closed on exit: a connection still
+    open when a worker process forks is shared with the child, and both then fail with disk I/O
+    errors. By default the block is one transaction (committed on success, rolled back on error,
+    like `with conn:`); with autocommit=True the caller issues BEGIN IMMEDIATE / COMMIT itself.
+    """
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None) if autocommit else sqlite3.connect(path, timeout=30)
+    try:
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if autocommit:
+            yield conn
+        else:
+            with conn:
+                yield conn
+    finally:
+        conn.close()
+
+
+class VersionConflict(Exception):
+    """
+    Raised by append_if_version when another writer stored a newer round for the deal.
+    """
+
+    def __init__(self, deal_id: str, expected: int, actual: Optional[int]):
+        super().__init__(f"Deal {deal_id}: expected stored round {expected}, found {actual}")
+        self.deal_id = deal_id
+        self.expected = expected
+        self.actual = actual
+
+
+class _LatestIndex:
+    """
+    deal_id -> (round_number, byte offset) of the latest snapshot, built by tail-scanning only
+    the bytes appended since the previous scan. Shared by every store instance on the same file.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.latest: Dict[str, Tuple[int, int]] = {}
+        self.scanned = 0
+        self.inode: Optional[int] = None
+
+    def refresh(self, path: Path) -> None:
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            self.latest, self.scanned, self.inode = {}, 0, None
+            return
+        if st.st_ino != self.inode or st.st_size < self.scanned:
+            # File replaced or truncated: start over.
+            self.latest, self.scanned, self.inode = {}, 0, st.st_ino
+        if st.st_size == self.scanned:
+            return
+        with path.open("rb") as f:
+            f.seek(self.scanned)
+            offset = self.scanned
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # partial line from an in-flight append; picked up next time
+                if line.strip():
+                    rec = json.loads(line)
+                    self.latest[rec["deal_id"]] = (int(rec["state"].get("round_number", 0)), offset)
+                offset += len(line)
+            self.scanned = offset
+
+
+_INDEXES: Dict[Path, _LatestIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def _index_for(path: Path) -> _LatestIndex:
+    with _INDEXES_LOCK:
+        return _INDEXES.setdefault(path, _LatestIndex())
+
+
 class JsonlDealStateStore:
     """
     Append-only JSONL store for DealState snapshots.
     Each line: {"deal_id": "...", "state": {...}}.
+    Writers serialize on an flock'd "<store>.lock" file, so appends from several processes
+    never interleave; a deal's version is the round_number of its latest snapshot.
     """
 
     def __init__(self, path: str | Path):
         self.path = Path(path).expanduser().resolve()
         ensure_parent_dir(self.path)
+        self._index = _index_for(self.path)
 
-    def append(self, state: DealState) -> None:
+    @contextmanager
+    def _write_lock(self) -> Iterator[None]:
+        with self._index.lock:
+            if fcntl is None:
+                yield
+                return
+            with open(f"{self.path}.lock", "a") as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _write(self, state: DealState) -> None:
         record = {"deal_id": state.deal_id, "state": state.model_dump(mode="json")}
         with self.path.open("a", encoding="utf-8") as f:
             f.write(json.dumps(record, ensure_ascii=False) + "\n")
 
+    def append(self, state: DealState) -> None:
+        with self._write_lock():
+            self._write(state)
+
+    def append_if_version(self, state: DealState, expected_version: int) -> None:
+        """
+        Appends `state` only if the deal's latest stored round is still `expected_version`
+        (the round the caller started from). A deal with no snapshot accepts any version.
+        Raises VersionConflict otherwise; nothing is written in that case.
+        """
+        with self._write_lock():
+            self._index.refresh(self.path)
+            current = self._index.latest.get(state.deal_id)
+            if current is not None and current[0] != expected_version:
+                raise VersionConflict(state.deal_id, expected_version, current[0])
+            self._write(state)
+
+    def append_many(self, states: Iterable[DealState]) -> int:
+        """
+        Appends snapshots in one file open (bulk loads / synthetic data).
+        Each state is serialized as soon as it is yielded, so a generator keeps memory flat.
+        """
+        n = 0
+        with self._write_lock(), self.path.open("a", encoding="utf-8") as f:
+            for state in states:
+                record = {"deal_id": state.deal_id, "state": state.model_dump(mode="json")}
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                n += 1
+        return n
+
     def iter_records(self) -> Iterable[dict]:
         if not self.path.exists():
             return []
@@ -36,14 +167,39 @@ class JsonlDealStateStore:
                     continue
                 yield json.loads(line)
 
+    def current_version(self, deal_id: str) -> Optional[int]:
+        """
+        round_number of the latest stored snapshot for deal_id, or None if the deal is unknown.
+        """
+        with self._index.lock:
+            self._index.refresh(self.path)
+            current = self._index.latest.get(deal_id)
+        return current[0] if current is not None else None
+
     def load_latest(self, deal_id: str) -> Optional[DealState]:
         """
         Returns the most recent snapshot for deal_id, or None if not found.
         """
-        latest = None
-        for rec in self.iter_records():
-            if rec.get("deal_id") == deal_id:
-                latest = rec.get("state")
-        if latest is None:
-            return None
-        return DealState.model_validate(latest)
+        with self._index.lock:
+            self._index.refresh(self.path)
+            current = self._index.latest.get(deal_id)
+            if current is None:
+                return None
+            with self.path.open("rb") as f:
+                f.seek(current[1])
+                line = f.readline()
+        return DealState.model_validate(json.loads(line)["state"])
+
+    def iter_latest(self) -> Iterator[DealState]:
+        """
+        Latest snapshot of every deal, read by seeking the index offsets in file order.
+        """
+        with self._index.lock:
+            self._index.refresh(self.path)
+            offsets = sorted(offset for _, offset in self._index.latest.values())
+        if not offsets:
+            return
+        with self.path.open("rb") as f:
+            for offset in offsets:
+                f.seek(offset)
+                yield DealState.model_validate(json.loads(f.readline())["state"])
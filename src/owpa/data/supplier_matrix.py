@@ -0,0 +1,228 @@
+"""
+Memory-mapped supplier feature matrices shared by every process on the machine.
+
+The suppliers fixture is parsed and validated once into a directory of .npy arrays:
+  preferences    float32 (n, len(LEVERS))     movement preference vector per supplier
+  episode_stats  float32 (n, len(EPISODE_STATS)) episode count, mean opening / settled ask, ...
+  keys / rows    sorted lower-cased names and ids -> row (binary search)
+  records, offsets  each supplier's JSON, materialized into a SupplierMemory only when asked for
+The directory name is derived from the fixture path, size and mtime, so an edited fixture gets a
+new build and every worker keeps reading a consistent one; publishing it removes the builds it
+supersedes. Workers open the arrays with
+np.load(mmap_mode="r"): the pages live once in the OS page cache, however many processes attach.
+
+  PYTHONPATH=src python -m owpa.data.supplier_matrix            # build (if needed) and describe
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from owpa.schemas.supplier_memory import MovementPreferences, SupplierMemory
+
+FORMAT_VERSION = 1
+LEVERS = tuple(MovementPreferences.model_fields)
+EPISODE_STATS = ("episodes", "opening_mean", "settled_mean", "concession_mean", "won_share", "lost_share")
+_ARRAYS = ("preferences", "episode_stats", "keys", "rows", "records", "offsets")
+_SOURCE = "source.txt"  # resolved fixture path of a build
+
+
+def _nanmean(values: np.ndarray) -> float:
+    values = values[~np.isnan(values)]
+    return float(values.mean()) if len(values) else np.nan
+
+
+def _episode_stats(supplier: SupplierMemory) -> List[float]:
+    eps = supplier.episodes
+    n = len(eps)
+    return [
+        float(n),
+        _nanmean(eps.opening_ask_pct),
+        _nanmean(eps.settled_pct),
+        _nanmean(eps.opening_ask_pct - eps.settled_pct),
+        float(eps.outcome_mask("won").mean()) if n else np.nan,
+        float(eps.outcome_mask("lost").mean()) if n else np.nan,
+    ]
+
+
+def build_matrix(suppliers: Sequence[SupplierMemory], directory: str | Path, *, source: Optional[str | Path] = None) -> Path:
+    """
+    Writes the arrays for `suppliers` into `directory` (atomically: built aside, then renamed).
+    Returns the directory; an existing build is left as is. With `source` (the fixture path),
+    earlier builds of the same fixture next to it are deleted once this one is published.
+    """
+    directory = Path(directory)
+    if directory.exists():
+        return directory
+    tmp = directory.with_name(f"{directory.name}.tmp-{os.getpid()}-{threading.get_ident()}")
+    tmp.mkdir(parents=True, exist_ok=True)
+
+    index: Dict[str, int] = {}
+    for row, s in enumerate(suppliers):
+        index.setdefault(s.supplier_id.strip().lower(), row)
+        index.setdefault(s.name.strip().lower(), row)
+    keys = sorted(index)
+    records = [s.model_dump_json().encode("utf-8") for s in suppliers]
+
+    arrays = {
+        "preferences": np.array([[getattr(s.movement_preferences, lever) for lever in LEVERS] for s in suppliers], dtype="f4").reshape(-1, len(LEVERS)),
+        "episode_stats": np.array([_episode_stats(s) for s in suppliers], dtype="f4").reshape(-1, len(EPISODE_STATS)),
+        "keys": np.array(keys, dtype=str),
+        "rows": np.array([index[k] for k in keys], dtype="i4"),
+        "records": np.frombuffer(b"".join(records), dtype=np.uint8),
+        "offsets": np.cumsum([0] + [len(r) for r in records], dtype="i8"),
+    }
+    for name, arr in arrays.items():
+        np.save(tmp / f"{name}.npy", arr)
+    if source is not None:
+        (tmp / _SOURCE).write_text(str(Path(source).expanduser().resolve()), encoding="utf-8")
+    try:
+        os.rename(tmp, directory)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)  # another process published the same build first
+        return directory
+    if source is not None:
+        _prune_superseded(directory)
+    return directory
+
+
+def _prune_superseded(directory: Path) -> int:
+    # Processes still attached to a removed build keep their mappings (POSIX unlink semantics).
+    source = (directory / _SOURCE).read_text(encoding="utf-8")
+    removed = 0
+    for other in directory.parent.glob("suppliers-*"):
+        if other == directory or ".tmp-" in other.name:
+            continue
+        try:
+            if (other / _SOURCE).read_text(encoding="utf-8") != source:
+                continue
+        except OSError:
+            continue
+        shutil.rmtree(other, ignore_errors=True)
+        removed += 1
+    return removed
+
+
+class SupplierMatrix:
+    """
+    Read-only view over a built directory; arrays are memory-mapped, not copied.
+    """
+
+    def __init__(self, directory: str | Path):
+        self.directory = Path(directory)
+        arrays = {name: np.load(self.directory / f"{name}.npy", mmap_mode="r") for name in _ARRAYS}
+        self.preferences: np.ndarray = arrays["preferences"]
+        self.episode_stats: np.ndarray = arrays["episode_stats"]
+        self.keys: np.ndarray = arrays["keys"]
+        self._rows: np.ndarray = arrays["rows"]
+        self._records: np.ndarray = arrays["records"]
+        self._offsets: np.ndarray = arrays["offsets"]
+        self._materialize = lru_cache(maxsize=64)(self._load)
+
+    def __len__(self) -> int:
+        return int(self.preferences.shape[0])
+
+    def _find(self, key: str) -> Optional[int]:
+        i = int(np.searchsorted(self.keys, key))
+        if i < len(self.keys) and self.keys[i] == key:
+            return int(self._rows[i])
+        return None
+
+    def row(self, *, supplier_name: Optional[str] = None, supplier_id: Optional[str] = None) -> int:
+        """
+        Row of a supplier, by id or name (case-insensitive, then a unique name substring),
+        with the same rules and errors as owpa.data.loader.get_supplier.
+        """
+        if not supplier_name and not supplier_id:
+            raise ValueError("Provide supplier_name or supplier_id")
+        for value in (supplier_id, supplier_name):
+            row = self._find(value.strip().lower()) if value else None
+            if row is not None:
+                return row
+        if supplier_name:
+            key = supplier_name.strip().lower()
+            names = {i: self.record(i)["name"] for i in range(len(self))}
+            matches = [i for i, name in names.items() if key in name.strip().lower()]
+            if len(matches) == 1:
+                return matches[0]
+            if len(matches) > 1:
+                raise KeyError(f"Ambiguous supplier name '{supplier_name}'. Matches: {[names[i] for i in matches]}")
+        raise KeyError(f"Supplier not found. name={supplier_name!r}, id={supplier_id!r}")
+
+    def record(self, row: int) -> dict:
+        return json.loads(self._records[self._offsets[row]:self._offsets[row + 1]].tobytes())
+
+    def _load(self, row: int) -> SupplierMemory:
+        return SupplierMemory.model_validate_json(self._records[self._offsets[row]:self._offsets[row + 1]].tobytes())
+
+    def supplier(self, row: int) -> SupplierMemory:
+        """
+        The full SupplierMemory of one row, validated on first use (a copy, safe to mutate).
+        """
+        return self._materialize(row).model_copy(deep=True)
+
+    def get(self, *, supplier_name: Optional[str] = None, supplier_id: Optional[str] = None) -> SupplierMemory:
+        return self.supplier(self.row(supplier_name=supplier_name, supplier_id=supplier_id))
+
+    def features(self, row: int) -> Dict[str, float]:
+        values = list(self.preferences[row]) + list(self.episode_stats[row])
+        return {k: float(v) for k, v in zip(LEVERS + EPISODE_STATS, values)}
+
+
+def matrix_dir(fixture_path: str | Path, cache_dir: str | Path) -> Path:
+    p = Path(fixture_path).expanduser().resolve()
+    st = p.stat()
+    key = f"{FORMAT_VERSION}:{p}:{st.st_size}:{st.st_mtime_ns}"
+    return Path(cache_dir) / f"suppliers-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]}"
+
+
+_ATTACHED: Dict[Path, SupplierMatrix] = {}
+_lock = threading.Lock()
+
+
+def shared_suppliers(fixture_path: str | Path, cache_dir: str | Path) -> SupplierMatrix:
+    """
+    The matrix for the fixture's current contents: attached if this process already has it,
+    built once (by whichever process gets there first) otherwise.
+    """
+    from owpa.data.loader import load_suppliers_fixture
+
+    directory = matrix_dir(fixture_path, cache_dir)
+    with _lock:
+        matrix = _ATTACHED.get(directory)
+        if matrix is None:
+            if not directory.exists():
+                build_matrix(load_suppliers_fixture(fixture_path), directory, source=fixture_path)
+            matrix = _ATTACHED[directory] = SupplierMatrix(directory)
+        return matrix
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    from owpa.config import load_config
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args(argv)
+
+    cfg = load_config()
+    if cfg.supplier_matrix_dir is None:
+        print("Shared supplier matrices are off (SUPPLIER_MATRIX_DIR=off)", file=sys.stderr)
+        return 1
+    matrix = shared_suppliers(cfg.suppliers_fixture_path, cfg.supplier_matrix_dir)
+    print(f"{len(matrix)} suppliers -> {matrix.directory}")
+    for row in range(len(matrix)):
+        print(f"  {matrix.record(row)['name']}: {json.dumps({k: round(v, 3) for k, v in matrix.features(row).items()})}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""
+Writable, versioned supplier memory (SQLite), seeded from the suppliers fixture.
+
+Profiles and episodes are stored separately, so learning from a closed deal is one episode
+INSERT plus one profile UPDATE regardless of how much history a supplier has. Every write bumps
+the supplier's version and the store-wide version; caches key on those instead of re-reading.
+"""
+from __future__ import annotations
+
+import json
+import sqlite3
+import time
+from datetime import date
+from pathlib import Path
+from typing import ContextManager, Dict, List, Optional, Set, Tuple
+
+from owpa.data.loader import load_suppliers_fixture
+from owpa.data.storage import ensure_parent_dir, sqlite_connect
+from owpa.schemas.supplier_memory import MovementPreferences, NegotiationEpisode, SupplierMemory
+
+
+# Weight of one closed deal in the exponential moving average of a movement preference.
+LEARNING_RATE = 0.2
+
+_OUTCOME_TARGET = {"won": 1.0, "mixed": 0.5, "lost": 0.0}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS suppliers (
+    supplier_id TEXT PRIMARY KEY,
+    name_key    TEXT NOT NULL UNIQUE,
+    profile     TEXT NOT NULL,
+    version     INTEGER NOT NULL DEFAULT 1,
+    updated_at  REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS episodes (
+    supplier_id TEXT NOT NULL,
+    seq         INTEGER NOT NULL,
+    episode     TEXT NOT NULL,
+    PRIMARY KEY (supplier_id, seq)
+);
+CREATE TABLE IF NOT EXISTS store_meta (
+    key   TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO store_meta (key, value) VALUES ('version', 0);
+"""
+
+
+def ema_update(current: float, target: float, rate: float = LEARNING_RATE) -> float:
+    return round(min(1.0, max(0.0, (1.0 - rate) * current + rate * target)), 4)
+
+
+def learn_preferences(prefs: MovementPreferences, episode: NegotiationEpisode, lever: Optional[str]) -> MovementPreferences:
+    """
+    O(1) update from one closed deal:
+    - the lever of the trade that was used moves towards the outcome (won 1.0, mixed 0.5, lost 0.0)
+    - price moves towards the share of the opening ask the supplier gave up (opening -> settled)
+    """
+    update: Dict[str, float] = {}
+    if lever and lever in MovementPreferences.model_fields:
+        update[lever] = ema_update(getattr(prefs, lever), _OUTCOME_TARGET[episode.outcome])
+    opening, settled = episode.supplier_opening_ask_pct, episode.settled_pct
+    if opening and settled is not None and opening > 0:
+        moved = min(1.0, max(0.0, (opening - settled) / opening))
+        update["price"] = ema_update(update.get("price", prefs.price), moved)
+    return prefs.model_copy(update=update)
+
+
+# Databases already initialized by this process (load_memory opens the store every round).
+_READY: Set[Path] = set()
+
+
+class SupplierMemoryStore:
+    def __init__(self, path: str | Path, *, seed_fixture: Optional[str | Path] = None):
+        self.path = Path(path).expanduser().resolve()
+        if self.path in _READY and self.path.exists():
+            return
+        ensure_parent_dir(self.path)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            empty = conn.execute("SELECT COUNT(*) FROM suppliers").fetchone()[0] == 0
+        if empty and seed_fixture is not None:
+            self.import_suppliers(load_suppliers_fixture(seed_fixture))
+        _READY.add(self.path)
+
+    def _connect(self) -> ContextManager[sqlite3.Connection]:
+        return sqlite_connect(self.path)
+
+    # --- writes ------------------------------------------------------------------------------
+
+    def import_suppliers(self, suppliers: List[SupplierMemory]) -> int:
+        """
+        Inserts or replaces whole supplier records (fixture seeding / re-import).
+        """
+        with self._connect() as conn:
+            for s in suppliers:
+                profile = s.model_dump(mode="json", exclude={"episodes"})
+                row = conn.execute("SELECT version FROM suppliers WHERE supplier_id = ?", (s.supplier_id,)).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO suppliers (supplier_id, name_key, profile, version, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    (s.supplier_id, _name_key(s.name), json.dumps(profile), (row[0] + 1) if row else 1, time.time()),
+                )
+                conn.execute("DELETE FROM episodes WHERE supplier_id = ?", (s.supplier_id,))
+                # Reads are ORDER BY seq DESC: seeded episodes keep fixture order, new ones go in front.
+                conn.executemany(
+                    "INSERT INTO episodes (supplier_id, seq, episode) VALUES (?, ?, ?)",
+                    [(s.supplier_id, i, e.model_dump_json()) for i, e in enumerate(reversed(s.episodes))],
+                )
+            conn.execute("UPDATE store_meta SET value = value + 1 WHERE key = 'version'")
+        return len(suppliers)
+
+    def record_episode(self, supplier_id: str, episode: NegotiationEpisode, *, lever: Optional[str] = None) -> int:
+        """
+        Appends an episode and applies the incremental preference update in one transaction.
+        Returns the supplier's new version.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT profile, version FROM suppliers WHERE supplier_id = ?", (supplier_id,)).fetchone()
+            if row is None:
+                raise KeyError(f"Supplier not found: {supplier_id}")
+            profile = json.loads(row[0])
+            prefs = learn_preferences(MovementPreferences.model_validate(profile.get("movement_preferences") or {}), episode, lever)
+            profile["movement_preferences"] = prefs.model_dump()
+            profile["last_updated"] = date.today().isoformat()
+            if episode.outcome == "won" and episode.primary_trade_used and episode.primary_trade_used not in profile.get("successful_trades", []):
+                profile.setdefault("successful_trades", []).append(episode.primary_trade_used)
+
+            conn.execute(
+                "INSERT INTO episodes (supplier_id, seq, episode) "
+                "VALUES (?, (SELECT COALESCE(MAX(seq), -1) + 1 FROM episodes WHERE supplier_id = ?), ?)",
+                (supplier_id, supplier_id, episode.model_dump_json()),
+            )
+            version = row[1] + 1
+            conn.execute(
+                "UPDATE suppliers SET profile = ?, version = ?, updated_at = ? WHERE supplier_id = ?",
+                (json.dumps(profile), version, time.time(), supplier_id),
+            )
+            conn.execute("UPDATE store_meta SET value = value + 1 WHERE key = 'version'")
+        return version
+
+    # --- reads -------------------------------------------------------------------------------
+
+    def store_version(self) -> int:
+        """
+        Bumped by every write; a cheap cache key for "anything changed".
+        """
+        with self._connect() as conn:
+            return conn.execute("SELECT value FROM store_meta WHERE key = 'version'").fetchone()[0]
+
+    def version(self, supplier_id: str) -> Optional[int]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT version FROM suppliers WHERE supplier_id = ?", (supplier_id,)).fetchone()
+        return row[0] if row else None
+
+    def ref(self, *, supplier_name: Optional[str] = None, supplier_id: Optional[str] = None) -> Tuple[str, int]:
+        """
+        (supplier_id, version) of a supplier, looked up like get() but without reading its episodes.
+        Raises KeyError if not found.
+        """
+        with self._connect() as conn:
+            return _find(conn, "supplier_id, version", supplier_name, supplier_id)
+
+    def names(self) -> List[str]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT profile FROM suppliers ORDER BY rowid").fetchall()
+        return [json.loads(r[0])["name"] for r in rows]
+
+    def get(self, *, supplier_name: Optional[str] = None, supplier_id: Optional[str] = None) -> SupplierMemory:
+        """
+        Full SupplierMemory (episodes newest first), looked up case-insensitively by id or name.
+        Raises KeyError if not found.
+        """
+        with self._connect() as conn:
+            row = _find(conn, "supplier_id, profile", supplier_name, supplier_id)
+            episodes = conn.execute(
+                "SELECT episode FROM episodes WHERE supplier_id = ? ORDER BY seq DESC", (row[0],)
+            ).fetchall()
+
+        profile = json.loads(row[1])
+        profile["episodes"] = [json.loads(e[0]) for e in episodes]
+        return SupplierMemory.model_validate(profile)
+
+
+def _name_key(name: str) -> str:
+    return name.strip().lower()
+
+
+def _find(conn: sqlite3.Connection, columns: str, supplier_name: Optional[str], supplier_id: Optional[str]) -> tuple:
+    if not supplier_name and not supplier_id:
+        raise ValueError("Provide supplier_name or supplier_id")
+    if supplier_id:
+        row = conn.execute(f"SELECT {columns} FROM suppliers WHERE lower(supplier_id) = ?", (supplier_id.strip().lower(),)).fetchone()
+    else:
+        row = conn.execute(f"SELECT {columns} FROM suppliers WHERE name_key = ?", (_name_key(supplier_name or ""),)).fetchone()
+    if row is None:
+        raise KeyError(f"Supplier not found (name={supplier_name!r}, id={supplier_id!r})")
+    return row
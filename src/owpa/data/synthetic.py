@@ -0,0 +1,275 @@
+from __future__ import annotations
+
+import json
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from owpa.data.storage import JsonlDealStateStore, ensure_parent_dir
+from owpa.schemas.deal_state import (
+    ConcessionEntry,
+    DealState,
+    IntentType,
+    OpenIssue,
+    Percentage,
+    SupplierAsk,
+)
+from owpa.schemas.supplier_memory import MovementPreferences, NegotiationEpisode, SupplierMemory
+
+
+# Every generator is seeded per item ("<seed>:<kind>:<index>"), so any item can be
+# regenerated on its own and output does not depend on how much was generated before it.
+
+_STEMS = ["Battila", "Corealium", "Korulean", "Nordvind", "Havbris", "Tidewell", "Skarpa", "Brisane", "Veltra", "Oranda"]
+_KINDS = ["Turbines", "OEM", "Services", "Wind Systems", "Energy"]
+_STYLES = ["collaborative", "aggressive", "deadline_driven", "formal", "variable"]
+_REGIONS = ["North Sea", "Baltic", "Irish Sea", "Celtic Sea", "floating pilot"]
+_SCOPES = ["WTG+LTSA", "WTG supply only", "LTSA renewal", "LTSA add-on"]
+_TACTICS = [
+    "capacity scarcity (manufacturing slot pressure)",
+    "short-deadline anchoring",
+    "anchor high on headline uplift",
+    "bundle service scope to defend headline price",
+    "escalate liability redlines late",
+    "cite raw material indices",
+]
+_TRADES = [
+    "extend LTSA term by 2 years",
+    "earlier milestone payment (manufacturing start)",
+    "indexation cap/floor agreed (predictable)",
+    "increase spares scope (critical components)",
+    "remove aggressive delay LD step-up; replace with capped LD + recovery plan",
+    "data access + remote diagnostics rights",
+    "service credits definition simplified; remedy hierarchy clarified",
+]
+_ISSUES = [
+    "Indexation clause (cap/floor + transparency)",
+    "Delay LDs cap (delivery milestones)",
+    "Availability guarantee definition",
+    "Liability cap",
+    "Warranty exclusions",
+]
+_ISSUE_STATUSES = ["open", "pending_supplier", "pending_internal", "agreed", "rejected"]
+_BASE_TIME = datetime(2024, 1, 1, 9, 0, 0)
+
+
+def _rng(seed: int, kind: str, index: int) -> random.Random:
+    return random.Random(f"{seed}:{kind}:{index}")
+
+
+def supplier_name(index: int) -> str:
+    """
+    Deterministic, unique synthetic supplier name for a row index.
+    Deal generation uses it to reference suppliers without holding them in memory.
+    """
+    stem = _STEMS[index % len(_STEMS)]
+    kind = _KINDS[(index // len(_STEMS)) % len(_KINDS)]
+    return f"{stem} {kind} {index:06d}"
+
+
+def make_supplier(index: int, *, episodes: int, seed: int = 7) -> SupplierMemory:
+    rng = _rng(seed, "supplier", index)
+    prefs = MovementPreferences(**{k: round(rng.uniform(0.1, 0.9), 2) for k in MovementPreferences.model_fields})
+
+    eps: List[NegotiationEpisode] = []
+    for _ in range(episodes):
+        ask = round(rng.uniform(3.0, 12.0), 1)
+        settled = round(ask * rng.uniform(0.25, 0.8), 1)
+        outcome = "won" if settled <= ask * 0.45 else ("mixed" if settled <= ask * 0.65 else "lost")
+        eps.append(
+            NegotiationEpisode(
+                context=f"{rng.choice(_SCOPES)}, {rng.choice(_REGIONS)}",
+                supplier_opening_ask_pct=ask,
+                settled_pct=settled,
+                primary_trade_used=rng.choice(_TRADES),
+                outcome=outcome,
+                year=rng.randint(2015, 2025),
+            )
+        )
+
+    return SupplierMemory(
+        supplier_id=f"SUP-SYN-{index:06d}",
+        name=supplier_name(index),
+        style=rng.choice(_STYLES),
+        typical_tactics=rng.sample(_TACTICS, k=2),
+        movement_preferences=prefs,
+        successful_trades=rng.sample(_TRADES, k=2),
+        episodes=eps,
+    )
+
+
+def iter_suppliers(n: int, *, episodes: int, seed: int = 7) -> Iterator[SupplierMemory]:
+    for i in range(n):
+        yield make_supplier(i, episodes=episodes, seed=seed)
+
+
+def write_suppliers_fixture(path: str | Path, n: int, *, episodes: int, seed: int = 7) -> int:
+    """
+    Streams {"suppliers": [...]} to disk one supplier at a time (same shape as suppliers.json).
+    """
+    ensure_parent_dir(path)
+    with Path(path).open("w", encoding="utf-8") as f:
+        f.write('{"suppliers": [\n')
+        for i, s in enumerate(iter_suppliers(n, episodes=episodes, seed=seed)):
+            if i:
+                f.write(",\n")
+            f.write(s.model_dump_json())
+        f.write("\n]}\n")
+    return n
+
+
+def iter_deal_rounds(
+    k: int,
+    *,
+    rounds: int,
+    n_suppliers: int,
+    seed: int = 7,
+) -> Iterator[DealState]:
+    """
+    Yields one DealState snapshot per round, deal after deal.
+    The same DealState object is mutated between yields, so consumers must serialize
+    (not keep) each snapshot; only one deal is ever held in memory.
+    """
+    intents = [i for i in IntentType if i != IntentType.OTHER]
+    for d in range(k):
+        rng = _rng(seed, "deal", d)
+        t = _BASE_TIME + timedelta(days=rng.randint(0, 700))
+        opening = round(rng.uniform(4.0, 12.0), 1)
+        deal = DealState(
+            deal_id=f"DEAL-SYN-{d:07d}",
+            supplier_name=supplier_name(rng.randrange(max(1, n_suppliers))),
+            open_issues=[OpenIssue(topic=topic) for topic in rng.sample(_ISSUES, k=3)],
+            last_updated_at=t,
+            metadata={"project_region": rng.choice(_REGIONS), "synthetic": True},
+        )
+
+        for r in range(rounds):
+            t += timedelta(days=rng.randint(2, 21), hours=rng.randint(0, 8))
+            intent = rng.choice(intents)
+            # Supplier ask converges towards a settlement over the rounds.
+            pct = round(opening * (1.0 - 0.6 * r / max(1, rounds)), 1)
+            ask = SupplierAsk(
+                intent=intent,
+                headline_price_change_pct=Percentage(value=pct) if intent != IntentType.CONTRACT_REDLINE else None,
+                deadline=t + timedelta(days=rng.randint(2, 10)) if rng.random() < 0.4 else None,
+                requested_trades=rng.sample(_TRADES, k=rng.randint(0, 2)),
+                raw_snippets=[f"we require a {pct}% adjustment"],
+            )
+            deal.supplier_ask = ask
+            deal.round_number = r + 1
+            deal.last_supplier_email_subject = f"Round {r + 1}: {intent.value.replace('_', ' ')}"
+            deal.last_supplier_email_received_at = t
+            deal.last_updated_at = t
+            if rng.random() < 0.3:
+                deal.concessions.append(
+                    ConcessionEntry(timestamp=t, we_gave=rng.choice(_TRADES), we_got=f"uplift reduced to {pct}%")
+                )
+            issue = rng.choice(deal.open_issues)
+            issue.status = rng.choice(_ISSUE_STATUSES)  # type: ignore[assignment]
+            yield deal
+
+
+def write_state_store(path: str | Path, k: int, *, rounds: int, n_suppliers: int, seed: int = 7) -> int:
+    store = JsonlDealStateStore(path)
+    store.path.unlink(missing_ok=True)
+    return store.append_many(iter_deal_rounds(k, rounds=rounds, n_suppliers=n_suppliers, seed=seed))
+
+
+_EMAIL_TEMPLATES: Dict[str, List[str]] = {
+    "price_increase_request": [
+        "Following our review, input cost escalation on {driver} has changed our cost base. "
+        "We therefore require a {pct}% increase to the turbine supply price.",
+        "Due to inflation in {driver}, we must apply a {pct}% uplift to the quoted price.",
+    ],
+    "slot_pressure_deadline": [
+        "Our assembly capacity for {year} is nearly fully booked. To hold the manufacturing slot "
+        "allocated to your project we need a signed reservation agreement this week.",
+        "The slot currently reserved for you will be released unless we receive a signature. Please sign by Friday.",
+    ],
+    "contract_redline": [
+        "Please find attached our redline. The liability cap should be reduced and consequential damages "
+        "excluded on a mutual basis.",
+        "Our legal team requires changes to the warranty exclusions and the indemnity wording.",
+    ],
+    "counter_to_our_offer": [
+        "Thank you for your counter-proposal. As a counter, we propose an uplift of {pct}% combined with "
+        "earlier payment milestones.",
+        "We can come down from our original request and counter at {pct}% if a capped indexation is agreed.",
+    ],
+    "info_request": [
+        "Could you provide the updated site layout and the grid connection schedule?",
+        "We need your confirmation of the foundation interface drawings before we proceed.",
+    ],
+}
+_DRIVERS = ["steel plate", "castings", "rare-earth magnets", "logistics", "labour"]
+
+
+def make_email(intent: str, index: int, *, seed: int = 7) -> Tuple[str, Dict[str, object]]:
+    """
+    Returns (email text, golden labels) for one synthetic supplier email.
+    """
+    rng = _rng(seed, f"email:{intent}", index)
+    pct = round(rng.uniform(3.0, 12.0), 1)
+    template = rng.choice(_EMAIL_TEMPLATES[intent])
+    body = template.format(pct=pct, driver=rng.choice(_DRIVERS), year=rng.randint(2026, 2029))
+    deadline = "by friday" in body.lower()
+    if intent == "price_increase_request" and rng.random() < 0.5:
+        body += " Please confirm by Friday."
+        deadline = True
+
+    text = f"Dear Procurement Team,\n\n{body}\n\nKind regards,\n{supplier_name(rng.randrange(1000))}\n"
+    labels: Dict[str, object] = {
+        "intent": intent,
+        "headline_price_change_pct": pct if "{pct}" in template else None,
+        "has_deadline": deadline,
+    }
+    return text, labels
+
+
+def write_email_corpus(out_dir: str | Path, per_intent: int, *, seed: int = 7) -> int:
+    """
+    Writes <out_dir>/<intent>/<n>.txt plus a golden.json the golden runner can consume
+    (python -m owpa.evaluation.golden_tests --golden <out_dir>/golden.json --mode rules).
+    """
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    n = 0
+    with (out / "golden.json").open("w", encoding="utf-8") as golden:
+        golden.write('{"budgets": {"min_accuracy": 0.0}, "cases": [\n')
+        for intent in _EMAIL_TEMPLATES:
+            (out / intent).mkdir(exist_ok=True)
+            for i in range(per_intent):
+                text, labels = make_email(intent, i, seed=seed)
+                rel = f"{intent}/{i:06d}.txt"
+                (out / rel).write_text(text, encoding="utf-8")
+                case = {"id": f"{intent}-{i:06d}", "email": rel, "expected": labels}
+                golden.write((",\n" if n else "") + json.dumps(case))
+                n += 1
+        golden.write("\n]}\n")
+    return n
+
+
+def generate_all(
+    out_dir: str | Path,
+    *,
+    suppliers: int,
+    episodes: int,
+    deals: int,
+    rounds: int,
+    emails_per_intent: int,
+    seed: int = 7,
+    progress: Optional[Callable[[str, int], None]] = None,
+) -> Dict[str, int]:
+    out = Path(out_dir)
+    counts = {}
+    counts["suppliers"] = write_suppliers_fixture(out / "suppliers.json", suppliers, episodes=episodes, seed=seed)
+    if progress:
+        progress("suppliers", counts["suppliers"])
+    counts["snapshots"] = write_state_store(out / "state_store.jsonl", deals, rounds=rounds, n_suppliers=suppliers, seed=seed)
+    if progress:
+        progress("snapshots", counts["snapshots"])
+    counts["emails"] = write_email_corpus(out / "emails", emails_per_intent, seed=seed)
+    if progress:
+        progress("emails", counts["emails"])
+    return counts
@@ -1 +1,266 @@
+from __future__ import annotations
 
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from owpa.config import isolated_env
+from owpa.evaluation.metrics import accuracy, latency_summary, pct_close
+
+
+DEFAULT_GOLDEN_PATH = Path("./data/emails/golden.json")
+
+# Run modes -> (USE_LLM, OWPA_LLM_CASSETTE_MODE)
+_MODES = {
+    "replay": ("true", "replay"),  # offline: recorded llm_json responses only
+    "record": ("true", "record"),  # live model, responses written to the cassette store
+    "live": ("true", "off"),
+    "rules": ("false", "off"),     # deterministic heuristics, no LLM at all
+}
+
+
+@dataclass
+class GoldenCase:
+    case_id: str
+    email_path: Path
+    expected: Dict[str, Any]
+    subject: str = ""
+    supplier_name: Optional[str] = None
+
+
+@dataclass
+class CaseResult:
+    case_id: str
+    checks: Dict[str, bool] = field(default_factory=dict)
+    actual: Dict[str, Any] = field(default_factory=dict)
+    node_ms: Dict[str, float] = field(default_factory=dict)
+    total_ms: float = 0.0
+    error: Optional[str] = None
+
+
+def load_golden_set(path: str | Path = DEFAULT_GOLDEN_PATH) -> tuple[List[GoldenCase], Dict[str, Any]]:
+    """
+    Loads a golden set file:
+      {"budgets": {...}, "cases": [{"id", "email", "subject", "supplier_name", "expected": {...}}, ...]}
+    Email paths are resolved relative to the golden file.
+    """
+    p = Path(path)
+    with p.open("r", encoding="utf-8") as f:
+        raw = json.load(f)
+
+    cases = []
+    for item in raw.get("cases", []):
+        cases.append(
+            GoldenCase(
+                case_id=item["id"],
+                email_path=(p.parent / item["email"]).resolve(),
+                expected=dict(item.get("expected") or {}),
+                subject=item.get("subject") or "",
+                supplier_name=item.get("supplier_name"),
+            )
+        )
+    return cases, dict(raw.get("budgets") or {})
+
+
+def check_case(expected: Dict[str, Any], deal) -> tuple[Dict[str, bool], Dict[str, Any]]:
+    """
+    Compares a processed DealState against the labels of one case.
+    Only labels present in `expected` are checked.
+    """
+    ask = deal.supplier_ask
+    actual = {
+        "intent": ask.intent.value if ask else None,
+        "headline_price_change_pct": ask.headline_price_change_pct.value if ask and ask.headline_price_change_pct else None,
+        "has_deadline": bool(ask and ask.deadline),
+    }
+
+    checks: Dict[str, bool] = {}
+    if "intent" in expected:
+        checks["intent"] = actual["intent"] == expected["intent"]
+    if "headline_price_change_pct" in expected:
+        checks["headline_price_change_pct"] = pct_close(actual["headline_price_change_pct"], expected["headline_price_change_pct"])
+    if "has_deadline" in expected:
+        checks["has_deadline"] = actual["has_deadline"] == bool(expected["has_deadline"])
+    return checks, actual
+
+
+def run_case(graph, case: GoldenCase) -> CaseResult:
+    from owpa.agent.graph import stream_round
+    from owpa.data.loader import load_deal_state
+
+    result = CaseResult(case_id=case.case_id)
+    sample_path = os.getenv("SAMPLE_DEAL_STATE_PATH", "./data/fixtures/sample_deal_state.json")
+    deal = load_deal_state(sample_path)
+    deal.deal_id = f"GOLDEN-{case.case_id}"
+    if case.supplier_name:
+        deal.supplier_name = case.supplier_name
+
+    inputs = {
+        "email_text": case.email_path.read_text(encoding="utf-8"),
+        "supplier_email_subject": case.subject,
+        "deal_state": deal,
+    }
+
+    final: Dict[str, Any] = dict(inputs)
+    started = time.perf_counter()
+    try:
+        for node, final, elapsed_ms in stream_round(graph, inputs):
+            result.node_ms[node] = elapsed_ms
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+        return result
+    finally:
+        result.total_ms = round((time.perf_counter() - started) * 1000.0, 3)
+
+    result.checks, result.actual = check_case(case.expected, final["deal_state"])
+    return result
+
+
+def run_golden_set(cases: Sequence[GoldenCase], *, workers: int = 4, graph=None) -> List[CaseResult]:
+    """
+    Runs every case through the full graph, in parallel. Result order follows `cases`.
+    """
+    if graph is None:
+        from owpa.agent.graph import build_graph
+
+        graph = build_graph()
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return list(pool.map(lambda c: run_case(graph, c), cases))
+
+
+def evaluate(results: Sequence[CaseResult], budgets: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Aggregates accuracy per label and latency per node, then lists every budget breach as a regression.
+    budgets:
+      min_accuracy: float | {label: float}
+      node_p95_ms: {node: ms}
+      round_p95_ms: ms
+    """
+    by_label: Dict[str, List[bool]] = {}
+    by_node: Dict[str, List[float]] = {}
+    for r in results:
+        for label, ok in r.checks.items():
+            by_label.setdefault(label, []).append(ok)
+        for node, ms in r.node_ms.items():
+            by_node.setdefault(node, []).append(ms)
+
+    acc = {label: round(accuracy(oks), 4) for label, oks in sorted(by_label.items())}
+    nodes = {node: latency_summary(ms) for node, ms in by_node.items()}
+    rounds = latency_summary([r.total_ms for r in results if r.error is None])
+
+    regressions: List[str] = []
+    for r in results:
+        if r.error:
+            regressions.append(f"case {r.case_id} failed: {r.error}")
+
+    min_acc = budgets.get("min_accuracy", 1.0)
+    for label, value in acc.items():
+        floor = min_acc.get(label, 1.0) if isinstance(min_acc, dict) else float(min_acc)
+        if value < float(floor):
+            misses = [r.case_id for r in results if r.checks.get(label) is False]
+            regressions.append(f"accuracy {label}={value:.2f} < {float(floor):.2f} (cases: {', '.join(misses)})")
+
+    for node, budget in (budgets.get("node_p95_ms") or {}).items():
+        if node in nodes and nodes[node]["p95"] > float(budget):
+            regressions.append(f"latency {node} p95={nodes[node]['p95']:.1f}ms > budget {float(budget):.1f}ms")
+
+    round_budget = budgets.get("round_p95_ms")
+    if round_budget is not None and rounds["p95"] > float(round_budget):
+        regressions.append(f"latency round p95={rounds['p95']:.1f}ms > budget {float(round_budget):.1f}ms")
+
+    return {
+        "cases": len(results),
+        "accuracy": acc,
+        "node_latency_ms": nodes,
+        "round_latency_ms": rounds,
+        "regressions": regressions,
+        "results": [
+            {
+                "case_id": r.case_id,
+                "checks": r.checks,
+                "actual": r.actual,
+                "node_ms": r.node_ms,
+                "total_ms": r.total_ms,
+                "error": r.error,
+            }
+            for r in results
+        ],
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [f"Golden set: {report['cases']} cases"]
+    lines.append("Accuracy:")
+    for label, value in report["accuracy"].items():
+        lines.append(f"  {label:<28} {value:6.2%}")
+    lines.append("Latency (ms)              p50       p95       p99")
+    for node, s in report["node_latency_ms"].items():
+        lines.append(f"  {node:<20} {s['p50']:9.1f} {s['p95']:9.1f} {s['p99']:9.1f}")
+    s = report["round_latency_ms"]
+    lines.append(f"  {'(round)':<20} {s['p50']:9.1f} {s['p95']:9.1f} {s['p99']:9.1f}")
+    if report["regressions"]:
+        lines.append("REGRESSIONS:")
+        lines.extend(f"  - {x}" for x in report["regressions"])
+    else:
+        lines.append("OK: no regressions")
+    return "\n".join(lines)
+
+
+def _parse_budget_overrides(items: Sequence[str]) -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for item in items:
+        node, _, ms = item.partition("=")
+        if not node or not ms:
+            raise ValueError(f"Invalid --budget {item!r}; expected node=ms")
+        out[node.strip()] = float(ms)
+    return out
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Golden-set regression runner (accuracy + per-node latency).")
+    parser.add_argument("--golden", default=str(DEFAULT_GOLDEN_PATH), help="Golden set JSON file")
+    parser.add_argument("--mode", choices=sorted(_MODES), default="replay")
+    parser.add_argument("--cassettes", default=None, help="Cassette directory (default: OWPA_LLM_CASSETTE_DIR)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--budget", action="append", default=[], help="Per-node p95 budget override, e.g. classify=250")
+    parser.add_argument("--min-accuracy", type=float, default=None)
+    parser.add_argument("--json", dest="json_out", default=None, help="Write the full report as JSON")
+    args = parser.parse_args(argv)
+
+    use_llm_flag, cassette = _MODES[args.mode]
+    os.environ["USE_LLM"] = use_llm_flag
+    os.environ["OWPA_LLM_CASSETTE_MODE"] = cassette
+    if args.cassettes:
+        os.environ["OWPA_LLM_CASSETTE_DIR"] = args.cassettes
+
+    cases, budgets = load_golden_set(args.golden)
+    if args.mode == "rules":
+        # Heuristics are measured against their own (lower) floor when one is configured.
+        budgets["min_accuracy"] = budgets.get("rules_min_accuracy", budgets.get("min_accuracy", 1.0))
+    if args.min_accuracy is not None:
+        budgets["min_accuracy"] = args.min_accuracy
+    if args.budget:
+        budgets["node_p95_ms"] = {**(budgets.get("node_p95_ms") or {}), **_parse_budget_overrides(args.budget)}
+
+    # Never write golden rounds into the real stores, nor replay checkpoints or memos from them.
+    with tempfile.TemporaryDirectory(prefix="owpa-golden-") as tmp:
+        os.environ.update(isolated_env(Path(tmp)))
+        results = run_golden_set(cases, workers=args.workers)
+
+    report = evaluate(results, budgets)
+    print(format_report(report))
+    if args.json_out:
+        Path(args.json_out).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return 1 if report["regressions"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1 +1,53 @@
+from __future__ import annotations
 
+import math
+from typing import Dict, Iterable, List, Sequence
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """
+    Linear-interpolated percentile (q in 0..100). Returns 0.0 for an empty sequence.
+    """
+    if not values:
+        return 0.0
+    xs = sorted(values)
+    if len(xs) == 1:
+        return float(xs[0])
+    rank = (len(xs) - 1) * (q / 100.0)
+    lo = math.floor(rank)
+    hi = math.ceil(rank)
+    if lo == hi:
+        return float(xs[lo])
+    return float(xs[lo] + (xs[hi] - xs[lo]) * (rank - lo))
+
+
+def latency_summary(values: Sequence[float]) -> Dict[str, float]:
+    """
+    Count plus p50/p95/p99/max (milliseconds in, milliseconds out).
+    """
+    return {
+        "count": float(len(values)),
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+        "max": round(max(values), 3) if values else 0.0,
+    }
+
+
+def accuracy(outcomes: Iterable[bool]) -> float:
+    """
+    Fraction of True outcomes. An empty set counts as fully accurate (nothing to get wrong).
+    """
+    items: List[bool] = list(outcomes)
+    if not items:
+        return 1.0
+    return sum(1 for x in items if x) / len(items)
+
+
+def pct_close(actual: float | None, expected: float | None, *, tol: float = 0.05) -> bool:
+    """
+    Percentage comparison used by the golden set: both absent, or both present and within tol.
+    """
+    if expected is None or actual is None:
+        return expected is None and actual is None
+    return abs(float(actual) - float(expected)) <= tol
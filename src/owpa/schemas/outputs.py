@@ -9,6 +9,7 @@ class TradeOption(BaseModel):
     """
     A proposed give/get bundle with a predicted acceptance likelihood.
     """
+    option_id: Optional[str] = None  # stable candidate key; persisted instead of the full option
     we_offer: str
     we_request: str
     predicted_acceptance: float = Field(..., ge=0.0, le=1.0)
@@ -1,9 +1,12 @@
 from __future__ import annotations
 
+import sys
 from datetime import date
-from typing import Dict, List, Literal, Optional
+from typing import Any, Dict, Iterator, List, Literal, Optional, Sequence, get_args, overload
 
-from pydantic import BaseModel, Field
+import numpy as np
+from pydantic import BaseModel, Field, GetCoreSchemaHandler, TypeAdapter
+from pydantic_core import core_schema
 
 
 class MovementPreferences(BaseModel):
@@ -32,6 +35,114 @@ class NegotiationEpisode(BaseModel):
     year: Optional[int] = None
 
 
+_OUTCOMES = get_args(NegotiationEpisode.model_fields["outcome"].annotation)
+_NO_YEAR = np.iinfo(np.int32).min
+_STR_FIELDS = ("context", "primary_trade_used", "notes")
+
+
+class EpisodeLog(Sequence[NegotiationEpisode]):
+    """
+    Compact, read-only episode history: parallel typed arrays instead of one pydantic object per
+    episode. Numeric columns are NumPy arrays (NaN / _NO_YEAR for missing) for vectorized use;
+    context, trade and notes are codes into a table of interned strings. Indexing and iteration
+    build NegotiationEpisode views on the fly, so existing code and the UI keep working.
+    """
+
+    __slots__ = ("opening_ask_pct", "settled_pct", "outcome_codes", "years", "_codes", "_strings")
+
+    def __init__(self, episodes: Sequence[NegotiationEpisode] = ()):
+        strings: List[str] = []
+        lookup: Dict[str, int] = {}
+
+        def code(value: Optional[str]) -> int:
+            if value is None:
+                return -1
+            if value not in lookup:
+                lookup[value] = len(strings)
+                strings.append(sys.intern(value))
+            return lookup[value]
+
+        self.opening_ask_pct = np.array([np.nan if e.supplier_opening_ask_pct is None else e.supplier_opening_ask_pct for e in episodes], dtype="f8")
+        self.settled_pct = np.array([np.nan if e.settled_pct is None else e.settled_pct for e in episodes], dtype="f8")
+        self.outcome_codes = np.array([_OUTCOMES.index(e.outcome) for e in episodes], dtype="i1")
+        self.years = np.array([_NO_YEAR if e.year is None else e.year for e in episodes], dtype="i4")
+        self._codes = {f: np.array([code(getattr(e, f)) for e in episodes], dtype="i4") for f in _STR_FIELDS}
+        self._strings = strings
+
+    def __len__(self) -> int:
+        return len(self.outcome_codes)
+
+    def _string(self, field: str, i: int) -> Optional[str]:
+        c = int(self._codes[field][i])
+        return self._strings[c] if c >= 0 else None
+
+    @overload
+    def __getitem__(self, i: int) -> NegotiationEpisode: ...
+
+    @overload
+    def __getitem__(self, i: slice) -> "EpisodeLog": ...
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            out = EpisodeLog.__new__(EpisodeLog)
+            out.opening_ask_pct, out.settled_pct = self.opening_ask_pct[i], self.settled_pct[i]
+            out.outcome_codes, out.years = self.outcome_codes[i], self.years[i]
+            out._codes = {f: c[i] for f, c in self._codes.items()}
+            out._strings = self._strings
+            return out
+        i = range(len(self))[i]  # negative index / IndexError
+        opening, settled, year = self.opening_ask_pct[i], self.settled_pct[i], int(self.years[i])
+        return NegotiationEpisode.model_construct(
+            context=self._string("context", i),
+            supplier_opening_ask_pct=None if np.isnan(opening) else float(opening),
+            settled_pct=None if np.isnan(settled) else float(settled),
+            primary_trade_used=self._string("primary_trade_used", i),
+            outcome=_OUTCOMES[self.outcome_codes[i]],
+            notes=self._string("notes", i),
+            year=None if year == _NO_YEAR else year,
+        )
+
+    def __iter__(self) -> Iterator[NegotiationEpisode]:
+        return (self[i] for i in range(len(self)))
+
+    def trades(self) -> List[str]:
+        """
+        primary_trade_used of every episode ("" when missing), without building views.
+        """
+        return [self._strings[c] if c >= 0 else "" for c in self._codes["primary_trade_used"].tolist()]
+
+    def outcome_mask(self, outcome: str) -> np.ndarray:
+        return self.outcome_codes == _OUTCOMES.index(outcome)
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return [e.model_dump() for e in self]
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (EpisodeLog, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"EpisodeLog({len(self)} episodes)"
+
+    @classmethod
+    def _validate(cls, value: Any) -> "EpisodeLog":
+        if isinstance(value, EpisodeLog):
+            return value
+        return cls(_EPISODE_LIST.validate_python(value))
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source: Any, handler: GetCoreSchemaHandler) -> core_schema.CoreSchema:
+        return core_schema.no_info_plain_validator_function(
+            cls._validate,
+            json_schema_input_schema=handler.generate_schema(List[NegotiationEpisode]),
+            serialization=core_schema.plain_serializer_function_ser_schema(lambda log: log.to_list()),
+        )
+
+
+_EPISODE_LIST = TypeAdapter(List[NegotiationEpisode])
+
+
 class SupplierMemory(BaseModel):
     supplier_id: str
     name: str
@@ -46,6 +157,6 @@ class SupplierMemory(BaseModel):
     sensitive_points: List[str] = Field(default_factory=list)  # e.g., "unlimited liability rejected"
 
     # Episodes = the source for MVP prediction
-    episodes: List[NegotiationEpisode] = Field(default_factory=list)
+    episodes: EpisodeLog = Field(default_factory=EpisodeLog)
 
     last_updated: Optional[date] = None
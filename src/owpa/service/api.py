@@ -0,0 +1,404 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+from owpa.agent.ratelimit import llm_scope
+from owpa.agent.state import dump_agent_state
+from owpa.config import load_config
+from owpa.data.loader import get_supplier, load_suppliers_fixture
+from owpa.data.storage import JsonlDealStateStore
+from owpa.schemas.deal_state import DealState
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+_MAX_BODY = 2 * 1024 * 1024
+
+
+class CopilotService:
+    """
+    Request handling for the local HTTP API, independent of the socket layer.
+
+    - coalescing: identical in-flight requests (same route + canonical body) share one execution
+    - per-deal ordering: rounds for one deal_id run strictly in arrival order (FIFO asyncio.Lock)
+    - backpressure: at most `max_pending` admitted jobs; beyond that requests get 503 + Retry-After
+    - `workers` threads run the blocking graph / store work
+    """
+
+    def __init__(self, *, workers: int = 4, max_pending: int = 64, graph=None):
+        self.cfg = load_config()
+        self.store = JsonlDealStateStore(self.cfg.state_store_path)
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self._graph = graph
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="owpa-api")
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: list[asyncio.Task] = []
+        self._admitted = 0
+        self._deal_locks: Dict[str, asyncio.Lock] = {}
+        self._deal_users: Counter = Counter()  # requests holding or waiting on each deal lock
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._suppliers: Optional[Tuple[float, list]] = None
+
+        self.started_at = time.time()
+        self.counters: Counter = Counter()
+        self.latencies_ms: Dict[str, Deque[float]] = {}
+
+    # --- lifecycle -------------------------------------------------------------------------
+
+    async def start(self) -> None:
+        if self._graph is None:
+            from owpa.agent.graph import build_graph
+
+            self._graph = build_graph()
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for t in self._worker_tasks:
+            t.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._pool.shutdown(wait=False)
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        assert self._queue is not None
+        while True:
+            fn, fut = await self._queue.get()
+            try:
+                result = await loop.run_in_executor(self._pool, fn)
+                if not fut.done():
+                    fut.set_result(result)
+            except Exception as e:
+                if not fut.done():
+                    fut.set_exception(e)
+            finally:
+                self._queue.task_done()
+
+    # --- scheduling ------------------------------------------------------------------------
+
+    async def _run_job(self, fn: Callable[[], Any], *, deal_id: Optional[str] = None) -> Any:
+        if self._admitted >= self.max_pending:
+            self.counters["rejected"] += 1
+            raise HttpError(503, "Server busy: too many pending requests", {"Retry-After": "1"})
+        self._admitted += 1
+        try:
+            if deal_id is None:
+                return await self._enqueue(fn)
+            lock = self._deal_locks.setdefault(deal_id, asyncio.Lock())
+            self._deal_users[deal_id] += 1
+            try:
+                async with lock:
+                    return await self._enqueue(fn)
+            finally:
+                # Drop the lock only once no request holds or waits on it; a fresh lock for a deal
+                # with waiters would let the next request run alongside them.
+                self._deal_users[deal_id] -= 1
+                if not self._deal_users[deal_id]:
+                    del self._deal_users[deal_id]
+                    self._deal_locks.pop(deal_id, None)
+        finally:
+            self._admitted -= 1
+
+    async def _enqueue(self, fn: Callable[[], Any]) -> Any:
+        assert self._queue is not None
+        fut = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((fn, fut))  # never full: admitted <= max_pending == maxsize
+        return await fut
+
+    async def _coalesced(self, key: str, make: Callable[[], Awaitable[Any]]) -> Any:
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self.counters["coalesced"] += 1
+            return await asyncio.shield(fut)
+        fut = asyncio.ensure_future(make())
+        self._inflight[key] = fut
+        fut.add_done_callback(lambda _f: self._inflight.pop(key, None))
+        return await asyncio.shield(fut)
+
+    # --- routes ----------------------------------------------------------------------------
+
+    async def handle(self, method: str, path: str, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        route = urlsplit(path).path.rstrip("/") or "/"
+        label = "/v1/deals/{id}" if route.startswith("/v1/deals/") else route
+        t0 = time.perf_counter()
+        try:
+            status, payload = await self._dispatch(method, route, body)
+        except HttpError:
+            self.counters[f"errors:{label}"] += 1
+            raise
+        self._observe(label, t0)
+        return status, payload
+
+    async def _dispatch(self, method: str, route: str, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        if route == "/health":
+            return 200, {"status": "ok", "uptime_s": round(time.time() - self.started_at, 1)}
+        if route == "/metrics":
+            return 200, self.metrics()
+        if route == "/v1/rounds":
+            _require(method, "POST")
+            return 200, await self.run_round(_json_body(body))
+        if route == "/v1/trades/score":
+            _require(method, "POST")
+            return 200, await self.score_trades(_json_body(body))
+        if route.startswith("/v1/deals/") and route.endswith("/close"):
+            _require(method, "POST")
+            return 200, await self.close_deal(route[len("/v1/deals/"):-len("/close")], _json_body(body))
+        if route.startswith("/v1/deals/"):
+            _require(method, "GET")
+            return 200, await self.get_deal(route[len("/v1/deals/"):])
+        raise HttpError(404, f"No route for {route}")
+
+    async def run_round(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        {"deal_id", "email_text", "subject"?, "supplier_name"?, "deal_state"?}
+        Without deal_state the latest stored snapshot is used (or a new deal if supplier_name is given).
+        """
+        deal_id = req.get("deal_id") or (req.get("deal_state") or {}).get("deal_id")
+        if not deal_id or not str(req.get("email_text") or "").strip():
+            raise HttpError(400, "deal_id and email_text are required")
+
+        def work() -> Dict[str, Any]:
+            if req.get("deal_state"):
+                deal = DealState.model_validate(req["deal_state"])
+            else:
+                deal = self.store.load_latest(deal_id)
+                if deal is None:
+                    if not req.get("supplier_name"):
+                        raise HttpError(404, f"Unknown deal {deal_id!r}; pass supplier_name or deal_state to start one")
+                    deal = DealState(deal_id=deal_id, supplier_name=req["supplier_name"])
+            with llm_scope("interactive", deal_id):
+                result = self._graph.invoke(
+                    {"email_text": req["email_text"], "supplier_email_subject": req.get("subject") or "", "deal_state": deal}
+                )
+            keep = ("deal_state", "trade_options", "coach_notes", "email_draft")
+            return dump_agent_state({k: result[k] for k in keep if k in result})
+
+        key = _request_key("round", req)
+        return await self._coalesced(key, lambda: self._run_job(work, deal_id=str(deal_id)))
+
+    async def get_deal(self, deal_id: str) -> Dict[str, Any]:
+        if not deal_id:
+            raise HttpError(400, "deal_id is required")
+
+        def work() -> Dict[str, Any]:
+            deal = self.store.load_latest(deal_id)
+            if deal is None:
+                raise HttpError(404, f"Deal not found: {deal_id}")
+            return {"deal_state": deal.model_dump(mode="json")}
+
+        return await self._coalesced(f"deal:{deal_id}", lambda: self._run_job(work))
+
+    async def close_deal(self, deal_id: str, req: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        {"outcome": "won" | "mixed" | "lost", "settled_pct"?, "primary_trade"?, "notes"?}
+        """
+        from owpa.service.deals import close_deal
+
+        def work() -> Dict[str, Any]:
+            try:
+                deal, version = close_deal(
+                    deal_id,
+                    outcome=str(req.get("outcome") or "mixed"),
+                    settled_pct=req.get("settled_pct"),
+                    primary_trade=req.get("primary_trade"),
+                    notes=req.get("notes"),
+                )
+            except KeyError as e:
+                raise HttpError(404, str(e))
+            except ValueError as e:
+                raise HttpError(400, str(e))
+            return {"deal_state": deal.model_dump(mode="json"), "supplier_memory_version": version}
+
+        return await self._coalesced(_request_key(f"close:{deal_id}", req), lambda: self._run_job(work, deal_id=deal_id))
+
+    async def score_trades(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        {"supplier_name" | "supplier_id", "intent", "candidates"?: [[option_id, we_offer, we_request], ...]}
+        """
+        from owpa.agent.nodes.predict_trade import CANDIDATE_TRADES, score_trade_options
+
+        if not (req.get("supplier_name") or req.get("supplier_id")):
+            raise HttpError(400, "supplier_name or supplier_id is required")
+        candidates = [tuple(c) for c in req.get("candidates") or CANDIDATE_TRADES]
+        if any(len(c) != 3 for c in candidates):
+            raise HttpError(400, "candidates must be [option_id, we_offer, we_request] triples")
+
+        def work() -> Dict[str, Any]:
+            try:
+                if self.cfg.supplier_memory_db_path:
+                    from owpa.data.supplier_store import SupplierMemoryStore
+
+                    memory = SupplierMemoryStore(self.cfg.supplier_memory_db_path, seed_fixture=self.cfg.suppliers_fixture_path)
+                    supplier = memory.get(supplier_name=req.get("supplier_name"), supplier_id=req.get("supplier_id"))
+                else:
+                    supplier = get_supplier(
+                        self._load_suppliers(), supplier_name=req.get("supplier_name"), supplier_id=req.get("supplier_id")
+                    )
+            except KeyError as e:
+                raise HttpError(404, str(e))
+            options = score_trade_options(supplier, str(req.get("intent") or "other"), candidates)
+            return {"supplier_id": supplier.supplier_id, "trade_options": [o.model_dump(mode="json") for o in options]}
+
+        return await self._coalesced(_request_key("score", req), lambda: self._run_job(work))
+
+    def _load_suppliers(self) -> list:
+        mtime = self.cfg.suppliers_fixture_path.stat().st_mtime
+        if self._suppliers is None or self._suppliers[0] != mtime:
+            self._suppliers = (mtime, load_suppliers_fixture(self.cfg.suppliers_fixture_path))
+        return self._suppliers[1]
+
+    # --- metrics ---------------------------------------------------------------------------
+
+    def _observe(self, route: str, t0: float) -> None:
+        self.counters[f"requests:{route}"] += 1
+        self.latencies_ms.setdefault(route, deque(maxlen=2048)).append((time.perf_counter() - t0) * 1000.0)
+
+    def metrics(self) -> Dict[str, Any]:
+        from owpa.evaluation.metrics import latency_summary
+
+        return {
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "admitted": self._admitted,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "inflight_keys": len(self._inflight),
+            "deals_locked": len(self._deal_locks),
+            "counters": dict(self.counters),
+            "latency_ms": {route: latency_summary(list(v)) for route, v in self.latencies_ms.items()},
+        }
+
+
+def _require(method: str, expected: str) -> None:
+    if method != expected:
+        raise HttpError(405, f"Use {expected}")
+
+
+def _json_body(body: bytes) -> Dict[str, Any]:
+    try:
+        data = json.loads(body or b"{}")
+    except json.JSONDecodeError as e:
+        raise HttpError(400, f"Invalid JSON body: {e}")
+    if not isinstance(data, dict):
+        raise HttpError(400, "JSON body must be an object")
+    return data
+
+
+def _request_key(kind: str, req: Dict[str, Any]) -> str:
+    canonical = json.dumps(req, sort_keys=True, separators=(",", ":"), default=str)
+    return f"{kind}:{hashlib.sha256(canonical.encode('utf-8')).hexdigest()}"
+
+
+# --- HTTP/1.1 over asyncio streams ------------------------------------------------------------
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _version = line.decode("latin-1").strip().split(" ", 2)
+    except ValueError:
+        raise HttpError(400, "Malformed request line")
+
+    headers: Dict[str, str] = {}
+    while True:
+        h = await reader.readline()
+        if h in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = h.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get("content-length") or 0)
+    if length > _MAX_BODY:
+        raise HttpError(413, "Request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target, headers, body
+
+
+def _write_response(writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any], *, keep_alive: bool, headers: Optional[Dict[str, str]] = None) -> None:
+    data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    head = [
+        f"HTTP/1.1 {status} {_REASONS.get(status, 'Unknown')}",
+        "Content-Type: application/json",
+        f"Content-Length: {len(data)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    head.extend(f"{k}: {v}" for k, v in (headers or {}).items())
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + data)
+
+
+async def _serve_connection(service: CopilotService, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        while True:
+            try:
+                req = await _read_request(reader)
+            except HttpError as e:
+                _write_response(writer, e.status, {"error": e.message}, keep_alive=False)
+                break
+            if req is None:
+                break
+            method, target, headers, body = req
+            keep_alive = headers.get("connection", "").lower() != "close"
+            try:
+                status, payload = await service.handle(method, target, body)
+                _write_response(writer, status, payload, keep_alive=keep_alive)
+            except HttpError as e:
+                _write_response(writer, e.status, {"error": e.message}, keep_alive=keep_alive, headers=e.headers)
+            except Exception as e:
+                service.counters["errors:internal"] += 1
+                _write_response(writer, 500, {"error": f"{type(e).__name__}: {e}"}, keep_alive=keep_alive)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host: str = "127.0.0.1", port: int = 8080, *, workers: int = 4, max_pending: int = 64) -> None:
+    service = CopilotService(workers=workers, max_pending=max_pending)
+    await service.start()
+    server = await asyncio.start_server(lambda r, w: _serve_connection(service, r, w), host, port)
+    print(f"owpa API listening on http://{host}:{port} (workers={workers}, max_pending={max_pending})", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Local asyncio HTTP API for the negotiation copilot.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=4, help="Threads running graph / store work")
+    parser.add_argument("--max-pending", type=int, default=64, help="Admitted requests before 503 backpressure")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, workers=args.workers, max_pending=args.max_pending))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+Deal lifecycle operations outside the per-email round graph.
+
+  PYTHONPATH=src python -m owpa.service.deals close DEAL-DEMO-001 --settled 3.5 --outcome won
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from datetime import date, datetime
+from typing import Optional, Sequence, Tuple
+
+from owpa.config import load_config
+from owpa.data.aggregates import PortfolioAggregates
+from owpa.data.deadlines import DeadlineIndex
+from owpa.data.storage import JsonlDealStateStore, VersionConflict
+from owpa.schemas.deal_state import DealState
+from owpa.schemas.supplier_memory import NegotiationEpisode
+
+OUTCOMES = ("won", "mixed", "lost")
+
+
+def _default_trade(deal: DealState) -> Optional[str]:
+    # The top-ranked trade option of the last round, if it was recorded.
+    from owpa.agent.nodes.predict_trade import CANDIDATE_TRADES
+
+    refs = deal.metadata.get("trade_option_refs") or []
+    offers = {option_id: offer for option_id, offer, _ in CANDIDATE_TRADES}
+    return offers.get(refs[0][0]) if refs else None
+
+
+def close_deal(
+    deal_id: str,
+    *,
+    outcome: str = "mixed",
+    settled_pct: Optional[float] = None,
+    primary_trade: Optional[str] = None,
+    notes: Optional[str] = None,
+) -> Tuple[DealState, Optional[int]]:
+    """
+    Marks a deal closed (new snapshot, aggregates, deadline index) and, when SUPPLIER_MEMORY_DB_PATH
+    is set, teaches the supplier memory: one NegotiationEpisode plus an incremental movement-preference update.
+    Returns (closed deal, new supplier memory version or None).
+    """
+    from owpa.agent.nodes.predict_trade import trade_lever
+    from owpa.data.supplier_store import SupplierMemoryStore
+
+    if outcome not in OUTCOMES:
+        raise ValueError(f"outcome must be one of {OUTCOMES}")
+
+    cfg = load_config()
+    store = JsonlDealStateStore(cfg.state_store_path)
+    aggregates = PortfolioAggregates(cfg.aggregates_db_path)
+
+    deal = store.load_latest(deal_id)
+    if deal is None:
+        raise KeyError(f"Deal not found: {deal_id}")
+    if deal.metadata.get("status") == "closed":
+        raise ValueError(f"Deal {deal_id} is already closed")
+
+    ask = deal.supplier_ask
+    latest_pct = ask.headline_price_change_pct.value if ask and ask.headline_price_change_pct else None
+    opening_pct = aggregates.opening_uplift(deal_id)
+    primary_trade = primary_trade or _default_trade(deal)
+
+    base_round = deal.round_number
+    deal.round_number = base_round + 1  # closing is a new version of the deal
+    deal.last_updated_at = datetime.utcnow()
+    deal.metadata.update(
+        status="closed",
+        outcome=outcome,
+        settled_pct=settled_pct if settled_pct is not None else latest_pct,
+        closed_at=deal.last_updated_at.isoformat(),
+    )
+    try:
+        store.append_if_version(deal, base_round)
+    except VersionConflict:
+        raise ValueError(f"Deal {deal_id} changed while closing; retry") from None
+    aggregates.apply(deal)
+    DeadlineIndex(cfg.deadlines_db_path).apply(deal)  # a closed deal's deadline no longer applies
+
+    version = None
+    if cfg.supplier_memory_db_path:
+        memory = SupplierMemoryStore(cfg.supplier_memory_db_path, seed_fixture=cfg.suppliers_fixture_path)
+        supplier_id = deal.metadata.get("supplier_id") or memory.get(supplier_name=deal.supplier_name).supplier_id
+        episode = NegotiationEpisode(
+            context=f"{deal.package.value} {deal.deal_id}",
+            supplier_opening_ask_pct=opening_pct if opening_pct is not None else latest_pct,
+            settled_pct=deal.metadata["settled_pct"],
+            primary_trade_used=primary_trade,
+            outcome=outcome,  # type: ignore[arg-type]
+            notes=notes,
+            year=date.today().year,
+        )
+        version = memory.record_episode(supplier_id, episode, lever=trade_lever(primary_trade) if primary_trade else None)
+    return deal, version
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    close = sub.add_parser("close", help="Close a deal and learn from its outcome")
+    close.add_argument("deal_id")
+    close.add_argument("--outcome", choices=OUTCOMES, default="mixed")
+    close.add_argument("--settled", type=float, default=None, help="Settled uplift %% (default: last ask)")
+    close.add_argument("--trade", default=None, help="Trade that closed it (default: top option of the last round)")
+    close.add_argument("--notes", default=None)
+    args = parser.parse_args(argv)
+
+    deal, version = close_deal(
+        args.deal_id, outcome=args.outcome, settled_pct=args.settled, primary_trade=args.trade, notes=args.notes
+    )
+    print(f"Closed {deal.deal_id} ({args.outcome}, settled {deal.metadata.get('settled_pct')}%)")
+    if version is not None:
+        print(f"Supplier memory for {deal.supplier_name} updated to version {version}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,379 @@
+from __future__ import annotations
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, ContextManager, Deque, Dict, Optional, Set
+
+from owpa.agent.state import AgentState, dump_agent_state, load_agent_state
+from owpa.config import load_config
+from owpa.data.storage import JsonlDealStateStore, ensure_parent_dir, sqlite_connect
+
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Minimum seconds between job-row writes while draft tokens stream in.
+DRAFT_FLUSH_S = 0.2
+# Running jobs are touched every HEARTBEAT_S; one silent for HEARTBEAT_STALE_S has lost its owner.
+HEARTBEAT_S = 10.0
+HEARTBEAT_STALE_S = 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id      TEXT PRIMARY KEY,
+    deal_id     TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    inputs      TEXT NOT NULL,
+    progress    TEXT,
+    result      TEXT,
+    error       TEXT,
+    created_at  REAL NOT NULL,
+    started_at  REAL,
+    finished_at REAL,
+    owner       TEXT,               -- host:pid of the process running it
+    heartbeat   REAL,
+    start_round INTEGER             -- the deal's stored round when the job was claimed
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, created_at);
+"""
+
+# Added after the first release; ALTERed into older job tables.
+_LATE_COLUMNS = {"owner": "TEXT", "heartbeat": "REAL", "start_round": "INTEGER"}
+
+
+def process_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def owner_alive(owner: Optional[str], heartbeat: Optional[float], now: Optional[float] = None) -> bool:
+    """
+    False once the heartbeat is stale, or the owner is a process on this host that has exited.
+    """
+    if not owner or heartbeat is None or (time.time() if now is None else now) - heartbeat > HEARTBEAT_STALE_S:
+        return False
+    host, _, pid = owner.rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+@dataclass
+class JobRecord:
+    job_id: str
+    deal_id: str
+    status: str
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    progress: Dict[str, Any] = field(default_factory=dict)  # {"nodes": [[node, ms], ...], "state": {...}, "draft": "..."}
+    result: Optional[Dict[str, Any]] = None                # dump_agent_state of the final state
+    error: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    def result_state(self) -> Optional[AgentState]:
+        return load_agent_state(self.result) if self.result is not None else None
+
+    def partial_state(self) -> Optional[AgentState]:
+        partial = self.progress.get("state")
+        return load_agent_state(partial) if partial else None
+
+
+class JobStore:
+    """
+    SQLite job table. Every call opens its own connection, so the store is safe to share
+    across worker threads and across processes pointing at the same file.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path).expanduser().resolve()
+        ensure_parent_dir(self.path)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            have = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for name, kind in _LATE_COLUMNS.items():
+                if name not in have:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {kind}")
+
+    def _connect(self) -> ContextManager[sqlite3.Connection]:
+        return sqlite_connect(self.path)
+
+    def create(self, deal_id: str, inputs: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, deal_id, status, inputs, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, deal_id, QUEUED, json.dumps(inputs, ensure_ascii=False), time.time()),
+            )
+        return job_id
+
+    def inputs(self, job_id: str) -> Dict[str, Any]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT inputs FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"Job not found: {job_id}")
+        return json.loads(row[0])
+
+    def claim(self, job_id: str, owner: str, start_round: Optional[int]) -> bool:
+        """
+        Moves a queued job to running under `owner`. False when another executor claimed it first.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, owner = ?, heartbeat = ?, start_round = ? "
+                "WHERE job_id = ? AND status = ?",
+                (RUNNING, now, owner, now, start_round, job_id, QUEUED),
+            )
+        return cur.rowcount == 1
+
+    def heartbeat(self, owner: str) -> None:
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET heartbeat = ? WHERE owner = ? AND status = ?", (time.time(), owner, RUNNING))
+
+    def requeue(self, job_id: str, owner: Optional[str], heartbeat: Optional[float]) -> bool:
+        """
+        Puts an orphaned running job back in the queue, unless its owner wrote a heartbeat meanwhile.
+        """
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = ?, owner = NULL, heartbeat = NULL, start_round = NULL "
+                "WHERE job_id = ? AND status = ? AND owner IS ? AND heartbeat IS ?",
+                (QUEUED, job_id, RUNNING, owner, heartbeat),
+            )
+        return cur.rowcount == 1
+
+    def set_progress(self, job_id: str, progress: Dict[str, Any]) -> None:
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET progress = ? WHERE job_id = ?", (json.dumps(progress, ensure_ascii=False), job_id))
+
+    def mark_done(self, job_id: str, result: Dict[str, Any]) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, finished_at = ? WHERE job_id = ?",
+                (DONE, json.dumps(result, ensure_ascii=False), time.time(), job_id),
+            )
+
+    def mark_failed(self, job_id: str, error: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE job_id = ?",
+                (FAILED, error, time.time(), job_id),
+            )
+
+    def get(self, job_id: str) -> Optional[JobRecord]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT job_id, deal_id, status, created_at, started_at, finished_at, progress, result, error "
+                "FROM jobs WHERE job_id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return JobRecord(
+            job_id=row[0],
+            deal_id=row[1],
+            status=row[2],
+            created_at=row[3],
+            started_at=row[4],
+            finished_at=row[5],
+            progress=json.loads(row[6]) if row[6] else {},
+            result=json.loads(row[7]) if row[7] else None,
+            error=row[8],
+        )
+
+    def unfinished(self) -> list[tuple[str, str, str, Optional[str], Optional[float], Optional[int]]]:
+        """
+        (job_id, deal_id, status, owner, heartbeat, start_round) of queued/running jobs in submission order.
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT job_id, deal_id, status, owner, heartbeat, start_round FROM jobs "
+                "WHERE status IN (?, ?) ORDER BY created_at",
+                (QUEUED, RUNNING),
+            ).fetchall()
+        return [tuple(r) for r in rows]
+
+
+class JobExecutor:
+    """
+    In-process executor for negotiation rounds.
+    - global concurrency cap: a thread pool of `max_workers`
+    - per-deal serialization: at most one running job per deal_id, the rest wait in FIFO order
+    - durability: inputs, per-node progress and results live in the SQLite job table, so callers
+      poll by job id and results survive UI reruns
+    - recovery: on start-up, queued jobs are picked up (claiming is atomic, so a job another live
+      executor also queued runs once) and running jobs are re-queued only when their owner is gone;
+      one whose round was already stored is completed from the state store instead of re-run
+    """
+
+    def __init__(self, store: JobStore, *, max_workers: int = 4, graph_factory: Optional[Callable[[], Any]] = None):
+        self.store = store
+        self._graph_factory = graph_factory
+        self._graph = None
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="owpa-job")
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Deque[str]] = {}
+        self._active: Set[str] = set()
+        self.owner = process_owner()
+        self._stopped = threading.Event()
+
+        self._recover()
+        threading.Thread(target=self._beat, name="owpa-job-heartbeat", daemon=True).start()
+
+    def _state_store(self) -> JsonlDealStateStore:
+        return JsonlDealStateStore(load_config().state_store_path)
+
+    def _recover(self) -> None:
+        for job_id, deal_id, status, owner, heartbeat, start_round in self.store.unfinished():
+            if status == RUNNING:
+                if owner_alive(owner, heartbeat):
+                    continue
+                stored = self._state_store().current_version(deal_id)
+                if start_round is not None and stored is not None and stored > start_round:
+                    # Died after persist_state committed: re-running would store the round twice.
+                    self._complete_from_store(job_id, deal_id, stored)
+                    continue
+                if not self.store.requeue(job_id, owner, heartbeat):
+                    continue
+            self._enqueue(job_id, deal_id)
+
+    def _complete_from_store(self, job_id: str, deal_id: str, stored: int) -> None:
+        rec = self.store.get(job_id)
+        state: Dict[str, Any] = dict(load_agent_state(self.store.inputs(job_id)))
+        state.update(rec.partial_state() or {})
+        state["deal_state"] = self._state_store().load_latest(deal_id)
+        self.store.set_progress(job_id, {**rec.progress, "recovered": f"round {stored} was already stored; not re-run"})
+        self.store.mark_done(job_id, dump_agent_state(state))
+
+    def _beat(self) -> None:
+        while not self._stopped.wait(HEARTBEAT_S):
+            try:
+                self.store.heartbeat(self.owner)
+            except sqlite3.Error:
+                pass  # next beat retries; a job only looks orphaned after HEARTBEAT_STALE_S
+
+    def _get_graph(self):
+        with self._lock:
+            if self._graph is None:
+                if self._graph_factory is None:
+                    from owpa.agent.graph import build_graph
+
+                    self._graph_factory = build_graph
+                self._graph = self._graph_factory()
+            return self._graph
+
+    def reset_graph(self) -> None:
+        """
+        Rebuild the graph for the next job (jobs already running keep the graph they started with).
+        """
+        with self._lock:
+            self._graph = None
+
+    def submit(self, state: AgentState) -> str:
+        """
+        Queues one round (email_text, supplier_email_subject, deal_state) and returns its job id.
+        """
+        deal_id = state["deal_state"].deal_id
+        job_id = self.store.create(deal_id, dump_agent_state(state))
+        self._enqueue(job_id, deal_id)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[JobRecord]:
+        return self.store.get(job_id)
+
+    def wait(self, job_id: str, *, timeout: Optional[float] = None, poll: float = 0.05) -> JobRecord:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            rec = self.store.get(job_id)
+            if rec is None:
+                raise KeyError(f"Job not found: {job_id}")
+            if rec.finished:
+                return rec
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"Job {job_id} still {rec.status} after {timeout}s")
+            time.sleep(poll)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
+        self._stopped.set()
+
+    def _enqueue(self, job_id: str, deal_id: str) -> None:
+        with self._lock:
+            self._pending.setdefault(deal_id, deque()).append(job_id)
+            self._dispatch_locked(deal_id)
+
+    def _dispatch_locked(self, deal_id: str) -> None:
+        if deal_id in self._active:
+            return
+        queue = self._pending.get(deal_id)
+        if not queue:
+            self._pending.pop(deal_id, None)
+            return
+        job_id = queue.popleft()
+        self._active.add(deal_id)
+        self._pool.submit(self._run, job_id, deal_id)
+
+    def _run(self, job_id: str, deal_id: str) -> None:
+        from owpa.agent.graph import stream_round
+        from owpa.agent.ratelimit import llm_scope
+
+        try:
+            if not self.store.claim(job_id, self.owner, self._state_store().current_version(deal_id)):
+                return
+            inputs = load_agent_state(self.store.inputs(job_id))
+            progress: Dict[str, Any] = {"nodes": [], "state": {}}
+            draft = {"text": "", "flushed": 0.0}
+
+            def on_custom(event: Any) -> None:
+                # Streamed draft tokens: buffered, flushed to the job row at most every DRAFT_FLUSH_S.
+                if not isinstance(event, dict):
+                    return
+                if event.get("draft_reset"):
+                    draft["text"] = ""
+                draft["text"] += event.get("draft_delta", "")
+                if "draft_ttft_ms" in event:
+                    progress["draft_ttft_ms"] = event["draft_ttft_ms"]
+                now = time.monotonic()
+                if now - draft["flushed"] >= DRAFT_FLUSH_S or event.get("draft_reset"):
+                    draft["flushed"] = now
+                    progress["draft"] = draft["text"]
+                    self.store.set_progress(job_id, progress)
+
+            state: Dict[str, Any] = dict(inputs)
+            # UI rounds: interactive class, ahead of batch in the shared LLM rate limiter.
+            with llm_scope("interactive", deal_id):
+                for node, state, elapsed_ms in stream_round(self._get_graph(), inputs, on_custom=on_custom):
+                    progress["nodes"].append([node, elapsed_ms])
+                    # Only what the UI previews while a round runs (intent, facts, trade options, draft so far).
+                    partial = {k: state[k] for k in ("deal_state", "trade_options") if k in state}
+                    progress["state"] = dump_agent_state(partial)
+                    progress["draft"] = draft["text"]
+                    self.store.set_progress(job_id, progress)
+            self.store.mark_done(job_id, dump_agent_state(state))
+        except Exception as e:
+            self.store.mark_failed(job_id, f"{type(e).__name__}: {e}")
+        finally:
+            with self._lock:
+                self._active.discard(deal_id)
+                self._dispatch_locked(deal_id)
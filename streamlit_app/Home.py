@@ -1,21 +1,30 @@
 from __future__ import annotations
 
 import os
+import time
 import streamlit as st
 
 from owpa.config import load_config
-from owpa.data.loader import load_deal_state, load_suppliers_fixture
-from owpa.agent.graph import build_graph
+from owpa.agent.utils import set_llm_client, use_llm
+from owpa.service.jobs import FAILED
 
+from components.outputs_view import RoundProgressView, render_timings_md
 from components.supplier_memory_panel import render_supplier_memory_panel
+from utils.caching import (
+    cached_deal_state,
+    cached_supplier_names,
+    cached_text,
+    get_job_executor,
+    get_llm_client,
+    invalidate_caches,
+)
 
 st.set_page_config(page_title="Procurement Supplier Negotiation Copilot", layout="wide")
 
 # Load global styles
 def _inject_css(path: str) -> None:
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+        st.markdown(f"<style>{cached_text(path)}</style>", unsafe_allow_html=True)
     except Exception:
         # Fail silently if style file not found
         pass
@@ -23,6 +32,7 @@ def _inject_css(path: str) -> None:
 _inject_css("streamlit_app/assets/style.css")
 
 cfg = load_config()
+executor = get_job_executor()
 
 st.title("Procurement Supplier Negotiation Copilot")
 st.caption("WTG = Wind Turbine Generator • LTSA = Long-Term Service Agreement • LDs = Liquidated Damages")
@@ -45,10 +55,8 @@ with st.sidebar:
 
     # Supplier selection (dropdown from fixtures, with robust fallback)
     try:
-        _suppliers = load_suppliers_fixture(cfg.suppliers_fixture_path)
-        _supplier_names = [s.name for s in _suppliers]
+        _supplier_names = cached_supplier_names(cfg.suppliers_fixture_path)
     except Exception:
-        _suppliers = []
         _supplier_names = []
 
     if _supplier_names:
@@ -80,13 +88,16 @@ with st.sidebar:
     st.divider()
     st.write("Config (from .env)")
     st.code(
-        f"USE_LLM={os.getenv('USE_LLM', 'true')}\nOPENAI_MODEL={cfg.openai_model}",
+        f"USE_LLM={os.getenv('USE_LLM', 'true')}\nOPENAI_MODEL={cfg.openai_model}\nDRAFT_MODE={cfg.draft_mode}",
         language="text"
     )
+    if st.button("Reload fixtures & graph", use_container_width=True, help="Clear cached fixtures, compiled graph and LLM client"):
+        invalidate_caches()
+        st.rerun()
 
 # Load base DealState and override supplier for demo flexibility
 sample_path = os.getenv("SAMPLE_DEAL_STATE_PATH", "./data/fixtures/sample_deal_state.json")
-deal = load_deal_state(sample_path)
+deal = cached_deal_state(sample_path)
 deal.supplier_name = supplier_name
 
 # Layout: split main area → left = results tabs, right = supplier memory
@@ -103,24 +114,52 @@ if run:
         st.error("Please paste a supplier email before running.")
         st.stop()
 
-    graph = build_graph()
+    if use_llm():
+        set_llm_client(get_llm_client())
 
-    result = graph.invoke({
+    # Rounds run on the background executor; the job id survives reruns and browser refreshes (query param).
+    job_id = executor.submit({
         "email_text": email_text,
         "supplier_email_subject": subject,
         "deal_state": deal
     })
-
-    st.session_state["coach_notes"] = result.get("coach_notes")
-    st.session_state["email_draft"] = result.get("email_draft")
-    st.session_state["updated_deal_state"] = result.get("deal_state")
-    st.session_state["supplier_memory"] = result.get("supplier_memory")
-    supplier_loaded = st.session_state["supplier_memory"]
-    coach = st.session_state["coach_notes"]
-    draft = st.session_state["email_draft"]
-    updated_deal = st.session_state["updated_deal_state"]
-
-    st.session_state["has_results"] = True
+    st.session_state["job_id"] = job_id
+    st.query_params["job"] = job_id
+
+job_id = st.session_state.get("job_id") or st.query_params.get("job")
+if job_id and st.session_state.get("collected_job") != job_id:
+    job = executor.get(job_id)
+    if job is None:
+        st.session_state["job_id"] = None
+    elif not job.finished:
+        # Per-node progress recorded by the worker: intent / facts / trade options as soon as their node is done
+        progress = RoundProgressView(left_main)
+        partial = job.partial_state() or {}
+        for node, elapsed_ms in job.progress.get("nodes", []):
+            progress.node_done(node, partial, elapsed_ms)
+        if job.progress.get("draft"):
+            progress.draft_preview(job.progress["draft"], job.progress.get("draft_ttft_ms"))
+        time.sleep(0.25 if job.progress.get("draft") else 0.4)
+        st.rerun()
+    elif job.status == FAILED:
+        st.session_state["collected_job"] = job_id
+        with left_main:
+            st.error(f"Round failed: {job.error}")
+    else:
+        result = job.result_state() or {}
+        st.session_state["collected_job"] = job_id
+        st.session_state["node_timings"] = [tuple(x) for x in job.progress.get("nodes", [])]
+        st.session_state["draft_ttft_ms"] = job.progress.get("draft_ttft_ms")
+        st.session_state["coach_notes"] = result.get("coach_notes")
+        st.session_state["email_draft"] = result.get("email_draft")
+        st.session_state["updated_deal_state"] = result.get("deal_state")
+        st.session_state["supplier_memory"] = result.get("supplier_memory")
+        supplier_loaded = st.session_state["supplier_memory"]
+        coach = st.session_state["coach_notes"]
+        draft = st.session_state["email_draft"]
+        updated_deal = st.session_state["updated_deal_state"]
+
+        st.session_state["has_results"] = True
 
 # Always render last results if available (persists across reruns)
 with left_main:
@@ -167,6 +206,12 @@ with left_main:
 
         # Removed 'Updated DealState' tab per UX request
 
+        if st.session_state.get("node_timings"):
+            with st.expander("Last round timings (per node)", expanded=False):
+                st.markdown(render_timings_md(st.session_state["node_timings"]))
+                if st.session_state.get("draft_ttft_ms") is not None:
+                    st.caption(f"Email draft time to first token: {st.session_state['draft_ttft_ms']:,.0f} ms")
+
 with right:
     # If we haven't run yet, we can still show an "empty" panel.
     render_supplier_memory_panel(st.session_state.get("supplier_memory"))
\ No newline at end of file
@@ -1 +1,74 @@
+from __future__ import annotations
 
+from typing import Any, Dict, List, Optional, Tuple
+
+import streamlit as st
+
+
+NODE_LABELS = {
+    "ingest": "Ingest email",
+    "classify": "Classify intent",
+    "extract": "Extract facts",
+    "load_memory": "Load supplier memory",
+    "predict_trade": "Predict trade options",
+    "coach": "Coach notes",
+    "draft_email": "Draft email",
+    "persist_state": "Persist deal state",
+}
+
+
+def _ask_facts(ask) -> List[str]:
+    facts = []
+    if ask.headline_price_change_pct:
+        facts.append(f"Requested uplift: {ask.headline_price_change_pct.value:.1f}%")
+    if ask.deadline:
+        facts.append(f"Deadline signal: {ask.deadline.isoformat()}")
+    if ask.requested_trades:
+        facts.append("Requested trades/terms: " + "; ".join(ask.requested_trades))
+    return facts
+
+
+class RoundProgressView:
+    """
+    Live view of a running round: one status line per finished node plus early insights
+    (intent after classify, facts after extract, trade options after predict_trade) and the
+    email draft while it streams in.
+    """
+
+    def __init__(self, container):
+        with container:
+            self._status = st.status("Running negotiation round…", expanded=True)
+            with self._status:
+                self._timings = st.empty()
+            self._intent = st.empty()
+            self._facts = st.empty()
+            self._options = st.empty()
+            self._draft = st.empty()
+        self.timings: List[Tuple[str, float]] = []
+
+    def node_done(self, node: str, state: Dict[str, Any], elapsed_ms: float) -> None:
+        self.timings.append((node, elapsed_ms))
+        self._timings.markdown(render_timings_md(self.timings))
+        self._status.update(label=f"Running negotiation round… {NODE_LABELS.get(node, node)} done")
+
+        ask = state["deal_state"].supplier_ask
+        if node == "classify" and ask:
+            self._intent.info(f"**Detected intent:** {ask.intent.value.replace('_', ' ')}" + (f" — {ask.reason}" if ask.reason else ""))
+        elif node == "extract" and ask:
+            facts = _ask_facts(ask)
+            self._facts.markdown("**Extracted facts**\n" + ("\n".join(f"- {x}" for x in facts) or "- (none)"))
+        elif node == "predict_trade":
+            opts = state.get("trade_options") or []
+            lines = [f"- {o.we_offer} → {o.we_request} (p={o.predicted_acceptance:.2f})" for o in opts]
+            self._options.markdown("**Trade options**\n" + ("\n".join(lines) or "- (none)"))
+
+
+    def draft_preview(self, text: str, ttft_ms: Optional[float] = None) -> None:
+        caption = f" (first token after {ttft_ms:,.0f} ms)" if ttft_ms is not None else ""
+        with self._draft.container():
+            st.markdown(f"**Email draft — streaming…**{caption}")
+            st.text(text + " ▌")
+
+
+def render_timings_md(timings: List[Tuple[str, float]]) -> str:
+    return "\n".join(f"- ✅ {NODE_LABELS.get(node, node)} — {ms:,.0f} ms" for node, ms in timings)
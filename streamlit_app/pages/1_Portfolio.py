@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import time
+from datetime import timedelta
+
+import streamlit as st
+
+from owpa.config import load_config
+from owpa.data.aggregates import KEY_COLUMNS, PortfolioAggregates
+from owpa.data.deadlines import DeadlineIndex
+
+st.set_page_config(page_title="Portfolio overview", layout="wide")
+
+cfg = load_config()
+agg = PortfolioAggregates(cfg.aggregates_db_path)
+
+st.title("Portfolio overview")
+st.caption(
+    "Materialized aggregates updated on every persisted round (no state store scan). "
+    "Rebuild with `python -m owpa.data.aggregates rebuild` after changing the playbook thresholds."
+)
+
+with st.sidebar:
+    st.header("View")
+    group_by = st.multiselect("Group by", list(KEY_COLUMNS), default=["supplier", "intent"])
+    packages = [r["package"] for r in agg.summary(group_by=("package",))]
+    package = st.selectbox("Package", ["(all)"] + packages)
+
+filters = {} if package == "(all)" else {"package": package}
+totals = agg.summary(group_by=(), **filters)
+
+if not totals:
+    st.info("No rounds persisted yet. Run a negotiation round or rebuild the aggregates from the state store.")
+    st.stop()
+
+t = totals[0]
+c1, c2, c3, c4 = st.columns(4)
+c1.metric("Open deals", t["open_deals"])
+c2.metric("Avg requested uplift (open)", f"{t['avg_requested_pct']:.1f}%" if t["avg_requested_pct"] is not None else "–")
+c3.metric("Avg settled uplift (closed)", f"{t['avg_settled_pct']:.1f}%" if t["avg_settled_pct"] is not None else "–")
+c4.metric("Approval threshold breaches", t["approval_breaches"])
+
+columns = list(group_by) + [
+    "deals",
+    "open_deals",
+    "closed_deals",
+    "avg_opening_pct",
+    "avg_requested_pct",
+    "avg_settled_pct",
+    "approval_breaches",
+    "rounds",
+]
+rows = agg.summary(group_by=group_by, **filters) if group_by else totals
+st.dataframe([{k: r[k] for k in columns} for r in rows], use_container_width=True, hide_index=True)
+
+st.subheader("Supplier deadlines")
+st.caption("Open deals' latest supplier deadlines from the deadline index (overdue first).")
+hours = st.slider("Horizon (hours)", min_value=6, max_value=24 * 14, value=48, step=6)
+now = time.time()
+deadlines = DeadlineIndex(cfg.deadlines_db_path).upcoming(timedelta(hours=hours), now=now)
+if deadlines:
+    st.dataframe(
+        [
+            {
+                "deadline": d.deadline.isoformat() if d.deadline else None,
+                "hours_left": d.hours_left(now),
+                "deal_id": d.deal_id,
+                "supplier": d.supplier,
+                "intent": d.intent,
+                "round": d.round_number,
+            }
+            for d in deadlines
+        ],
+        use_container_width=True,
+        hide_index=True,
+    )
+else:
+    st.write(f"No supplier deadlines in the next {hours} hours.")
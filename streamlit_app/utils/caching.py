@@ -1 +1,85 @@
+from __future__ import annotations
 
+import os
+from pathlib import Path
+from typing import List
+
+import streamlit as st
+
+from owpa.agent.utils import new_llm_client
+from owpa.config import load_config
+from owpa.data.loader import load_deal_state, load_suppliers_fixture
+from owpa.schemas.deal_state import DealState
+from owpa.service.jobs import JobExecutor, JobStore
+
+
+def _mtime(path: str | Path) -> int:
+    # Cache key component: a stat() per rerun instead of a read + parse + validate.
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return -1
+
+
+@st.cache_resource(show_spinner=False)
+def get_llm_client():
+    """
+    One OpenAI client per server process (connection pool reused across rounds).
+    """
+    return new_llm_client()
+
+
+@st.cache_resource(show_spinner=False)
+def get_job_executor() -> JobExecutor:
+    """
+    Process-wide round executor shared by all sessions (global concurrency cap + per-deal ordering).
+    It also owns the compiled graph, built once on first use. invalidate_caches() only resets
+    that graph; the executor itself is kept so in-flight rounds keep running.
+    """
+    cfg = load_config()
+    return JobExecutor(JobStore(cfg.jobs_db_path), max_workers=cfg.job_workers)
+
+
+@st.cache_data(show_spinner=False)
+def _supplier_names(path: str, mtime: int) -> List[str]:
+    return [s.name for s in load_suppliers_fixture(path)]
+
+
+@st.cache_data(show_spinner=False)
+def _deal_state(path: str, mtime: int) -> DealState:
+    return load_deal_state(path)
+
+
+@st.cache_data(show_spinner=False)
+def _text(path: str, mtime: int) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def cached_supplier_names(path: str | Path) -> List[str]:
+    """
+    Names for the supplier selectbox (cheaper to copy out of the cache than full SupplierMemory objects).
+    """
+    return _supplier_names(str(path), _mtime(path))
+
+
+def cached_deal_state(path: str | Path) -> DealState:
+    """
+    Base DealState fixture (fresh copy per call; safe to mutate for the current round).
+    """
+    return _deal_state(str(path), _mtime(path))
+
+
+def cached_text(path: str | Path) -> str:
+    return _text(str(path), _mtime(path))
+
+
+def invalidate_caches() -> None:
+    """
+    Drops cached fixtures, the compiled graph and the LLM client; the next rerun rebuilds them.
+    """
+    _supplier_names.clear()
+    _deal_state.clear()
+    _text.clear()
+    get_job_executor().reset_graph()
+    get_llm_client.clear()
@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from owpa.config import isolated_env
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+@pytest.fixture
+def offline_env(monkeypatch, tmp_path):
+    monkeypatch.chdir(ROOT)
+    monkeypatch.setenv("USE_LLM", "true")
+    monkeypatch.setenv("OWPA_LLM_CASSETTE_MODE", "replay")
+    monkeypatch.setenv("OWPA_LLM_CASSETTE_DIR", str(ROOT / "data" / "cassettes"))
+    for name, value in isolated_env(tmp_path).items():
+        monkeypatch.setenv(name, value)
+    return tmp_path
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from owpa.agent.nodes.persist_state import persist_state_node
+from owpa.data.aggregates import PortfolioAggregates
+from owpa.data.loader import load_deal_state
+from owpa.data.storage import JsonlDealStateStore
+from owpa.schemas.deal_state import IntentType, Percentage, SupplierAsk
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_portfolio_aggregates_follow_rounds_and_match_rebuild(offline_env) -> None:
+    playbook = {"policy_thresholds": {"price_uplift_pct_requires_internal_approval": 5.0}}
+
+    def persist(deal_id: str, pct: float, status: str = "open") -> None:
+        deal = JsonlDealStateStore(offline_env / "state_store.jsonl").load_latest(deal_id)
+        if deal is None:
+            deal = load_deal_state(ROOT / "data" / "fixtures" / "sample_deal_state.json")
+            deal.deal_id = deal_id
+        deal.supplier_ask = SupplierAsk(intent=IntentType.PRICE_INCREASE_REQUEST, headline_price_change_pct=Percentage(value=pct))
+        deal.metadata["status"] = status
+        persist_state_node({"deal_state": deal, "playbook": playbook})
+
+    persist("A", 9.0)
+    persist("B", 4.0)
+    persist("A", 6.0)
+    persist("C", 8.0)
+    persist("C", 3.5, status="closed")
+
+    agg = PortfolioAggregates(offline_env / "aggregates.sqlite")
+    [row] = agg.summary(group_by=("package",))
+    assert (row["deals"], row["open_deals"], row["closed_deals"], row["rounds"]) == (3, 2, 1, 5)
+    assert row["avg_requested_pct"] == 5.0   # A: 6, B: 4
+    assert row["avg_opening_pct"] == 6.5     # A: 9, B: 4
+    assert row["avg_settled_pct"] == 3.5
+    assert row["approval_breaches"] == 1
+
+    incremental = agg.summary(group_by=("package", "supplier", "intent", "month"))
+    agg.rebuild(JsonlDealStateStore(offline_env / "state_store.jsonl"), threshold=5.0)
+    assert agg.summary(group_by=("package", "supplier", "intent", "month")) == incremental
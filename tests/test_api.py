@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from owpa.service.api import CopilotService, HttpError
+
+
+def test_api_coalesces_identical_rounds_and_rejects_when_full(offline_env, monkeypatch) -> None:
+    monkeypatch.setenv("USE_LLM", "false")
+    calls = []
+    release = threading.Event()
+
+    class SlowGraph:
+        def invoke(self, inputs):
+            calls.append(inputs["email_text"])
+            release.wait(5)
+            return dict(inputs)
+
+    async def scenario():
+        service = CopilotService(workers=2, max_pending=2, graph=SlowGraph())
+        await service.start()
+        req = {"deal_id": "D1", "supplier_name": "Battila Turbines", "email_text": "We require a 9% increase."}
+        try:
+            same = [asyncio.create_task(service.run_round(dict(req))) for _ in range(3)]
+            other = asyncio.create_task(service.run_round({**req, "email_text": "Second round."}))
+            await asyncio.sleep(0.1)
+            with pytest.raises(HttpError) as busy:
+                await service.run_round({**req, "deal_id": "D2"})
+            release.set()
+            results = await asyncio.gather(*same, other)
+        finally:
+            await service.stop()
+        return service, busy.value, results
+
+    service, busy, results = asyncio.run(scenario())
+
+    assert busy.status == 503
+    assert calls == ["We require a 9% increase.", "Second round."]  # coalesced, then in arrival order
+    assert results[0] == results[1] == results[2]
+    assert service.counters["coalesced"] == 2
+
+
+def test_rounds_for_one_deal_never_overlap(offline_env, monkeypatch) -> None:
+    monkeypatch.setenv("USE_LLM", "false")
+    guard = threading.Lock()
+    active, peak, order = [0], [0], []
+
+    class TimedGraph:
+        def invoke(self, inputs):
+            with guard:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+                order.append(inputs["email_text"])
+            time.sleep(0.05)
+            with guard:
+                active[0] -= 1
+            return dict(inputs)
+
+    async def scenario():
+        service = CopilotService(workers=4, max_pending=16, graph=TimedGraph())
+        await service.start()
+        try:
+            tasks = []
+            # Staggered arrivals: later requests come in while earlier ones wait for, or release, the deal lock.
+            for i in range(6):
+                req = {"deal_id": "D1", "supplier_name": "Battila Turbines", "email_text": f"Round {i}."}
+                tasks.append(asyncio.create_task(service.run_round(req)))
+                await asyncio.sleep(0.03)
+            await asyncio.gather(*tasks)
+        finally:
+            await service.stop()
+        return service
+
+    service = asyncio.run(scenario())
+
+    assert peak[0] == 1
+    assert order == [f"Round {i}." for i in range(6)]
+    assert service._deal_locks == {} and not service._deal_users
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import functools
+import sqlite3
+from collections import Counter
+
+import pytest
+
+from owpa.agent.batch import BatchItem, run_batch
+from owpa.agent.checkpoint import FINAL_NODE, NodeCheckpointer, checkpointed_node
+from owpa.data.storage import JsonlDealStateStore
+
+
+class Crash(BaseException):
+    # Not an Exception: escapes the runner's retries the way a killed process would.
+    pass
+
+
+class StubGraph:
+    """
+    ingest -> draft -> persist_state, checkpointed like the real graph. `fail` maps
+    (deal_id, node) to how many more times that node raises; `crash_after_persist` kills
+    the run once that deal's round is stored.
+    """
+
+    def __init__(self, checkpointer: NodeCheckpointer, store: JsonlDealStateStore, fail=None, crash_after_persist=None):
+        self.store = store
+        self.fail = Counter(fail or {})
+        self.crash_after_persist = crash_after_persist
+        self.calls: Counter = Counter()
+        self.nodes = [checkpointed_node(n, functools.partial(self._node, n), checkpointer) for n in ("ingest", "draft", FINAL_NODE)]
+
+    def _node(self, name, state):
+        deal = state["deal_state"]
+        self.calls[(deal.deal_id, deal.round_number, name)] += 1
+        if self.fail[(deal.deal_id, name)] > 0:
+            self.fail[(deal.deal_id, name)] -= 1
+            raise TimeoutError(f"{name} timed out")
+        state = {**state, name: "ok"}
+        if name == FINAL_NODE:
+            state["deal_state"] = deal.model_copy(update={"round_number": deal.round_number + 1})
+            self.store.append(state["deal_state"])
+            if deal.deal_id == self.crash_after_persist:
+                raise Crash()
+        return state
+
+    def invoke(self, inputs):
+        state = dict(inputs)
+        for node in self.nodes:
+            state = node(state)
+        return state
+
+
+def _items():
+    lines = [("DEAL-A", "first"), ("DEAL-A", "second"), ("DEAL-A", "third"), ("DEAL-B", "only")]
+    return [BatchItem(index=i, deal_id=d, email_text=f"{d} {text} email", subject=text, supplier_name="Battila Turbines") for i, (d, text) in enumerate(lines)]
+
+
+def _ledger(db) -> dict:
+    with sqlite3.connect(db) as conn:
+        rows = conn.execute("SELECT item, status, start_round, attempts FROM batch_items WHERE batch_id = 'b1'").fetchall()
+    return {item: (status, start_round, attempts) for item, status, start_round, attempts in rows}
+
+
+def test_failed_line_is_retried_resumed_and_stops_its_deal(offline_env) -> None:
+    db = offline_env / "checkpoints.sqlite"
+    store = JsonlDealStateStore(offline_env / "state_store.jsonl")
+    graph = StubGraph(NodeCheckpointer(db), store, fail={("DEAL-A", "draft"): 2})
+
+    results = run_batch(_items(), batch_id="b1", workers=2, retries=1, checkpoint_db=db, graph=graph)
+
+    assert [r.status for r in results] == ["failed", "skipped", "skipped", "done"]
+    assert results[0].attempts == 2 and results[0].resumed_nodes == ["ingest"] and "draft timed out" in results[0].error
+    assert results[1].error == "line 0 failed"
+    assert graph.calls[("DEAL-A", 0, "ingest")] == 1  # the retry replayed it from the checkpoint
+    assert graph.calls[("DEAL-A", 0, "draft")] == 2
+    assert _ledger(db) == {0: ("failed", 0, 2), 3: ("done", None, 1)}
+
+    # Re-running the same batch: line 0 resumes at draft, the later lines run, DEAL-B is not repeated.
+    results = run_batch(_items(), batch_id="b1", workers=2, retries=1, checkpoint_db=db, graph=graph)
+
+    assert [r.status for r in results] == ["done"] * 4
+    assert results[0].resumed_nodes == ["ingest"] and [r.round_number for r in results[:3]] == [1, 2, 3]
+    assert graph.calls[("DEAL-A", 0, "ingest")] == 1 and graph.calls[("DEAL-A", 0, "draft")] == 3
+    assert sum(n for (deal, _, _), n in graph.calls.items() if deal == "DEAL-B") == 3
+    assert [(d.deal_id, d.round_number) for d in store.iter_latest()] == [("DEAL-B", 1), ("DEAL-A", 3)]
+
+    calls = dict(graph.calls)
+    assert [r.status for r in run_batch(_items(), batch_id="b1", checkpoint_db=db, graph=graph)] == ["done"] * 4
+    assert dict(graph.calls) == calls
+    assert len(list(store.iter_records())) == 4
+
+
+def test_round_stored_before_a_crash_is_not_run_again(offline_env) -> None:
+    db = offline_env / "checkpoints.sqlite"
+    store = JsonlDealStateStore(offline_env / "state_store.jsonl")
+    items = [item for item in _items() if item.deal_id == "DEAL-B"]
+
+    with pytest.raises(Crash):
+        run_batch(items, batch_id="b1", checkpoint_db=db, graph=StubGraph(NodeCheckpointer(db), store, crash_after_persist="DEAL-B"))
+    assert _ledger(db) == {3: ("running", 0, 0)}  # persisted, but the ledger never caught up
+
+    graph = StubGraph(NodeCheckpointer(db), store)
+    [result] = run_batch(items, batch_id="b1", checkpoint_db=db, graph=graph)
+
+    assert (result.status, result.round_number) == ("done", 1)
+    assert not graph.calls
+    assert _ledger(db)[3][0] == "done"
+    assert len(list(store.iter_records())) == 1
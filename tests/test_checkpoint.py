@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from owpa.agent import graph as graph_mod
+from owpa.agent.checkpoint import NodeCheckpointer, thread_id
+from owpa.data.loader import load_deal_state
+from owpa.data.storage import JsonlDealStateStore
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_failed_round_resumes_from_last_checkpointed_node(offline_env, monkeypatch) -> None:
+    monkeypatch.setenv("USE_LLM", "false")
+    calls = {"classify": 0, "coach": 0}
+    nodes = dict(graph_mod.NODES)
+
+    def counting_classify(state):
+        calls["classify"] += 1
+        return nodes["classify"](state)
+
+    def flaky_coach(state):
+        calls["coach"] += 1
+        if calls["coach"] == 1:
+            raise TimeoutError("llm timed out")
+        return nodes["coach"](state)
+
+    patched = [(n, {"classify": counting_classify, "coach": flaky_coach}.get(n, fn)) for n, fn in graph_mod.NODES]
+    monkeypatch.setattr(graph_mod, "NODES", patched)
+    checkpointer = NodeCheckpointer(offline_env / "checkpoints.sqlite")
+    graph = graph_mod.build_graph(checkpointer=checkpointer)
+
+    def inputs():
+        deal = load_deal_state(ROOT / "data" / "fixtures" / "sample_deal_state.json")
+        return {"email_text": "We require a 9% increase.", "supplier_email_subject": "Uplift", "deal_state": deal}
+
+    with pytest.raises(TimeoutError):
+        graph.invoke(inputs())
+    completed = checkpointer.completed_nodes(thread_id(inputs()))
+    # draft_email runs next to coach and may have finished before the failure.
+    assert completed[:5] == ["ingest", "classify", "extract", "load_memory", "predict_trade"]
+    assert set(completed[5:]) <= {"draft_email"}
+
+    final = graph.invoke(inputs())
+
+    assert calls == {"classify": 1, "coach": 2}
+    assert final["coach_notes"].trade_options
+    assert checkpointer.pending_threads() == {}
+    assert len(list(JsonlDealStateStore(offline_env / "state_store.jsonl").iter_records())) == 1
+
+
+def test_changed_deal_is_a_new_thread_and_abandoned_threads_are_pruned(offline_env, monkeypatch) -> None:
+    monkeypatch.setenv("USE_LLM", "false")
+    suppliers = []
+
+    def failing_coach(state):
+        suppliers.append(state["supplier_memory"].name)
+        raise TimeoutError("llm timed out")
+
+    monkeypatch.setattr(graph_mod, "NODES", [(n, failing_coach if n == "coach" else fn) for n, fn in graph_mod.NODES])
+    checkpointer = NodeCheckpointer(offline_env / "checkpoints.sqlite")
+    graph = graph_mod.build_graph(checkpointer=checkpointer)
+
+    def inputs(supplier: str):
+        deal = load_deal_state(ROOT / "data" / "fixtures" / "sample_deal_state.json")
+        deal.supplier_name = supplier
+        return {"email_text": "We require a 9% increase.", "supplier_email_subject": "Uplift", "deal_state": deal}
+
+    for supplier in ["Battila Turbines", "Corealium OEM"]:
+        with pytest.raises(TimeoutError):
+            graph.invoke(inputs(supplier))
+
+    # Same deal, round and email, other supplier: nothing replayed from the first attempt.
+    assert suppliers == ["Battila Turbines", "Corealium OEM"]
+    assert thread_id(inputs("Battila Turbines")) != thread_id(inputs("Corealium OEM"))
+    assert len(checkpointer.pending_threads()) == 2
+
+    assert checkpointer.prune(3600) == 0
+    assert checkpointer.prune(0) == 2 and checkpointer.pending_threads() == {}
@@ -1 +1,25 @@
+from __future__ import annotations
 
+from pathlib import Path
+
+import pytest
+
+from owpa.agent.nodes.classify import _rule_classify
+
+EMAILS = Path(__file__).resolve().parents[1] / "data" / "emails"
+
+
+@pytest.mark.parametrize(
+    "filename, intent",
+    [
+        ("01_price_increase.txt", "price_increase_request"),
+        ("02_slot_pressure.txt", "slot_pressure_deadline"),
+    ],
+)
+def test_rule_classify_golden_emails(filename: str, intent: str) -> None:
+    text = (EMAILS / filename).read_text(encoding="utf-8")
+    assert _rule_classify(text)["intent"] == intent
+
+
+def test_rule_classify_defaults_to_other() -> None:
+    assert _rule_classify("Hello, hope you are well.") == {"intent": "other", "reason": None}
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+from owpa.agent.nodes.persist_state import persist_state_node
+from owpa.data.deadlines import DeadlineIndex, DeadlineScheduler, epoch
+from owpa.data.storage import JsonlDealStateStore
+from owpa.schemas.deal_state import DealState, IntentType, SupplierAsk
+
+NOW = datetime(2026, 3, 2, 9, 0)
+
+
+def _deal(deal_id: str, hours: float | None, *, round_number: int = 1, status: str = "open") -> DealState:
+    ask = SupplierAsk(intent=IntentType.SLOT_PRESSURE_DEADLINE, deadline=NOW + timedelta(hours=hours) if hours is not None else None)
+    return DealState(deal_id=deal_id, supplier_name=f"Supplier {deal_id}", round_number=round_number, supplier_ask=ask, metadata={"status": status})
+
+
+def test_index_and_scheduler_follow_deadline_changes(tmp_path) -> None:
+    index = DeadlineIndex(tmp_path / "deadlines.sqlite")
+    now = epoch(NOW)
+    for deal_id, hours in [("D1", 30), ("D2", 5), ("D3", 100), ("D4", -2)]:
+        assert index.apply(_deal(deal_id, hours))
+    assert not index.apply(_deal("D5", None))        # never had a deadline: nothing stored
+    assert not index.apply(_deal("D1", 30, round_number=2))  # unchanged deadline: no write
+
+    assert [e.deal_id for e in index.upcoming(timedelta(hours=48), now=now)] == ["D4", "D2", "D1"]
+    assert [e.deal_id for e in index.upcoming(timedelta(hours=48), now=now, include_overdue=False)] == ["D2", "D1"]
+
+    scheduler = DeadlineScheduler(index)
+    assert scheduler.refresh() == 4
+    assert [e.deal_id for e in scheduler.due(now=now, lead=timedelta(hours=6))] == ["D4", "D2"]
+    assert list(scheduler.due(now=now, lead=timedelta(hours=6))) == []  # each deadline fires once
+
+    index.apply(_deal("D3", 1, round_number=2))       # moved forward
+    index.apply(_deal("D1", 30, round_number=3, status="closed"))
+    assert not index.apply(_deal("D3", 200, round_number=1))  # older snapshot ignored
+    assert scheduler.refresh() == 2
+    assert len(scheduler) == 1 and scheduler.peek().deal_id == "D3"
+    assert [e.deal_id for e in scheduler.due(now=now + 3600 * 48)] == ["D3"]
+    assert [e.deal_id for e in index.upcoming(now=now)] == ["D4", "D3", "D2"]
+
+
+def test_rebuild_keeps_sequence_numbers_growing_for_a_running_scheduler(tmp_path) -> None:
+    index = DeadlineIndex(tmp_path / "deadlines.sqlite")
+    now = epoch(NOW)
+    for deal_id, hours in [("D1", 30), ("D2", 5), ("D3", 100), ("D4", 2), ("D5", 50)]:
+        index.apply(_deal(deal_id, hours))
+    scheduler = DeadlineScheduler(index)
+    assert scheduler.refresh() == 5
+
+    store = JsonlDealStateStore(tmp_path / "state_store.jsonl")
+    store.append(_deal("D1", 30))
+    assert index.rebuild(store) == 1
+    index.apply(_deal("D6", 1))
+
+    assert scheduler.refresh() == 6  # D1 rebuilt, D2-D5 gone from the store, D6 new
+    assert len(scheduler) == 2
+    assert [e.deal_id for e in scheduler.due(now=now, lead=timedelta(hours=48))] == ["D6", "D1"]
+
+
+def test_persist_state_indexes_the_deadline(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("STATE_STORE_PATH", str(tmp_path / "state_store.jsonl"))
+    monkeypatch.setenv("AGGREGATES_DB_PATH", str(tmp_path / "aggregates.sqlite"))
+    deadline = datetime.now(timezone.utc) + timedelta(hours=20)
+    deal = DealState(
+        deal_id="DEAL-DL",
+        supplier_name="Battila Turbines",
+        supplier_ask=SupplierAsk(intent=IntentType.SLOT_PRESSURE_DEADLINE, deadline=deadline),
+    )
+
+    persist_state_node({"deal_state": deal, "playbook": {}})
+
+    # Same database as the aggregates unless DEADLINES_DB_PATH is set.
+    [entry] = DeadlineIndex(tmp_path / "aggregates.sqlite").upcoming(timedelta(hours=48))
+    assert (entry.deal_id, entry.supplier, entry.round_number) == ("DEAL-DL", "Battila Turbines", 1)
+    assert entry.deadline == deadline and 19.9 <= entry.hours_left() <= 20.0
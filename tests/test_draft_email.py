@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+
+from owpa.agent import utils
+from owpa.agent.graph import build_graph, stream_round
+from owpa.agent.nodes.draft_email import template_draft
+from owpa.evaluation.golden_tests import load_golden_set
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_llm_draft_streams_tokens_and_falls_back_to_template_on_timeout(offline_env, monkeypatch) -> None:
+    cases, _ = load_golden_set(ROOT / "data" / "emails" / "golden.json")
+    case = cases[0]
+    monkeypatch.setenv("DRAFT_MODE", "llm")
+    monkeypatch.setenv("DRAFT_FIRST_TOKEN_TIMEOUT_S", "0.2")
+    reply = "Dear team,\n\nThank you for your note. Could you share the cost drivers?\n\nBest regards,\nProcurement Team"
+
+    def fast(model, system, prompt, stop):
+        yield from reply.split(" ")[:1]
+        for word in reply.split(" ")[1:]:
+            yield " " + word
+
+    def stalled(model, system, prompt, stop):
+        stop.wait(5)
+        yield "too late"
+
+    def run():
+        from owpa.data.loader import load_deal_state
+
+        deal = load_deal_state(ROOT / "data" / "fixtures" / "sample_deal_state.json")
+        inputs = {"email_text": case.email_path.read_text(encoding="utf-8"), "supplier_email_subject": case.subject, "deal_state": deal}
+        events = []
+        final = inputs
+        for node, final, _ in stream_round(build_graph(), inputs, on_custom=events.append):
+            pass
+        return final, events
+
+    monkeypatch.setattr(utils, "_stream_deltas", fast)
+    final, events = run()
+    deltas = [e["draft_delta"] for e in events if "draft_delta" in e]
+    assert len(deltas) > 5 and "".join(deltas) == reply
+    assert any("draft_ttft_ms" in e for e in events)
+    assert final["email_draft"].body == reply
+    assert final["coach_notes"].trade_options
+
+    monkeypatch.setattr(utils, "_stream_deltas", stalled)
+    started = time.perf_counter()
+    final, events = run()
+    assert time.perf_counter() - started < 3
+    assert {"draft_reset": True} in events
+    expected = template_draft(final["deal_state"], final["trade_options"][0])
+    assert final["email_draft"].body == expected.body
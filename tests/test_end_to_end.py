@@ -1 +1,79 @@
+from __future__ import annotations
 
+from pathlib import Path
+
+from owpa.evaluation.golden_tests import evaluate, load_golden_set, run_golden_set
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_golden_set_replays_offline_without_regressions(offline_env) -> None:
+    cases, budgets = load_golden_set(ROOT / "data" / "emails" / "golden.json")
+    # Latency budgets are for the CLI run; CI machines are too noisy to assert on them here.
+    budgets.pop("node_p95_ms", None)
+    budgets.pop("round_p95_ms", None)
+
+    results = run_golden_set(cases, workers=4)
+    report = evaluate(results, budgets)
+
+    assert report["regressions"] == []
+    assert report["accuracy"]["intent"] == 1.0
+    assert set(report["node_latency_ms"]) >= {"classify", "extract", "predict_trade", "persist_state"}
+
+
+def test_cassette_miss_is_reported_as_regression(offline_env, monkeypatch) -> None:
+    monkeypatch.setenv("OWPA_LLM_CASSETTE_DIR", str(offline_env / "empty"))
+    cases, budgets = load_golden_set(ROOT / "data" / "emails" / "golden.json")
+
+    report = evaluate(run_golden_set(cases[:1], workers=1), budgets)
+
+    assert len(report["regressions"]) == 1
+    assert "CassetteMiss" in report["regressions"][0]
+
+
+def test_tracing_records_node_and_llm_spans(offline_env) -> None:
+    from owpa.agent.tracing import RingBufferSink, Tracer, aggregate, set_tracer
+
+    sink = RingBufferSink()
+    set_tracer(Tracer(sink))
+    try:
+        cases, _ = load_golden_set(ROOT / "data" / "emails" / "golden.json")
+        run_golden_set(cases[:1], workers=1)
+    finally:
+        set_tracer(None)
+
+    agg = aggregate(sink.spans())
+    assert agg["node:classify"]["count"] == 1
+    assert agg["llm:llm_json"]["count"] == 2
+    assert agg["llm:llm_json"]["cache_hits"] == 2
+    llm_parents = {s.parent for s in sink.spans() if s.kind == "llm"}
+    assert llm_parents == {"classify", "extract"}
+
+
+def test_stream_round_reports_each_parallel_branch_its_own_time(offline_env, monkeypatch) -> None:
+    import time
+
+    from owpa.agent import graph as graph_mod
+    from owpa.data.loader import load_deal_state
+
+    def slow(fn, seconds):
+        def node(state):
+            time.sleep(seconds)
+            return fn(state)
+
+        return node
+
+    delays = {"coach": 0.3, "draft_email": 0.2}
+    monkeypatch.setattr(graph_mod, "NODES", [(name, slow(fn, delays[name]) if name in delays else fn) for name, fn in graph_mod.NODES])
+    cases, _ = load_golden_set(ROOT / "data" / "emails" / "golden.json")
+    inputs = {
+        "email_text": cases[0].email_path.read_text(encoding="utf-8"),
+        "supplier_email_subject": cases[0].subject,
+        "deal_state": load_deal_state(ROOT / "data" / "fixtures" / "sample_deal_state.json"),
+    }
+
+    node_ms = {node: ms for node, _, ms in graph_mod.stream_round(graph_mod.build_graph(), inputs)}
+
+    # Both branches start together: the later one's update follows the earlier by ~100 ms only.
+    assert node_ms["coach"] >= 300.0
+    assert 200.0 <= node_ms["draft_email"] < 300.0
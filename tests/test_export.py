@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from owpa.data import synthetic
+from owpa.data.export import export_store, load_table
+from owpa.data.storage import JsonlDealStateStore
+
+
+@pytest.mark.parametrize("fmt", ["npz", "parquet"])
+def test_export_is_chunked_typed_and_incremental(tmp_path, fmt) -> None:
+    if fmt == "parquet":
+        pytest.importorskip("pyarrow")
+    store_path = tmp_path / "state_store.jsonl"
+    out = tmp_path / "export"
+    synthetic.write_state_store(store_path, 6, rounds=5, n_suppliers=3)
+
+    first = export_store(store_path, out, fmt=fmt, chunk_rows=7)
+    assert (first["exported"], first["parts"]) == (30, 5)
+
+    store = JsonlDealStateStore(store_path)
+    deal = next(store.iter_latest())
+    deal.round_number += 1
+    deal.metadata.update(status="closed", settled_pct=2.5)
+    store.append(deal)
+    expected_issues = sum(len(r["state"]["open_issues"]) for r in store.iter_records())
+    with store_path.open("a", encoding="utf-8") as f:
+        f.write('{"deal_id": "PARTIAL"')  # in-flight append: not exported yet
+
+    second = export_store(store_path, out, fmt=fmt, chunk_rows=7)
+    assert (second["exported"], second["records"], second["parts"]) == (1, 31, 6)
+    assert export_store(store_path, out, fmt=fmt)["exported"] == 0
+
+    rounds = load_table(out, "rounds")
+    assert len(rounds["deal_id"]) == 31
+    assert rounds["uplift_pct"].dtype == np.float64
+    assert rounds["reason"].dtype == object and isinstance(rounds["reason"][0], str)
+    assert rounds["email_received_at"].dtype.kind == "M"
+    assert list(rounds["record_offset"]) == sorted(rounds["record_offset"])
+    assert rounds["status"][-1] == "closed" and rounds["settled_pct"][-1] == 2.5
+
+    if fmt == "npz":
+        # Strings are stored as UTF-8 bytes + offsets, never as fixed-width arrays sized by the longest row.
+        with np.load(out / "rounds" / "part-000000.npz") as part:
+            assert {part[k].dtype.kind for k in part.files} <= {"i", "f", "M", "b", "u"}
+
+    issues = load_table(out, "open_issues")
+    assert len(issues["topic"]) == expected_issues
+    assert set(issues["record_offset"]) <= set(rounds["record_offset"])
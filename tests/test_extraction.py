@@ -1 +1,29 @@
+from __future__ import annotations
 
+import json
+from pathlib import Path
+
+import pytest
+
+from owpa.agent.nodes.extract import _regex_extract_pct, _rule_extract
+
+ROOT = Path(__file__).resolve().parents[1]
+EXPECTED = json.loads((ROOT / "tests" / "fixtures" / "expected_extraction.json").read_text(encoding="utf-8"))
+
+
+@pytest.mark.parametrize("filename", sorted(EXPECTED))
+def test_rule_extract_matches_expected(filename: str) -> None:
+    text = (ROOT / "data" / "emails" / filename).read_text(encoding="utf-8")
+    expected = EXPECTED[filename]
+
+    data = _rule_extract(text)
+
+    assert data["headline_price_change_pct"] == expected["headline_price_change_pct"]
+    assert (data["deadline_iso"] is not None) == expected["has_deadline"]
+    if data["headline_price_change_pct"] is not None:
+        assert any("%" in s for s in data["raw_snippets"])
+
+
+def test_regex_extract_pct_handles_signs_and_spaces() -> None:
+    assert _regex_extract_pct("an uplift of + 9 % on the base price") == 9.0
+    assert _regex_extract_pct("no numbers here") is None
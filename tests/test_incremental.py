@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from owpa.agent import incremental, utils
+from owpa.agent.graph import build_graph
+from owpa.agent.incremental import NodeMemo, affected_nodes
+from owpa.data.loader import load_deal_state
+from owpa.schemas.deal_state import OpenIssue
+
+ROOT = Path(__file__).resolve().parents[1]
+EMAIL = "We require a 9% price adjustment due to steel cost escalation. Please confirm by Friday."
+
+
+def test_affected_nodes_follow_declared_reads_and_writes() -> None:
+    assert affected_nodes(["deal_state.open_issues"]) == ["coach", "persist_state"]
+    assert affected_nodes(["deal_state.supplier_name"]) == [
+        "load_memory", "predict_trade", "coach", "draft_email", "persist_state"
+    ]
+    assert affected_nodes(["deal_state.our_position"]) == ["persist_state"]
+
+
+def test_what_if_rerun_only_recomputes_affected_nodes(tmp_path, monkeypatch) -> None:
+    monkeypatch.chdir(ROOT)
+    monkeypatch.setenv("USE_LLM", "true")
+    monkeypatch.setenv("OWPA_LLM_CASSETTE_MODE", "off")
+    monkeypatch.setenv("STATE_STORE_PATH", str(tmp_path / "state_store.jsonl"))
+    monkeypatch.setenv("AGGREGATES_DB_PATH", str(tmp_path / "aggregates.sqlite"))
+    prompts = []
+
+    def complete(model, system, prompt):
+        prompts.append(prompt)
+        if "Classify" in prompt:
+            return '{"intent": "price_increase_request", "reason": "steel cost escalation"}'
+        return '{"headline_price_change_pct": 9, "requested_trades": [], "deadline_iso": null, "raw_snippets": ["9% price adjustment"]}'
+
+    monkeypatch.setattr(utils, "_complete", complete)
+    memo = NodeMemo()
+    graph = build_graph(memo=memo)
+
+    def run(**changes):
+        deal = load_deal_state(ROOT / "data" / "fixtures" / "sample_deal_state.json")
+        for field, value in changes.items():
+            setattr(deal, field, value)
+        return graph.invoke({"email_text": EMAIL, "supplier_email_subject": "Uplift", "deal_state": deal})
+
+    first = run()
+    assert len(prompts) == 2
+
+    # An issue resolved: only coach recomputes, and its risk flags follow the new issue list.
+    resolved = run(open_issues=[OpenIssue(topic="Indexation clause", status="agreed")])
+    assert len(prompts) == 2
+    assert memo.stats()["coach"] == {"hits": 0, "misses": 2}
+    assert {n: s["hits"] for n, s in memo.stats().items()} == {
+        "classify": 1, "extract": 1, "predict_trade": 1, "coach": 0, "draft_email": 1
+    }
+    assert len(resolved["coach_notes"].risks_and_flags) == len(first["coach_notes"].risks_and_flags) - 1
+    assert resolved["email_draft"] == first["email_draft"]
+    assert resolved["deal_state"].supplier_ask == first["deal_state"].supplier_ask
+
+    # Another supplier: no LLM call on the unchanged email; trades, notes and draft recompute.
+    other = run(supplier_name="Corealium OEM")
+    assert len(prompts) == 2
+    assert memo.stats()["classify"]["hits"] == 2 and memo.stats()["draft_email"]["misses"] == 2
+    assert "Corealium OEM" in other["email_draft"].body
+    assert other["supplier_memory"].name == "Corealium OEM"
+    assert other["deal_state"].supplier_ask.headline_price_change_pct.value == 9.0
+
+
+def test_rules_extract_is_not_replayed_and_config_is_read_once(tmp_path, monkeypatch) -> None:
+    monkeypatch.chdir(ROOT)
+    monkeypatch.setenv("USE_LLM", "false")
+    monkeypatch.setenv("STATE_STORE_PATH", str(tmp_path / "state_store.jsonl"))
+    monkeypatch.setenv("AGGREGATES_DB_PATH", str(tmp_path / "aggregates.sqlite"))
+    assert build_graph().node_memo is None  # opt-in via NODE_MEMO_SIZE
+
+    memo = NodeMemo()
+    graph = build_graph(memo=memo)
+    monkeypatch.setattr(incremental, "config_digest", lambda: pytest.fail("config digested per node call"))
+    for _ in range(2):
+        deal = load_deal_state(ROOT / "data" / "fixtures" / "sample_deal_state.json")
+        graph.invoke({"email_text": EMAIL, "supplier_email_subject": "Uplift", "deal_state": deal})
+
+    # "by Friday" depends on today's date without an LLM, so extract is never memoized.
+    assert "extract" not in memo.stats()
+    assert memo.stats()["classify"] == {"hits": 1, "misses": 1}
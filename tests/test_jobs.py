@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import sqlite3
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from owpa.agent.state import dump_agent_state
+from owpa.data.loader import load_deal_state
+from owpa.data.storage import JsonlDealStateStore
+from owpa.service.jobs import DONE, HEARTBEAT_STALE_S, RUNNING, JobExecutor, JobStore, owner_alive, process_owner
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_job_executor_serializes_rounds_per_deal(offline_env, monkeypatch) -> None:
+    monkeypatch.setenv("USE_LLM", "false")
+    executor = JobExecutor(JobStore(offline_env / "jobs.sqlite"), max_workers=4)
+    email = (ROOT / "data" / "emails" / "01_price_increase.txt").read_text(encoding="utf-8")
+
+    job_ids = []
+    for deal_id in ["DEAL-A", "DEAL-A", "DEAL-B"]:
+        deal = load_deal_state(ROOT / "data" / "fixtures" / "sample_deal_state.json")
+        deal.deal_id = deal_id
+        job_ids.append(executor.submit({"email_text": email, "supplier_email_subject": "s", "deal_state": deal}))
+
+    jobs = [executor.wait(j, timeout=30) for j in job_ids]
+    executor.shutdown()
+
+    assert [j.status for j in jobs] == [DONE, DONE, DONE]
+    assert jobs[1].started_at >= jobs[0].finished_at
+    result = jobs[2].result_state()
+    assert result["deal_state"].deal_id == "DEAL-B"
+    assert result["coach_notes"].trade_options
+    assert [n for n, _ in jobs[2].progress["nodes"]][-1] == "persist_state"
+
+
+def test_start_up_requeues_only_orphaned_jobs_whose_round_was_not_stored(offline_env, monkeypatch) -> None:
+    monkeypatch.setenv("USE_LLM", "false")
+    store = JobStore(offline_env / "jobs.sqlite")
+    states = JsonlDealStateStore(offline_env / "state_store.jsonl")
+    email = (ROOT / "data" / "emails" / "01_price_increase.txt").read_text(encoding="utf-8")
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    dead_here = f"{process_owner().rpartition(':')[0]}:{exited.pid}"
+
+    def job(deal_id: str) -> str:
+        deal = load_deal_state(ROOT / "data" / "fixtures" / "sample_deal_state.json")
+        deal.deal_id = deal_id
+        return store.create(deal_id, dump_agent_state({"email_text": email, "supplier_email_subject": "s", "deal_state": deal}))
+
+    live, crashed, stale, persisted, queued = (job(d) for d in ["DEAL-L", "DEAL-C", "DEAL-S", "DEAL-P", "DEAL-Q"])
+    assert store.claim(live, process_owner(), None)
+    assert store.claim(crashed, dead_here, None)
+    assert store.claim(stale, "elsewhere:1", None)
+    assert store.claim(persisted, dead_here, 0)
+    deal = load_deal_state(ROOT / "data" / "fixtures" / "sample_deal_state.json")
+    deal.deal_id, deal.round_number = "DEAL-P", 1
+    states.append(deal)  # the crashed worker got as far as persist_state
+    with sqlite3.connect(store.path) as conn:
+        conn.execute("UPDATE jobs SET heartbeat = ? WHERE job_id = ?", (time.time() - HEARTBEAT_STALE_S - 1, stale))
+    assert not owner_alive(dead_here, time.time()) and owner_alive(process_owner(), time.time())
+
+    executor = JobExecutor(store, max_workers=2)
+    jobs = {name: executor.wait(j, timeout=30) for name, j in [("crashed", crashed), ("stale", stale), ("persisted", persisted), ("queued", queued)]}
+    executor.shutdown()
+
+    assert {name: j.status for name, j in jobs.items()} == dict.fromkeys(jobs, DONE)
+    assert store.get(live).status == RUNNING  # its owner (this process) is alive: left alone
+    assert "already stored" in jobs["persisted"].progress["recovered"]
+    assert jobs["persisted"].result_state()["deal_state"].round_number == 1
+    assert states.current_version("DEAL-P") == 1  # not stored a second time
+    assert states.current_version("DEAL-C") == states.current_version("DEAL-S") == 1
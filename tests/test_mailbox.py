@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import json
+import os
+from email.message import EmailMessage
+
+from owpa.data.mailbox import ThreadIndex, ingest, normalize_subject
+
+
+def _message(
+    subject: str, msg_id: str, body: str, in_reply_to: str | None = None, sender: str = "Anna Berg <anna@battila-turbines.com>"
+) -> bytes:
+    m = EmailMessage()
+    m["Subject"] = subject
+    m["From"] = sender
+    m["Message-ID"] = msg_id
+    if in_reply_to:
+        m["In-Reply-To"] = in_reply_to
+        m["References"] = in_reply_to
+    m.set_content(body)
+    return bytes(m)
+
+
+def _read(path) -> list[dict]:
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_normalize_subject_strips_reply_prefixes_and_tags() -> None:
+    assert normalize_subject("RE: Fwd: [EXT]  Price  Update") == "price update"
+    assert normalize_subject("AW: WG: price update") == "price update"
+
+
+def test_mbox_ingestion_is_incremental_and_threads_by_references(tmp_path) -> None:
+    mbox = tmp_path / "suppliers.mbox"
+    first = [
+        _message("Price update", "<a1@x>", "We require a 9% increase.\n\nOn Mon, Bob wrote:\n> earlier"),
+        _message("Slot reservation", "<b1@x>", "Please confirm the slot by Friday."),
+    ]
+    mbox.write_bytes(b"".join(b"From anna@x Mon Jan  5 09:00:00 2026\n" + m + b"\n" for m in first))
+
+    index = ThreadIndex(tmp_path / "mailbox.sqlite")
+    names = ["Battila Turbines", "Corealium OEM"]
+    assert ingest(mbox, tmp_path / "run1.jsonl", index=index, supplier_names=names) == 2
+
+    with mbox.open("ab") as f:
+        # Reply with a rewritten subject still lands on the first deal via In-Reply-To.
+        f.write(b"From anna@x Tue Jan  6 09:00:00 2026\n" + _message("Re: revised", "<a2@x>", "We can accept 7%.", "<a1@x>") + b"\n")
+    assert ingest(mbox, tmp_path / "run2.jsonl", index=index, supplier_names=names) == 1
+    assert ingest(mbox, tmp_path / "run3.jsonl", index=index, supplier_names=names) == 0
+
+    run1, run2 = _read(tmp_path / "run1.jsonl"), _read(tmp_path / "run2.jsonl")
+    assert run1[0]["email_text"] == "We require a 9% increase."
+    assert run1[0]["supplier_name"] == "Battila Turbines"
+    assert run1[0]["deal_id"] != run1[1]["deal_id"]
+    assert run2[0]["deal_id"] == run1[0]["deal_id"]
+
+
+def test_maildir_reads_late_files_and_skips_seen_ones(tmp_path) -> None:
+    maildir = tmp_path / "Maildir"
+    (maildir / "new").mkdir(parents=True)
+    (maildir / "cur").mkdir()
+    (maildir / "new" / "1.msg").write_bytes(_message("[DEAL-ACME-7] LD cap", "<c1@x>", "Redline attached."))
+
+    index = ThreadIndex(tmp_path / "mailbox.sqlite")
+    assert ingest(maildir, tmp_path / "m.jsonl", index=index) == 1
+    (maildir / "new" / "2.msg").write_bytes(_message("RE: [DEAL-ACME-7] LD cap", "<c2@x>", "Counter-proposal below."))
+    assert ingest(maildir, tmp_path / "m.jsonl", index=index) == 1
+
+    # Delivered late with its original (older) mtime, e.g. restored or synced from another client.
+    (maildir / "new" / "0.msg").write_bytes(_message("RE: [DEAL-ACME-7] LD cap", "<c0@x>", "Cap at 10% of contract value."))
+    os.utime(maildir / "new" / "0.msg", ns=(1, 1))
+    # Read by a mail client: moved to cur/ with flags, still the same message.
+    os.rename(maildir / "new" / "1.msg", maildir / "cur" / "1.msg:2,S")
+    assert ingest(maildir, tmp_path / "m.jsonl", index=index) == 1
+    assert index.files(str(maildir.resolve())) == {"0.msg", "1.msg", "2.msg"}
+
+    assert [line["message_id"] for line in _read(tmp_path / "m.jsonl")] == ["<c1@x>", "<c2@x>", "<c0@x>"]
+
+
+def test_same_subject_threads_per_sender_domain(tmp_path) -> None:
+    eml = tmp_path / "inbox"
+    eml.mkdir()
+    corealium = "Sales <sales@corealium-oem.com>"
+    messages = [
+        _message("Price adjustment 2025", "<p1@x>", "We require a 9% increase."),
+        _message("Price adjustment 2025", "<p2@x>", "We require an 11% increase.", sender=corealium),
+        _message("RE: Price adjustment 2025", "<p3@x>", "Following up on our 9% request.", sender="Jon <jon@battila-turbines.com>"),
+    ]
+    for i, raw in enumerate(messages):
+        (eml / f"{i}.eml").write_bytes(raw)
+        os.utime(eml / f"{i}.eml", ns=(i + 1, i + 1))
+
+    index = ThreadIndex(tmp_path / "mailbox.sqlite")
+    assert ingest(eml, tmp_path / "m.jsonl", index=index) == 3
+
+    battila, corealium_deal, battila_again = [line["deal_id"] for line in _read(tmp_path / "m.jsonl")]
+    assert battila != corealium_deal
+    assert battila_again == battila  # same supplier domain, different person
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from owpa.agent import utils
+from owpa.agent.nodes.classify import classify_node
+from owpa.agent.nodes.extract import extract_node
+from owpa.data.near_dup import changed_sentences, hamming, simhash
+from owpa.schemas.deal_state import DealState
+
+LETTER = """Dear {name} team,
+
+Due to sustained input cost escalation in steel, copper and vessel logistics, we must apply a price
+adjustment of {pct}% to the WTG supply scope. This reflects the latest supplier indices and is in line
+with the escalation clause discussed during the tender phase.
+{extra}
+We remain committed to the project schedule and look forward to your confirmation.
+
+Kind regards,
+{name} Sales"""
+
+
+def _letter(name: str, pct: str, extra: str = "") -> str:
+    return LETTER.format(name=name, pct=pct, extra=extra)
+
+
+def test_simhash_is_close_for_form_letters_and_far_for_other_emails() -> None:
+    a, b = _letter("Acme", "9"), _letter("Borealis", "11")
+    assert hamming(simhash(a), simhash(b)) <= 7
+    other = "Please confirm whether the LTSA availability guarantee can be measured per turbine rather than per park."
+    assert hamming(simhash(a), simhash(other)) > 7
+    assert changed_sentences(a, b) == []
+    assert changed_sentences(a, _letter("Acme", "9", "We also need the payment milestones moved to 30/70.\n")) == [
+        "We also need the payment milestones moved to 30/70."
+    ]
+
+
+def test_near_duplicate_email_reuses_analysis_and_reverifies_numbers(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("USE_LLM", "true")
+    monkeypatch.setenv("NEAR_DUP_DB_PATH", str(tmp_path / "near_dup.sqlite"))
+    prompts = []
+
+    def complete(model, system, prompt):
+        prompts.append(prompt)
+        if "Classify" in prompt and "sign by" in prompt:
+            return '{"intent": "slot_pressure_deadline", "reason": "slot released unless signed"}'
+        if "Classify" in prompt:
+            return '{"intent": "price_increase_request", "reason": "input cost escalation"}'
+        if "excerpt" in prompt:
+            return '{"requested_trades": ["change payment milestones"], "raw_snippets": ["payment milestones moved to 30/70"]}'
+        return '{"headline_price_change_pct": 9, "requested_trades": [], "deadline_iso": null, "raw_snippets": ["price adjustment of 9%"]}'
+
+    monkeypatch.setattr(utils, "_complete", complete)
+
+    def run(text: str, name: str) -> DealState:
+        state = {"email_text": text, "deal_state": DealState(deal_id=f"DEAL-{name}", supplier_name=name)}
+        return extract_node(classify_node(state))["deal_state"]
+
+    first = run(_letter("Acme", "9"), "Acme")
+    assert len(prompts) == 2 and first.supplier_ask.headline_price_change_pct.value == 9.0
+
+    # Same letter to another deal with a different uplift: no LLM call, the number comes from this email.
+    second = run(_letter("Borealis", "11"), "Borealis")
+    assert len(prompts) == 2
+    assert second.supplier_ask.intent.value == "price_increase_request"
+    assert second.supplier_ask.headline_price_change_pct.value == 11.0
+    assert any("11%" in s for s in second.supplier_ask.raw_snippets)
+
+    # An added sentence: the intent is classified again, only that sentence goes to extraction.
+    third = run(_letter("Cirrus", "9", "We also need the payment milestones moved to 30/70.\n"), "Cirrus")
+    assert len(prompts) == 4
+    assert "Classify" in prompts[2]
+    assert "payment milestones" in prompts[3] and "steel, copper" not in prompts[3]
+    assert third.supplier_ask.requested_trades == ["change payment milestones"]
+    assert third.supplier_ask.headline_price_change_pct.value == 9.0
+
+    # A sentence that changes what the letter is about must not keep the stored intent.
+    fourth = run(_letter("Dunmore", "9", "Please sign by Friday or the slot is released.\n"), "Dunmore")
+    assert fourth.supplier_ask.intent.value == "slot_pressure_deadline"
+
+
+def test_sentences_dropped_from_the_stored_letter_force_a_full_extraction(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("USE_LLM", "true")
+    monkeypatch.setenv("NEAR_DUP_DB_PATH", str(tmp_path / "near_dup.sqlite"))
+    prompts = []
+
+    def complete(model, system, prompt):
+        if "Classify" in prompt:
+            return '{"intent": "price_increase_request", "reason": "input cost escalation"}'
+        prompts.append(prompt)
+        trades = '["change payment milestones"]' if "payment milestones" in prompt else "[]"
+        return f'{{"headline_price_change_pct": 9, "requested_trades": {trades}, "deadline_iso": null, "raw_snippets": []}}'
+
+    monkeypatch.setattr(utils, "_complete", complete)
+
+    def run(text: str, name: str) -> DealState:
+        state = {"email_text": text, "deal_state": DealState(deal_id=f"DEAL-{name}", supplier_name=name)}
+        return extract_node(classify_node(state))["deal_state"]
+
+    first = run(_letter("Acme", "9", "We also need the payment milestones moved to 30/70.\n"), "Acme")
+    assert first.supplier_ask.requested_trades == ["change payment milestones"]
+
+    # The milestones sentence is gone: its trade must not be carried over from the stored analysis.
+    second = run(_letter("Borealis", "9"), "Borealis")
+    assert len(prompts) == 2 and prompts[1].startswith("Email:")
+    assert second.supplier_ask.requested_trades == []
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from owpa.agent.policy import compile_policy
+from owpa.data.loader import load_deal_state
+from owpa.schemas.deal_state import IntentType, OpenIssue, Percentage, SupplierAsk
+
+ROOT = Path(__file__).resolve().parents[1]
+PLAYBOOK = json.loads((ROOT / "data" / "fixtures" / "playbook_wtg_ltsa.json").read_text(encoding="utf-8"))
+
+
+def _deal(deal_id: str, pct: float | None, trades: list[str] = (), status: str = "open"):
+    deal = load_deal_state(ROOT / "data" / "fixtures" / "sample_deal_state.json")
+    deal.deal_id = deal_id
+    deal.open_issues = []
+    deal.supplier_ask = SupplierAsk(
+        intent=IntentType.CONTRACT_REDLINE,
+        headline_price_change_pct=Percentage(value=pct) if pct is not None else None,
+        requested_trades=list(trades),
+    )
+    deal.metadata["status"] = status
+    return deal
+
+
+def test_compiled_policy_covers_every_threshold_and_is_cached() -> None:
+    policy = compile_policy(PLAYBOOK)
+    assert [r.name for r in policy.rules] == [
+        "internal_approval", "legal_liability_cap", "legal_warranty_exclusions", "pm_legal_ld_cap"
+    ]
+    assert policy.unknown == ()
+    assert compile_policy(json.loads(json.dumps(PLAYBOOK))) is policy
+
+    disabled = {"policy_thresholds": {"ld_cap_change_requires_pm_and_legal": False, "new_gate_requires_cfo": True}}
+    assert [r.name for r in compile_policy(disabled).rules] == ["internal_approval"]
+    assert compile_policy(disabled).unknown == ("new_gate_requires_cfo",)
+
+
+def test_single_deal_and_portfolio_evaluation_agree() -> None:
+    policy = compile_policy(PLAYBOOK)
+    deals = [
+        _deal("A", 9.0, ["Reduce LD cap to 10%"]),
+        _deal("B", 4.0, ["Cap on liability at 50% of contract value"]),
+        _deal("C", None, ["New warranty exclusions for blade erosion"]),
+        _deal("D", 12.0, status="closed"),
+        _deal("E", 3.0),
+    ]
+    deals[4].open_issues = [OpenIssue(topic="LD cap", detail="Supplier wants lower LD cap")]
+
+    flags = policy.flags(deals[0])
+    assert flags[0].startswith("Approval flag: uplift > 5.0% threshold")
+    assert len(flags) == 2
+
+    result = policy.evaluate_portfolio(deals)
+    assert result.deal_ids == ["A", "B", "C", "E"]
+    assert result.deals_for("internal_approval") == ["A"]
+    assert result.deals_for("pm_legal_ld_cap") == ["A", "E"]
+    assert result.flags_by_deal() == {
+        d.deal_id: [r.name for r in policy.evaluate(d)] for d in deals if d.deal_id != "D"
+    }
+    assert policy.evaluate_portfolio(deals, open_only=False).deals_for("internal_approval") == ["A", "D"]
+    assert policy.evaluate_portfolio([]).counts() == dict.fromkeys([r.name for r in policy.rules], 0)
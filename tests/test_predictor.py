@@ -1 +1,160 @@
+from __future__ import annotations
 
+import json
+from pathlib import Path
+
+import pytest
+
+from owpa.agent.nodes.coach import coach_node
+from owpa.agent.nodes.draft_email import draft_email_node
+from owpa.agent.nodes.predict_trade import predict_trade_node
+from owpa.data.loader import get_supplier, load_deal_state, load_playbook, load_suppliers_fixture
+from owpa.schemas.deal_state import IntentType, Percentage, SupplierAsk
+
+ROOT = Path(__file__).resolve().parents[1]
+FIXTURES = ROOT / "data" / "fixtures"
+EXPECTED = json.loads((ROOT / "tests" / "fixtures" / "expected_predictions.json").read_text(encoding="utf-8"))
+
+
+def _state(supplier_name: str, intent: str) -> dict:
+    deal = load_deal_state(FIXTURES / "sample_deal_state.json")
+    deal.supplier_name = supplier_name
+    deal.supplier_ask = SupplierAsk(intent=IntentType(intent), headline_price_change_pct=Percentage(value=9.0))
+    suppliers = load_suppliers_fixture(FIXTURES / "suppliers.json")
+    return {
+        "deal_state": deal,
+        "supplier_memory": get_supplier(suppliers, supplier_name=supplier_name),
+        "playbook": load_playbook(FIXTURES / "playbook_wtg_ltsa.json"),
+    }
+
+
+@pytest.mark.parametrize(
+    "supplier_name, intent",
+    [(name, intent) for name, by_intent in EXPECTED.items() for intent in by_intent],
+)
+def test_predict_trade_ranking(supplier_name: str, intent: str) -> None:
+    state = predict_trade_node(_state(supplier_name, intent))
+
+    ranked = [[o.option_id, o.predicted_acceptance] for o in state["trade_options"]]
+    assert ranked == EXPECTED[supplier_name][intent]
+
+
+def test_snapshot_keeps_only_compact_reference() -> None:
+    state = predict_trade_node(_state("Battila Turbines", "price_increase_request"))
+    meta = state["deal_state"].model_dump(mode="json")["metadata"]
+
+    assert "trade_options" not in meta
+    assert meta["trade_options_count"] == 3
+    assert meta["trade_option_refs"][0] == ["ltsa_term_extension", 0.8]
+
+    # A later round without an ask drops the previous round's references.
+    state["deal_state"].supplier_ask = None
+    meta = predict_trade_node(state)["deal_state"].metadata
+    assert state["trade_options"] == []
+    assert "trade_option_refs" not in meta and "trade_options_count" not in meta
+
+
+def test_downstream_nodes_use_typed_options() -> None:
+    state = predict_trade_node(_state("Battila Turbines", "price_increase_request"))
+    options = state["trade_options"]
+
+    state = draft_email_node(coach_node(state))
+
+    assert state["coach_notes"].trade_options[0] is options[0]
+    assert options[0].we_offer in state["email_draft"].body
+
+
+def test_legacy_metadata_options_still_read() -> None:
+    state = _state("Battila Turbines", "price_increase_request")
+    state["deal_state"].metadata["trade_options"] = [
+        {"we_offer": "bundle critical spares package", "we_request": "reduce service uplift", "predicted_acceptance": 0.7},
+        {"we_offer": "broken", "predicted_acceptance": 3.0},
+    ]
+
+    state = coach_node(state)
+
+    assert [o.we_offer for o in state["coach_notes"].trade_options] == ["bundle critical spares package"]
+
+
+def test_closing_a_deal_teaches_supplier_memory(tmp_path, monkeypatch) -> None:
+    from owpa.agent.nodes.persist_state import persist_state_node
+    from owpa.data.supplier_store import SupplierMemoryStore
+    from owpa.service.deals import close_deal
+
+    monkeypatch.chdir(ROOT)
+    monkeypatch.setenv("STATE_STORE_PATH", str(tmp_path / "state_store.jsonl"))
+    monkeypatch.setenv("AGGREGATES_DB_PATH", str(tmp_path / "aggregates.sqlite"))
+    monkeypatch.setenv("SUPPLIER_MEMORY_DB_PATH", str(tmp_path / "suppliers.sqlite"))
+
+    store = SupplierMemoryStore(tmp_path / "suppliers.sqlite", seed_fixture=FIXTURES / "suppliers.json")
+    before = store.get(supplier_name="Battila Turbines")
+    assert before == get_supplier(load_suppliers_fixture(FIXTURES / "suppliers.json"), supplier_name="Battila Turbines")
+    version = store.version(before.supplier_id)
+
+    deal = load_deal_state(FIXTURES / "sample_deal_state.json")
+    deal.supplier_ask = SupplierAsk(intent=IntentType.PRICE_INCREASE_REQUEST, headline_price_change_pct=Percentage(value=8.0))
+    persist_state_node({"deal_state": deal})
+
+    closed, new_version = close_deal(deal.deal_id, outcome="won", settled_pct=4.0, primary_trade="earlier milestone payment")
+    after = store.get(supplier_name="Battila Turbines")
+
+    assert closed.metadata["status"] == "closed"
+    assert new_version == version + 1
+    assert after.episodes[0].settled_pct == 4.0 and after.episodes[0].supplier_opening_ask_pct == 8.0
+    assert len(after.episodes) == len(before.episodes) + 1
+    prefs, old = after.movement_preferences, before.movement_preferences
+    assert prefs.payment_terms == round(0.8 * old.payment_terms + 0.2, 4)
+    assert prefs.price == round(0.8 * old.price + 0.2 * 0.5, 4)
+
+
+def test_load_memory_rereads_learned_memory_only_after_a_new_version(tmp_path, monkeypatch) -> None:
+    from owpa.agent.nodes.load_memory import load_memory_node
+    from owpa.data.supplier_store import SupplierMemoryStore
+
+    monkeypatch.chdir(ROOT)
+    monkeypatch.setenv("SUPPLIER_MEMORY_DB_PATH", str(tmp_path / "suppliers.sqlite"))
+    reads = []
+    get = SupplierMemoryStore.get
+    monkeypatch.setattr(SupplierMemoryStore, "get", lambda self, **kw: (reads.append(kw), get(self, **kw))[1])
+
+    def load():
+        return load_memory_node({"deal_state": load_deal_state(FIXTURES / "sample_deal_state.json")})["supplier_memory"]
+
+    first = load()
+    assert load() is first and len(reads) == 1
+
+    SupplierMemoryStore(tmp_path / "suppliers.sqlite").record_episode(first.supplier_id, first.episodes[0])
+    after = load()
+    assert len(reads) == 2 and len(after.episodes) == len(first.episodes) + 1
+
+
+def test_episode_log_is_compact_and_round_trips() -> None:
+    import tracemalloc
+
+    import numpy as np
+
+    from owpa.data.synthetic import make_supplier
+    from owpa.schemas.supplier_memory import NegotiationEpisode, SupplierMemory
+
+    supplier = make_supplier(0, episodes=300)
+    raw = supplier.model_dump(mode="json")
+    assert SupplierMemory.model_validate_json(supplier.model_dump_json()) == supplier
+    assert [e.model_dump(mode="json") for e in supplier.episodes] == raw["episodes"]
+    assert supplier.episodes[-1] == NegotiationEpisode.model_validate(raw["episodes"][-1])
+
+    # Numeric columns are plain arrays (NaN for missing).
+    eps = supplier.episodes
+    opening = [e["supplier_opening_ask_pct"] for e in raw["episodes"]]
+    assert np.array_equal(eps.opening_ask_pct, np.array([np.nan if v is None else v for v in opening]), equal_nan=True)
+    assert int(eps.outcome_mask("won").sum()) == sum(e["outcome"] == "won" for e in raw["episodes"])
+
+    tracemalloc.start()
+    objects = [NegotiationEpisode.model_validate(e) for e in raw["episodes"]]
+    as_objects = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    tracemalloc.start()
+    compact = SupplierMemory.model_validate({**raw, "episodes": objects}).episodes
+    as_log = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert compact == objects
+    assert as_log * 4 < as_objects
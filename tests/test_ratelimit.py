@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import multiprocessing
+import threading
+import time
+from types import SimpleNamespace
+
+from owpa.agent import routing, utils
+from owpa.agent.ratelimit import RateLimiter, get_limiter, llm_scope
+
+
+def test_limiter_serves_interactive_first_and_round_robins_deals(tmp_path) -> None:
+    limiter = RateLimiter(tmp_path / "rl.sqlite", rpm=1200, tpm=1_000_000, burst_seconds=0.05)
+    limiter.pause(0.5)  # everyone queues up behind the pause, then the order decides
+    served = []
+
+    def call(name: str, priority: str, deal_id: str) -> None:
+        with llm_scope(priority, deal_id):
+            limiter.acquire(100)
+        served.append(name)
+
+    threads = []
+    for name, priority, deal_id in [("a1", "batch", "A"), ("a2", "batch", "A"), ("c1", "batch", "C"), ("b1", "interactive", "B")]:
+        t = threading.Thread(target=call, args=(name, priority, deal_id))
+        t.start()
+        threads.append(t)
+        time.sleep(0.05)
+    for t in threads:
+        t.join(10)
+    assert served == ["b1", "a1", "c1", "a2"]
+    assert limiter.status()["queue"] == []
+
+
+def _worker(path: str, n: int) -> None:
+    limiter = RateLimiter(path, rpm=1200, tpm=1_000_000, burst_seconds=0.1)
+    for _ in range(n):
+        limiter.acquire(50, priority="batch", deal_id="D")
+
+
+def test_limiter_paces_requests_across_processes(tmp_path) -> None:
+    path = str(tmp_path / "rl.sqlite")
+    RateLimiter(path, rpm=1200, tpm=1_000_000, burst_seconds=0.1)  # 20 req/s, bucket of 2
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_worker, args=(path, 8)) for _ in range(3)]
+    t0 = time.monotonic()
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(20)
+    elapsed = time.monotonic() - t0
+    assert all(p.exitcode == 0 for p in procs)
+    # 24 calls at 20/s with 2 in the bucket: at least 22 refills.
+    assert elapsed >= 22 / 20 * 0.95
+
+
+class _RateLimited(Exception):
+    status_code = 429
+
+    def __init__(self) -> None:
+        super().__init__("rate limited")
+        self.response = SimpleNamespace(headers={"retry-after": "0.05"})
+
+
+class _StubClient:
+    """
+    Chat completions stub that answers 429 once; records the options it was copied with.
+    """
+
+    def __init__(self):
+        self.options = []
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=self)
+
+    def with_options(self, **options):
+        self.options.append(options)
+        return self
+
+    def create(self, *, model, messages, **kwargs):
+        self.calls += 1
+        if self.calls == 1:
+            raise _RateLimited()
+        return SimpleNamespace(usage=None, choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))])
+
+
+def test_429_reaches_the_limiter_instead_of_sdk_retries(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("OWPA_LLM_CASSETTE_MODE", "off")
+    monkeypatch.setenv("RATE_LIMIT_DB_PATH", str(tmp_path / "rl.sqlite"))
+    pauses = []
+    pause = RateLimiter.pause
+    monkeypatch.setattr(RateLimiter, "pause", lambda self, seconds: (pauses.append(seconds), pause(self, seconds)))
+    client = _StubClient()
+    utils.set_llm_client(client)
+    try:
+        assert utils._complete("m", "system", "prompt") == "ok"
+    finally:
+        utils.set_llm_client(None)
+
+    assert client.options == [{"max_retries": 0}]
+    assert pauses == [0.05] and client.calls == 2
+
+
+class _Router:
+    def __init__(self):
+        self.observed = []
+
+    def choose(self, node, default):
+        return routing.RouteDecision(node=node, model=default, reason="fixed", at=time.time())
+
+    def observe(self, node, model, latency_ms, ok):
+        self.observed.append((node, latency_ms, ok))
+
+
+def test_router_sees_provider_time_not_limiter_waits(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("USE_LLM", "true")
+    monkeypatch.setenv("OWPA_LLM_CASSETTE_MODE", "off")
+    monkeypatch.setenv("RATE_LIMIT_DB_PATH", str(tmp_path / "rl.sqlite"))
+    router = _Router()
+    routing.set_router(router)
+    utils.set_llm_client(_StubClient())
+    get_limiter().pause(0.3)
+    t0 = time.perf_counter()
+    try:
+        utils.llm_json("system", "prompt", node="coach")
+    finally:
+        utils.set_llm_client(None)
+        routing.reset_router()
+
+    [(node, latency_ms, ok)] = router.observed
+    assert (node, ok) == ("coach", True)
+    assert (time.perf_counter() - t0) * 1000.0 >= 300.0  # queued behind the pause, then the 429's
+    assert latency_ms < 100.0
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import time
+from types import SimpleNamespace
+
+from owpa.agent import routing, utils
+
+
+class _StubBackend:
+    """
+    Chat completions stub: per-model latency in seconds, and models that fail.
+    """
+
+    def __init__(self, latency, failing=()):
+        self.latency = latency
+        self.failing = set(failing)
+        self.models = []
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, *, model, messages, **kwargs):
+        self.models.append(model)
+        time.sleep(self.latency[model])
+        if model in self.failing:
+            raise RuntimeError(f"{model} unavailable")
+        return SimpleNamespace(usage=None, choices=[SimpleNamespace(message=SimpleNamespace(content='{"intent": "other"}'))])
+
+
+def test_node_models_come_from_config(monkeypatch) -> None:
+    monkeypatch.setenv("OPENAI_MODEL", "base-model")
+    monkeypatch.setenv("OPENAI_MODEL_CLASSIFY", "small-model")
+    assert utils.get_model_name("classify") == "small-model"
+    assert utils.get_model_name("extract") == "base-model"
+    assert utils.get_model_name() == "base-model"
+
+
+def test_router_moves_off_slow_and_failing_models(monkeypatch) -> None:
+    monkeypatch.setenv("USE_LLM", "true")
+    monkeypatch.setenv("OWPA_LLM_CASSETTE_MODE", "off")
+    backend = _StubBackend({"cheap": 0.03, "flaky": 0.0, "strong": 0.002}, failing={"flaky"})
+    router = routing.ModelRouter(
+        {"classify": ["cheap", "flaky", "strong"]}, budget_ms=15, min_samples=3, probe_every=10
+    )
+    utils.set_llm_client(backend)
+    routing.set_router(router)
+    try:
+        for _ in range(12):
+            try:
+                utils.llm_json("system", "Email:\nhello", node="classify")
+            except RuntimeError:
+                pass
+    finally:
+        routing.reset_router()
+        utils.set_llm_client(None)
+
+    # 3 warm-up calls each; the slow and the failing model lose to the one within budget,
+    # and the 10th call re-probes the least sampled candidate.
+    assert backend.models == ["cheap"] * 3 + ["flaky"] * 3 + ["strong"] * 3 + ["cheap", "strong", "strong"]
+    reasons = [d.reason for d in router.decisions]
+    assert reasons == ["warmup"] * 9 + ["probe", "within_budget", "within_budget"]
+    stats = router.snapshot()["classify"]
+    assert stats["flaky"]["error_rate"] == 1.0 and stats["cheap"]["p90_ms"] > 15
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from owpa.agent.nodes.persist_state import persist_state_node
+from owpa.data.loader import load_deal_state
+from owpa.data.storage import JsonlDealStateStore, sqlite_connect
+from owpa.schemas.deal_state import IntentType, SupplierAsk
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_concurrent_rounds_for_one_deal_get_distinct_round_numbers(offline_env) -> None:
+    def round_from_stale_read(i: int) -> int:
+        deal = load_deal_state(ROOT / "data" / "fixtures" / "sample_deal_state.json")
+        deal.last_supplier_email_subject = f"email {i}"
+        deal.supplier_ask = SupplierAsk(intent=IntentType.OTHER)
+        return persist_state_node({"deal_state": deal})["deal_state"].round_number
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        rounds = sorted(pool.map(round_from_stale_read, range(8)))
+
+    store = JsonlDealStateStore(offline_env / "state_store.jsonl")
+    stored = [r["state"]["round_number"] for r in store.iter_records()]
+    assert rounds == list(range(1, 9))
+    assert sorted(stored) == rounds
+    latest = store.load_latest("DEAL-DEMO-001")
+    assert latest.round_number == 8
+    assert latest.open_issues  # rebased onto stored snapshots, not reset
+
+
+def test_sqlite_connect_closes_and_rolls_back(tmp_path) -> None:
+    db = tmp_path / "t.sqlite"
+    with sqlite_connect(db) as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.execute("INSERT INTO t VALUES (1)")
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")  # closed, not just committed
+
+    with pytest.raises(RuntimeError):
+        with sqlite_connect(db) as conn:
+            conn.execute("INSERT INTO t VALUES (2)")
+            raise RuntimeError("boom")
+    with sqlite_connect(db, autocommit=True) as conn:
+        assert conn.execute("SELECT x FROM t").fetchall() == [(1,)]
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from owpa.agent import tracing, utils
+from owpa.agent.nodes.classify import _OUTPUT as CLASSIFY
+from owpa.agent.nodes.extract import _OUTPUT as EXTRACT
+from owpa.agent.structured import PartialJSONParser, parse_lenient
+
+
+def test_lenient_parser_repairs_common_llm_reply_defects() -> None:
+    value, parser = parse_lenient('Sure {see below}:\n{"a": 9.5, "b": [1, 2,], // note\n c: None, \'d\': "x"} Thanks {x}')
+    assert value == {"a": 9.5, "b": [1, 2], "c": None, "d": "x"}
+    assert not parser.truncated
+
+    value, parser = parse_lenient('```json\n{"requested_trades": ["extend LTSA", "index')
+    assert value == {"requested_trades": ["extend LTSA", "index"]}
+    assert "truncated" in parser.repairs
+
+    parser = PartialJSONParser()
+    snapshots = [parser.feed(chunk).value() for chunk in ['{"a": [1', ', 2], "b": "he', 'llo"}']]
+    assert snapshots == [{"a": [1]}, {"a": [1, 2], "b": "he"}, {"a": [1, 2], "b": "hello"}]
+    assert parser.done
+
+
+def test_compiled_schema_reports_missing_and_invalid_fields() -> None:
+    parsed = EXTRACT.parse('{"headline_price_change_pct": "+9 %", "requested_trades": null, "deadline_iso": nu')
+    assert parsed.value.headline_price_change_pct == 9.0
+    assert parsed.missing == ("deadline_iso", "raw_snippets")
+    assert EXTRACT.needs_followup(parsed)
+
+    # A complete reply may leave out optional fields without costing another call.
+    assert not EXTRACT.needs_followup(EXTRACT.parse('{"headline_price_change_pct": null}'))
+
+    parsed = CLASSIFY.parse('{"intent": "Price increase request", "reason": 7}')
+    assert parsed.value.intent.value == "price_increase_request"
+    assert parsed.invalid == ("reason",)
+
+
+def test_llm_json_asks_only_for_missing_fields(monkeypatch) -> None:
+    monkeypatch.setenv("USE_LLM", "true")
+    prompts = []
+    replies = iter([
+        '{"headline_price_change_pct": 9, "requested_trades": ["extend LTSA"], "raw_snip',
+        '{"deadline_iso": null, "raw_snippets": ["We require a 9% increase"]}',
+    ])
+
+    def complete(model, system, prompt):
+        prompts.append(prompt)
+        return next(replies)
+
+    monkeypatch.setattr(utils, "_complete", complete)
+    sink = tracing.RingBufferSink()
+    monkeypatch.setattr(tracing, "_tracer", tracing.Tracer(sink))
+    data = utils.llm_json("system", "Email:\nWe require a 9% increase.", output=EXTRACT)
+
+    assert data == {
+        "headline_price_change_pct": 9.0,
+        "requested_trades": ["extend LTSA"],
+        "deadline_iso": None,
+        "raw_snippets": ["We require a 9% increase"],
+    }
+    assert len(prompts) == 2
+    followup = prompts[1].split("just these fields:\n", 1)[1]
+    assert '"deadline_iso"' in followup and '"raw_snippets"' in followup
+    assert "headline_price_change_pct" not in followup
+    [span] = sink.spans()
+    assert span.attrs["retries"] == 1 and tracing.aggregate([span])["llm:llm_json"]["retries"] == 1
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import json
+import multiprocessing
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+from owpa.config import load_config
+from owpa.data.loader import get_supplier, load_suppliers_fixture
+from owpa.data.supplier_matrix import LEVERS, matrix_dir, shared_suppliers
+
+ROOT = Path(__file__).resolve().parents[1]
+FIXTURE = ROOT / "data" / "fixtures" / "suppliers.json"
+
+
+def _attach_and_read(fixture: str, cache: str, name: str, out) -> None:
+    matrix = shared_suppliers(fixture, cache)
+    out.put((matrix.get(supplier_name=name).model_dump(mode="json"), isinstance(matrix.preferences, np.memmap)))
+
+
+def test_workers_attach_to_one_build_and_materialize_on_demand(tmp_path) -> None:
+    fixture = tmp_path / "suppliers.json"
+    shutil.copy(FIXTURE, fixture)
+    cache = tmp_path / "matrix"
+    suppliers = load_suppliers_fixture(fixture)
+
+    matrix = shared_suppliers(fixture, cache)
+    assert len(matrix) == len(suppliers)
+    for row, s in enumerate(suppliers):
+        assert matrix.preferences[row].tolist() == np.array([getattr(s.movement_preferences, k) for k in LEVERS], dtype="f4").tolist()
+        assert matrix.features(row)["episodes"] == len(s.episodes)
+
+    name = suppliers[1].name
+    assert matrix.get(supplier_name=name.upper()) == get_supplier(suppliers, supplier_name=name)
+    assert matrix.get(supplier_id=suppliers[0].supplier_id) == suppliers[0]
+    assert matrix.get(supplier_name=name.split()[0]) == get_supplier(suppliers, supplier_name=name.split()[0])
+
+    ctx = multiprocessing.get_context("fork")
+    out = ctx.Queue()
+    procs = [ctx.Process(target=_attach_and_read, args=(str(fixture), str(cache), name, out)) for _ in range(2)]
+    for p in procs:
+        p.start()
+    results = [out.get(timeout=20) for _ in procs]
+    for p in procs:
+        p.join(20)
+    assert results == [(suppliers[1].model_dump(mode="json"), True)] * 2
+    assert len(list(cache.iterdir())) == 1
+
+    # An edited fixture is a new build that replaces the old one, still readable for workers attached to it.
+    other = shared_suppliers(FIXTURE, cache)
+    raw = json.loads(fixture.read_text(encoding="utf-8"))
+    raw["suppliers"][1]["movement_preferences"]["price"] = 0.99
+    fixture.write_text(json.dumps(raw), encoding="utf-8")
+    assert matrix_dir(fixture, cache) != matrix.directory
+    assert shared_suppliers(fixture, cache).get(supplier_name=name).movement_preferences.price == 0.99
+    assert matrix.get(supplier_name=name) == suppliers[1]
+    assert sorted(cache.iterdir()) == sorted([matrix_dir(fixture, cache), other.directory])
+
+
+def test_matrix_dir_is_off_unless_set(monkeypatch) -> None:
+    monkeypatch.delenv("SUPPLIER_MATRIX_DIR", raising=False)
+    assert load_config().supplier_matrix_dir is None
+    for value in ["off", "0", "False", " "]:
+        monkeypatch.setenv("SUPPLIER_MATRIX_DIR", value)
+        assert load_config().supplier_matrix_dir is None
+    monkeypatch.setenv("SUPPLIER_MATRIX_DIR", "./outputs/supplier_matrix")
+    assert load_config().supplier_matrix_dir == Path("./outputs/supplier_matrix")
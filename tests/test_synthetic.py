@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import json
+import runpy
+from pathlib import Path
+
+from owpa.data.loader import get_supplier, load_suppliers_fixture
+from owpa.data.storage import JsonlDealStateStore
+from owpa.data.synthetic import make_supplier, supplier_name
+from owpa.schemas.supplier_memory import SupplierMemory
+
+ROOT = Path(__file__).resolve().parents[1]
+SCRIPT = ROOT / "scripts" / "generate_synthetic_suppliers.py"
+
+
+def _generate(out_dir: Path, seed: int) -> None:
+    main = runpy.run_path(str(SCRIPT))["main"]
+    args = ["--out-dir", str(out_dir), "--suppliers", "12", "--episodes", "5", "--deals", "4", "--rounds", "3", "--emails-per-intent", "2"]
+    assert main(args + ["--seed", str(seed)]) == 0
+
+
+def test_seeded_fixture_is_deterministic_and_loads(tmp_path) -> None:
+    _generate(tmp_path / "a", seed=7)
+    _generate(tmp_path / "b", seed=7)
+    _generate(tmp_path / "c", seed=8)
+
+    files = sorted(p.relative_to(tmp_path / "a") for p in (tmp_path / "a").rglob("*") if p.is_file() and p.suffix != ".lock")
+    assert len(files) == 3 + 5 * 2  # suppliers, state store, golden.json + two emails per intent
+    for rel in files:
+        assert (tmp_path / "a" / rel).read_bytes() == (tmp_path / "b" / rel).read_bytes(), rel
+    assert (tmp_path / "c" / "suppliers.json").read_bytes() != (tmp_path / "a" / "suppliers.json").read_bytes()
+
+    suppliers = load_suppliers_fixture(tmp_path / "a" / "suppliers.json")
+    assert [s.name for s in suppliers] == [supplier_name(i) for i in range(12)]
+    assert len({s.supplier_id for s in suppliers}) == 12
+    assert all(len(s.episodes) == 5 for s in suppliers)
+    raw = json.loads((tmp_path / "a" / "suppliers.json").read_text(encoding="utf-8"))["suppliers"]
+    assert [SupplierMemory.model_validate(item) for item in raw] == suppliers
+    # Any row regenerates on its own.
+    assert make_supplier(9, episodes=5, seed=7) == suppliers[9]
+
+    deals = list(JsonlDealStateStore(tmp_path / "a" / "state_store.jsonl").iter_latest())
+    assert [d.round_number for d in deals] == [3] * 4
+    for deal in deals:
+        assert get_supplier(suppliers, supplier_name=deal.supplier_name).name == deal.supplier_name